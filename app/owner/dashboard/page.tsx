@@ -2,7 +2,7 @@
 import { useEffect, useState } from "react";
 import { KpiCard } from "@/components/ui/KpiCard";
 import { SectionCard } from "@/components/ui/SectionCard";
-import api from "@/lib/api";
+import { batchGet } from "@/lib/api";
 
 export default function OwnerDashboardPage() {
   const [dashboardData, setDashboardData] = useState({
@@ -14,11 +14,13 @@ export default function OwnerDashboardPage() {
   useEffect(() => {
     const fetchData = async () => {
       try {
-        const dashboardResponse = await api.get("/owner/dashboard");
-        const shopsResponse = await api.get("/owner/shops");
+        const [dashboard, shops] = await batchGet([
+          { path: "/owner/dashboard" },
+          { path: "/owner/shops" },
+        ]);
         setDashboardData({
-          ...dashboardResponse.data,
-          total_shops: shopsResponse.data.length,
+          ...dashboard,
+          total_shops: shops.length,
         });
       } catch (error) {
         console.error("Error fetching dashboard data:", error);
@@ -1,7 +1,7 @@
 "use client";
 import { useEffect, useState } from "react";
 import { SectionCard } from "@/components/ui/SectionCard";
-import api from "@/lib/api";
+import api, { batchGet } from "@/lib/api";
 import toast from "react-hot-toast";
 
 // Type representing an employee returned from the API.  It includes
@@ -54,11 +54,12 @@ export default function OwnerEmployeesPage() {
   useEffect(() => {
     const fetchData = async () => {
       try {
-        const employeesResponse = await api.get("/owner/employees");
-        setEmployees(employeesResponse.data);
-
-        const shopsResponse = await api.get("/owner/shops");
-        setShops(shopsResponse.data);
+        const [employeeRows, shopRows] = await batchGet([
+          { path: "/owner/employees" },
+          { path: "/owner/shops" },
+        ]);
+        setEmployees(employeeRows);
+        setShops(shopRows);
       } catch (error) {
         console.error("Error fetching data:", error);
         toast.error("Failed to fetch data.");
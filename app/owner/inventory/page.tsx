@@ -1,7 +1,7 @@
 "use client";
 import { useEffect, useState } from "react";
 import { SectionCard } from "@/components/ui/SectionCard";
-import api from "@/lib/api";
+import { batchGet } from "@/lib/api";
 
 type Inventory = {
   id: string;
@@ -18,6 +18,36 @@ type Inventory = {
   };
 };
 
+// GET /owner/inventory/matrix: shop and product axes plus the stock per cell,
+// either as a dense grid (null = no row) or as [shop, product, stock] triples.
+type InventoryMatrix = {
+  shape: "dense" | "sparse";
+  shops: { id: number; shop_id: string; name: string }[];
+  products: { id: number; product_id: string; name: string; reorder_level: number }[];
+  stock?: (number | null)[][];
+  cells?: [number, number, number][];
+};
+
+function matrixRows(matrix: InventoryMatrix): Inventory[] {
+  const cells =
+    matrix.cells ??
+    (matrix.stock ?? []).flatMap((row, i) =>
+      row.flatMap((stock, j) => (stock === null ? [] : [[i, j, stock] as [number, number, number]]))
+    );
+  return cells.map(([i, j, stock]) => {
+    const shop = matrix.shops[i];
+    const product = matrix.products[j];
+    return {
+      id: `${shop.id}:${product.id}`,
+      shop_id: String(shop.id),
+      product_id: String(product.id),
+      current_stock: stock,
+      shop,
+      product,
+    };
+  });
+}
+
 function stockStatus(row: Inventory) {
   if (row.current_stock <= row.product.reorder_level) return "low";
   if (row.current_stock <= row.product.reorder_level + 2) return "warning";
@@ -43,11 +73,12 @@ export default function OwnerInventoryPage() {
   useEffect(() => {
     const fetchData = async () => {
       try {
-        const inventoryResponse = await api.get("/owner/inventory", { params: filters });
-        setInventory(inventoryResponse.data);
-
-        const shopsResponse = await api.get("/owner/shops");
-        setShops(shopsResponse.data);
+        const [matrix, shopRows] = await batchGet([
+          { path: "/owner/inventory/matrix", params: filters },
+          { path: "/owner/shops" },
+        ]);
+        setInventory(matrixRows(matrix));
+        setShops(shopRows);
       } catch (error) {
         console.error("Error fetching data:", error);
       }
@@ -1,7 +1,7 @@
 "use client";
 import { useEffect, useState } from "react";
 import { SectionCard } from "@/components/ui/SectionCard";
-import api from "@/lib/api";
+import { batchGet } from "@/lib/api";
 
 type Sale = {
   id: string;
@@ -41,11 +41,12 @@ export default function OwnerSalesPage() {
   useEffect(() => {
     const fetchData = async () => {
       try {
-        const salesResponse = await api.get("/owner/sales", { params: filters });
-        setSales(salesResponse.data);
-
-        const shopsResponse = await api.get("/owner/shops");
-        setShops(shopsResponse.data);
+        const [salesRows, shopRows] = await batchGet([
+          { path: "/owner/sales", params: filters },
+          { path: "/owner/shops" },
+        ]);
+        setSales(salesRows);
+        setShops(shopRows);
       } catch (error) {
         console.error("Error fetching data:", error);
       }
@@ -1,7 +1,7 @@
 "use client";
 import { useEffect, useState } from "react";
 import { SectionCard } from "@/components/ui/SectionCard";
-import api from "@/lib/api";
+import api, { batchGet } from "@/lib/api";
 
 type StockIn = {
   id: string;
@@ -41,11 +41,12 @@ export default function OwnerStockInPage() {
   useEffect(() => {
     const fetchData = async () => {
       try {
-        const stockInsResponse = await api.get("/owner/stock-in");
-        setStockIns(stockInsResponse.data);
-
-        const shopsResponse = await api.get("/owner/shops");
-        setShops(shopsResponse.data);
+        const [stockInRows, shopRows] = await batchGet([
+          { path: "/owner/stock-in" },
+          { path: "/owner/shops" },
+        ]);
+        setStockIns(stockInRows);
+        setShops(shopRows);
       } catch (error) {
         console.error("Error fetching data:", error);
       }
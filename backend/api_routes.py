@@ -1,15 +1,20 @@
-from flask import Blueprint, jsonify
+from contextlib import contextmanager
+from urllib.parse import urlencode
+
+from flask import Blueprint, current_app, g, jsonify, request
+from werkzeug.test import EnvironBuilder
 from models import Product
 from db import db
 from flask_jwt_extended import jwt_required
+from responses import list_response
+from sync import changes_since
+from cache import cache
+from logs import request_id
 
 api_bp = Blueprint('api', __name__)
 
-@api_bp.route('/products', methods=['GET'])
-@jwt_required()
-def get_products():
-    products = Product.query.all()
-    return jsonify([{
+def product_to_dict(product):
+    return {
         'id': product.id,
         'product_id': product.product_id,
         'name': product.name,
@@ -17,4 +22,95 @@ def get_products():
         'cost_price': product.cost_price,
         'selling_price': product.selling_price,
         'reorder_level': product.reorder_level
-    } for product in products])
+    }
+
+@api_bp.route('/products', methods=['GET'])
+@jwt_required()
+def get_products():
+    rows = cache.get_or_set(
+        'api:products', lambda: [product_to_dict(product) for product in Product.query.all()], tags=('product',)
+    )
+    return list_response(rows)
+
+@api_bp.route('/products/changes', methods=['GET'])
+@jwt_required()
+def get_product_changes():
+    since = request.args.get('since', 0, type=int)
+    return jsonify(changes_since(Product, since, product_to_dict))
+
+# Request headers a sub-request inherits from the batch request. Accept-Encoding
+# is left out so sub-responses are never compressed inside the batch.
+BATCH_FORWARDED_HEADERS = ('Authorization', 'Accept-Language', 'User-Agent')
+
+def _begin_read_snapshot():
+    # pysqlite opens no transaction for SELECTs; without an explicit BEGIN each
+    # sub-request would see whatever was committed just before it.
+    connection = db.session.connection()
+    dbapi_connection = connection.connection.dbapi_connection
+    if connection.dialect.name == 'sqlite' and not dbapi_connection.in_transaction:
+        dbapi_connection.execute('BEGIN')
+
+@contextmanager
+def _fresh_g():
+    # Sub-requests run in the batch's app context so they share its session
+    # and snapshot, but must not see each other's per-request state in g
+    # (decoded JWT, profiling, cached lookups). Only the read-engine choice
+    # carries over: every sub-request reads from the snapshot the batch opened.
+    saved = dict(g.__dict__)
+    g.__dict__.clear()
+    if '_db_read_engine' in saved:
+        g._db_read_engine = saved['_db_read_engine']
+    try:
+        yield
+    finally:
+        g.__dict__.clear()
+        g.__dict__.update(saved)
+
+def _dispatch(item):
+    path, _, query = item['path'].partition('?')
+    if item.get('params'):
+        query = '&'.join(filter(None, [query, urlencode(item['params'], doseq=True)]))
+    builder = EnvironBuilder(
+        path=path,
+        method='GET',
+        query_string=query,
+        # Sub-requests are logged under the batch's request id
+        headers={**{name: request.headers[name] for name in BATCH_FORWARDED_HEADERS if name in request.headers},
+                 'X-Request-ID': request_id()},
+        environ_base={'REMOTE_ADDR': request.remote_addr}
+    )
+    try:
+        with _fresh_g(), current_app.request_context(builder.get_environ()):
+            response = current_app.full_dispatch_request()
+    except Exception:
+        current_app.logger.exception("Batched request to %s failed", path)
+        return {'status': 500, 'body': {"msg": "An internal error occurred"}}
+    finally:
+        builder.close()
+    return {'status': response.status_code, 'body': response.get_json(silent=True)}
+
+@api_bp.route('/batch', methods=['POST'])
+@jwt_required()
+def batch():
+    """Run several GET requests in-process and return their responses together.
+
+    Body: {"requests": [{"path": "/owner/shops"}, {"path": "/owner/inventory", "params": {"view": "low"}}]}.
+    Sub-requests share this request's database session and read from one
+    snapshot, so a page load sees consistent data in a single round trip.
+    """
+    data = request.get_json(silent=True) or {}
+    items = data.get('requests')
+    if not isinstance(items, list) or not items:
+        return jsonify({"msg": "Missing requests in batch"}), 400
+    if len(items) > current_app.config['BATCH_MAX_REQUESTS']:
+        return jsonify({"msg": f"At most {current_app.config['BATCH_MAX_REQUESTS']} requests per batch"}), 400
+    for item in items:
+        if not isinstance(item, dict) or not isinstance(item.get('path'), str) or not item['path'].startswith('/'):
+            return jsonify({"msg": "Each request needs an absolute path"}), 400
+        if item.get('method', 'GET').upper() != 'GET':
+            return jsonify({"msg": "Only GET requests can be batched"}), 400
+        if item['path'].partition('?')[0].rstrip('/') == request.path:
+            return jsonify({"msg": "Batches cannot be nested"}), 400
+
+    _begin_read_snapshot()
+    return jsonify({'responses': [_dispatch(item) for item in items]})
@@ -2,45 +2,87 @@ from flask import Flask
 from flask_migrate import Migrate
 from flask_jwt_extended import JWTManager
 import os
-import logging
-from dotenv import load_dotenv
 from flask_cors import CORS
-from db import db
-from auth import auth_bp
-from owner_routes import owner_bp
-from employee_routes import employee_bp
-from api_routes import api_bp
-
-load_dotenv()
-
-app = Flask(__name__)
-
-# Configure logging
-logging.basicConfig(level=logging.INFO)
-formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-handler = logging.StreamHandler()
-handler.setFormatter(formatter)
-app.logger.addHandler(handler)
-
-# Use an absolute path for the database to avoid ambiguity
-db_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'app.db')
-os.makedirs(os.path.dirname(db_path), exist_ok=True)
-app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.config['JWT_SECRET_KEY'] = os.environ.get('JWT_SECRET_KEY', 'super-secret')
-
-CORS_ALLOWED_ORIGINS = os.environ.get('CORS_ALLOWED_ORIGINS', 'http://localhost:3000').split(',')
-CORS(app, resources={r"/*": {"origins": CORS_ALLOWED_ORIGINS}})
-jwt = JWTManager(app)
-db.init_app(app)
-migrate = Migrate(app, db)
-
-app.register_blueprint(auth_bp, url_prefix='/auth')
-app.register_blueprint(owner_bp, url_prefix='/owner')
-app.register_blueprint(employee_bp, url_prefix='/employee')
-app.register_blueprint(api_bp, url_prefix='/api')
-
-import models
+from db import db, init_sqlite
+from config import Config
+from responses import init_compression
+from ratelimit import limiter
+from cache import cache
+from profiling import init_profiling
+from logs import init_logging
+
+jwt = JWTManager()
+migrate = Migrate()
+
+
+def register_blueprints(app):
+    # Imported here so CLI scripts and the job worker can build an app
+    # without loading every route module.
+    from auth import auth_bp
+    from owner_routes import owner_bp
+    from employee_routes import employee_bp
+    from api_routes import api_bp
+
+    app.register_blueprint(auth_bp, url_prefix='/auth')
+    app.register_blueprint(owner_bp, url_prefix='/owner')
+    app.register_blueprint(employee_bp, url_prefix='/employee')
+    app.register_blueprint(api_bp, url_prefix='/api')
+
+
+def register_commands(app):
+    from archive import archive_cli
+    from replica import replica_cli
+    from maintenance import maintenance_cli
+    from reconcile import inventory_cli
+    from datamigrations import data_migrate_cli
+    from shards import shards_cli
+
+    app.cli.add_command(archive_cli)
+    app.cli.add_command(replica_cli)
+    app.cli.add_command(maintenance_cli)
+    app.cli.add_command(inventory_cli)
+    app.cli.add_command(data_migrate_cli)
+    app.cli.add_command(shards_cli)
+
+
+def create_app(config=None, with_blueprints=True):
+    app = Flask(__name__)
+    app.config.from_object(config or Config)
+
+    init_logging(app)
+
+    db_uri = app.config['SQLALCHEMY_DATABASE_URI']
+    if db_uri.startswith('sqlite:///'):
+        os.makedirs(os.path.dirname(db_uri[len('sqlite:///'):]), exist_ok=True)
+
+    CORS(app, resources={r"/*": {"origins": app.config['CORS_ALLOWED_ORIGINS']}})
+    jwt.init_app(app)
+    db.init_app(app)
+    init_sqlite(app)
+    migrate.init_app(app, db)
+    init_compression(app)
+    limiter.init_app(app)
+    init_profiling(app)
+    cache.init_app(app)
+
+    from replica import init_replica
+    init_replica(app)
+    from shards import init_shards
+    init_shards(app)
+    from revocation import init_revocation
+    init_revocation(app, jwt)
+
+    import models  # noqa: F401
+    import sync  # noqa: F401  (version stamping for delta sync)
+    import pricing  # noqa: F401  (price history)
+    import softdelete  # noqa: F401  (hides deleted shops, products and employees)
+
+    register_commands(app)
+    if with_blueprints:
+        register_blueprints(app)
+
+    return app
+
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', debug=True)
+    create_app().run(host='0.0.0.0', debug=True)
@@ -0,0 +1,190 @@
+from datetime import datetime
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy.orm import aliased
+
+from db import db
+from jobs import job
+from models import ArchivedMonth, Sale
+from shards import each_shard, require_unsharded
+from money import from_minor, minor_sum
+
+# Closed months of Sale rows are moved into one table per month
+# (sale_archive_YYYYMM). They live outside db.metadata so create_all and
+# Alembic autogenerate leave them alone; ArchivedMonth is the registry.
+ARCHIVE_TABLE_PREFIX = 'sale_archive_'
+archive_metadata = db.MetaData()
+
+
+def month_key(value):
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m')
+    return str(value)[:7]
+
+
+def month_bounds(month):
+    try:
+        start = datetime.strptime(month, '%Y-%m')
+    except ValueError:
+        raise ValueError(f"Invalid month {month!r}, expected YYYY-MM")
+    end = start.replace(year=start.year + 1, month=1) if start.month == 12 else start.replace(month=start.month + 1)
+    return start, end
+
+
+def archive_table(month):
+    name = ARCHIVE_TABLE_PREFIX + month.replace('-', '')
+    table = archive_metadata.tables.get(name)
+    if table is None:
+        table = db.Table(
+            name, archive_metadata,
+            *[db.Column(column.name, column.type, primary_key=column.primary_key) for column in Sale.__table__.columns],
+            db.Index(f'ix_{name}_time', 'time'),
+            db.Index(f'ix_{name}_employee_id', 'employee_id')
+        )
+    return table
+
+
+def archived_months(date_from=None, date_to=None):
+    query = db.session.query(ArchivedMonth.month)
+    if date_from:
+        query = query.filter(ArchivedMonth.month >= month_key(date_from))
+    if date_to:
+        query = query.filter(ArchivedMonth.month <= month_key(date_to))
+    return [month for (month,) in query.order_by(ArchivedMonth.month)]
+
+
+def sales_entity(date_from=None, date_to=None):
+    """Sale, or an alias of Sale over the hot table plus every archived month
+    overlapping the date range. Use it wherever Sale would be queried."""
+    months = archived_months(date_from, date_to)
+    if not months:
+        return Sale
+
+    selects = []
+    for table in [Sale.__table__] + [archive_table(month) for month in months]:
+        part = db.select(*[table.c[column.name] for column in Sale.__table__.columns])
+        if date_from:
+            part = part.where(table.c.time >= date_from)
+        if date_to:
+            part = part.where(table.c.time <= date_to)
+        selects.append(part)
+    return aliased(Sale, db.union_all(*selects).subquery('sale_partitions'), adapt_on_names=True)
+
+
+def sales_total(employee_id=None):
+    hot_query = db.session.query(minor_sum(Sale.total))
+    if employee_id is not None:
+        hot_query = hot_query.filter(Sale.employee_id == employee_id)
+    # Every shard in sharded mode: an employee may have sold in several shops
+    parts = [part for part in each_shard(hot_query.scalar) if part is not None]
+    hot = sum(parts) if parts else None
+    if employee_id is None:
+        archived = db.session.query(minor_sum(ArchivedMonth.total)).scalar()
+    else:
+        archived = None
+        for month in archived_months():
+            table = archive_table(month)
+            part = db.session.execute(
+                db.select(minor_sum(table.c.total)).where(table.c.employee_id == employee_id)
+            ).scalar()
+            if part is not None:
+                archived = (archived or 0) + part
+    if hot is None and archived is None:
+        return None
+    return from_minor((hot or 0) + (archived or 0))
+
+
+def archive_month(month):
+    require_unsharded("Archiving sales")
+    start, end = month_bounds(month)
+    if end > datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0):
+        raise ValueError(f"{month} is not closed yet; only past months can be archived")
+
+    sale = Sale.__table__
+    table = archive_table(month)
+    columns = [column.name for column in sale.columns]
+    in_month = db.and_(sale.c.time >= start, sale.c.time < end)
+
+    table.create(db.session.connection(), checkfirst=True)
+    db.session.execute(table.insert().from_select(columns, db.select(*sale.c).where(in_month)))
+    moved = db.session.execute(sale.delete().where(in_month)).rowcount
+
+    row_count, quantity, total = db.session.execute(
+        db.select(db.func.count(), db.func.sum(table.c.quantity), minor_sum(table.c.total)).select_from(table)
+    ).one()
+    entry = ArchivedMonth.query.filter_by(month=month).first()
+    if entry is None:
+        entry = ArchivedMonth(month=month, table_name=table.name)
+        db.session.add(entry)
+    entry.row_count = row_count
+    entry.quantity = quantity or 0
+    entry.total = from_minor(total or 0)
+    entry.archived_at = datetime.utcnow()
+    db.session.commit()
+    return moved
+
+
+def restore_month(month):
+    require_unsharded("Restoring archived sales")
+    entry = ArchivedMonth.query.filter_by(month=month).first()
+    if entry is None:
+        raise LookupError(f"{month} is not archived")
+
+    table = archive_table(month)
+    columns = [column.name for column in Sale.__table__.columns]
+    restored = db.session.execute(
+        Sale.__table__.insert().from_select(columns, db.select(*[table.c[name] for name in columns]))
+    ).rowcount
+    db.session.delete(entry)
+    db.session.flush()
+    table.drop(db.session.connection())
+    db.session.commit()
+    return restored
+
+
+def closed_months(before=None):
+    """Months that still have rows in the hot table and are older than `before` (YYYY-MM)."""
+    require_unsharded("Archiving sales")
+    cutoff = before or datetime.utcnow().strftime('%Y-%m')
+    months = db.session.query(db.func.strftime('%Y-%m', Sale.time)).distinct().all()
+    return sorted(month for (month,) in months if month < cutoff)
+
+
+@job('sales_archive')
+def archive_job(payload, ctx):
+    months = payload.get('months') or closed_months(payload.get('before'))
+    moved = {}
+    for index, month in enumerate(months):
+        moved[month] = archive_month(month)
+        ctx.set_progress(index + 1, len(months))
+    return {'archived': moved}
+
+
+@click.group('sales-archive')
+def archive_cli():
+    """Move closed months of sales in and out of archive tables."""
+
+
+@archive_cli.command('archive')
+@click.argument('months', nargs=-1)
+@click.option('--before', help='Archive every month older than YYYY-MM (default: the current month).')
+@with_appcontext
+def archive_command(months, before):
+    for month in months or closed_months(before):
+        click.echo(f"{month}: archived {archive_month(month)} rows")
+
+
+@archive_cli.command('restore')
+@click.argument('months', nargs=-1, required=True)
+@with_appcontext
+def restore_command(months):
+    for month in months:
+        click.echo(f"{month}: restored {restore_month(month)} rows")
+
+
+@archive_cli.command('list')
+@with_appcontext
+def list_command():
+    for entry in ArchivedMonth.query.order_by(ArchivedMonth.month):
+        click.echo(f"{entry.month}  {entry.table_name}  rows={entry.row_count}  total={entry.total}")
@@ -0,0 +1,200 @@
+"""Optional ASGI entry point (pip install -r requirements-asgi.txt).
+
+    gunicorn -c gunicorn.conf.py           # with GUNICORN_WORKER_CLASS=uvicorn
+    uvicorn --factory asgi:create_asgi_app  # single process, for development
+
+The Flask app is wrapped for the event loop. Uploads and responses to slow
+clients are buffered by the server instead of holding a thread. The busiest
+read routes are served natively with async database access (aiosqlite or
+asyncpg), so a burst of them never waits for the WSGI thread pool. They still
+go through the Flask request pipeline (auth, rate limits, sparse fieldsets,
+compression, CORS), so responses match the sync routes byte for byte; the
+blocking steps of that pipeline (rate-limit and revocation queries) run on a
+worker thread, never on the event loop.
+"""
+import asyncio
+
+from asgiref.wsgi import WsgiToAsgi
+from flask import jsonify, request
+from flask_jwt_extended import get_jwt, verify_jwt_in_request
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+from werkzeug.test import EnvironBuilder
+
+from app import create_app
+from db import db
+from models import Inventory, Product, Shop, User
+from responses import list_response
+
+ASYNC_DRIVERS = {'sqlite': 'sqlite+aiosqlite', 'postgresql': 'postgresql+asyncpg'}
+ASYNC_ROUTES = {}
+
+
+def async_database_url(uri):
+    url = make_url(uri)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise RuntimeError(f"No async driver configured for {backend!r} databases")
+    return url.set(drivername=ASYNC_DRIVERS[backend])
+
+
+def async_route(path, role=None, refs=(), sharded=False):
+    """Serve GET `path` from an async handler(connection, claims) returning list rows.
+
+    Handlers that read shop-scoped tables are `sharded`: in sharded mode their
+    path is left to the sync route, which knows the shard files.
+    """
+    def register(handler):
+        ASYNC_ROUTES[path] = (handler, role, refs, sharded)
+        return handler
+    return register
+
+
+@async_route('/owner/inventory', role='owner', refs=('shop', 'product'), sharded=True)
+async def owner_inventory(connection, claims):
+    inventory, shop, product = Inventory.__table__, Shop.__table__, Product.__table__
+    query = db.select(
+        inventory.c.id, inventory.c.shop_id, inventory.c.product_id, inventory.c.current_stock,
+        shop.c.shop_id.label('shop_code'), shop.c.name.label('shop_name'),
+        product.c.name.label('product_name'), product.c.reorder_level
+    ).select_from(inventory.join(shop).join(product)).where(
+        shop.c.deleted_at.is_(None), product.c.deleted_at.is_(None)
+    ).order_by(inventory.c.id)
+
+    if request.args.get('shop_id'):
+        query = query.where(inventory.c.shop_id == request.args['shop_id'])
+    if request.args.get('view') == 'low':
+        query = query.where(inventory.c.current_stock <= product.c.reorder_level)
+    if request.args.get('product_name'):
+        query = query.where(product.c.name.ilike(f"%{request.args['product_name']}%"))
+
+    return [{
+        'id': row.id,
+        'shop_id': row.shop_id,
+        'product_id': row.product_id,
+        'current_stock': row.current_stock,
+        'shop': {'id': row.shop_id, 'shop_id': row.shop_code, 'name': row.shop_name},
+        'product': {'id': row.product_id, 'name': row.product_name, 'reorder_level': row.reorder_level}
+    } for row in await connection.execute(query)]
+
+
+@async_route('/owner/shops', role='owner')
+async def owner_shops(connection, claims):
+    shop = Shop.__table__
+    result = await connection.execute(
+        db.select(shop.c.id, shop.c.shop_id, shop.c.name, shop.c.manager).where(shop.c.deleted_at.is_(None))
+    )
+    return [dict(row._mapping) for row in result]
+
+
+@async_route('/employee/stock', sharded=True)
+async def employee_stock(connection, claims):
+    inventory, product, user = Inventory.__table__, Product.__table__, User.__table__
+    # Looked up like the sync route does: the shop_id claim is as old as the
+    # token and goes stale when the employee moves shop.
+    shop_id = (await connection.execute(
+        db.select(user.c.shop_id).where(user.c.username == claims['sub'])
+    )).scalar()
+    result = await connection.execute(
+        db.select(inventory.c.id, inventory.c.product_id, product.c.name, inventory.c.current_stock,
+                  product.c.reorder_level)
+        .select_from(inventory.join(product))
+        .where(inventory.c.shop_id == shop_id, product.c.deleted_at.is_(None))
+        .order_by(inventory.c.id)
+    )
+    return [{
+        'id': row.id,
+        'product_id': row.product_id,
+        'product_name': row.name,
+        'current_stock': row.current_stock,
+        'reorder_level': row.reorder_level
+    } for row in result]
+
+
+class AsyncApp:
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        self.wsgi = WsgiToAsgi(flask_app)
+        self.engine = create_async_engine(async_database_url(flask_app.config['SQLALCHEMY_DATABASE_URI']))
+        sharded = 'shards' in flask_app.extensions
+        self.routes = {path: route for path, route in ASYNC_ROUTES.items() if not (sharded and route[3])}
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http' and scope['method'] in ('GET', 'HEAD') and scope['path'] in self.routes:
+            await self._serve(self.routes[scope['path']], scope, send)
+        else:
+            await self.wsgi(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.engine.dispose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def _environ(self, scope):
+        client = scope.get('client')
+        return EnvironBuilder(
+            path=scope['path'],
+            base_url=f"{scope.get('scheme', 'http')}://{dict(scope['headers']).get(b'host', b'localhost').decode()}"
+                     f"{scope.get('root_path', '')}",
+            method=scope['method'],
+            query_string=scope['query_string'].decode('latin-1'),
+            headers=[(name.decode('latin-1'), value.decode('latin-1')) for name, value in scope['headers']],
+            environ_base={'REMOTE_ADDR': client[0] if client else None}
+        ).get_environ()
+
+    def _authorize(self, role):
+        # Runs on a worker thread with the request context copied over
+        response = self.flask_app.preprocess_request()
+        if response is not None:
+            return response, None
+        verify_jwt_in_request()
+        claims = get_jwt()
+        if role is not None and claims.get('role') != role:
+            return (jsonify(msg='Owners only!'), 403), None
+        return None, claims
+
+    def _finish(self, response):
+        app = self.flask_app
+        response = app.process_response(app.make_response(response))
+        # Hand the session's connection back here rather than in the teardown
+        # on the event loop
+        db.session.remove()
+        return response
+
+    async def _serve(self, route, scope, send):
+        handler, role, refs, _ = route
+        app = self.flask_app
+        # The request context lives in this connection's task, so it stays
+        # current across the awaits below without leaking into other requests.
+        # asyncio.to_thread copies it to the thread running the sync steps.
+        with app.request_context(self._environ(scope)):
+            try:
+                response, claims = await asyncio.to_thread(self._authorize, role)
+                if response is None:
+                    async with self.engine.connect() as connection:
+                        rows = await handler(connection, claims)
+                    response = list_response(rows, refs=refs)
+            except Exception as e:
+                try:
+                    response = app.handle_user_exception(e)
+                except Exception as unhandled:
+                    response = app.handle_exception(unhandled)
+            response = await asyncio.to_thread(self._finish, response)
+            body = b'' if scope['method'] == 'HEAD' else response.get_data()
+            headers = [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                       for name, value in response.headers.items()]
+            status = response.status_code
+
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': body})
+
+
+def create_asgi_app(config=None):
+    return AsyncApp(create_app(config))
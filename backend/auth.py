@@ -1,7 +1,8 @@
 from flask import Blueprint, request, jsonify
 from models import User
-from flask_jwt_extended import create_access_token
+from flask_jwt_extended import create_access_token, get_jwt, jwt_required
 from db import db
+from revocation import revoke_token
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -19,7 +20,16 @@ def login():
 
     user = User.query.filter_by(username=username).first()
     if user and user.check_password(password):
-        access_token = create_access_token(identity=username, additional_claims={'role': user.role})
+        access_token = create_access_token(identity=username, additional_claims={
+            'role': user.role, 'shop_id': user.shop_id, 'tv': user.token_version
+        })
         return jsonify(access_token=access_token)
 
     return jsonify({"msg": "Bad username or password"}), 401
+
+@auth_bp.route('/logout', methods=['POST'])
+@jwt_required()
+def logout():
+    revoke_token(get_jwt()['jti'])
+    db.session.commit()
+    return jsonify({"msg": "Logged out"})
@@ -0,0 +1,106 @@
+"""Hot-table query latency as sales history grows, with and without archival.
+
+    python benchmarks/bench_archive.py --rows-per-month 20000 --months 3 6 12 24
+
+For each history length a fresh SQLite file is filled with sales, then the
+dashboard total and a current-month /owner/sales style query are timed
+before and after archiving every closed month.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app  # noqa: E402
+from archive import archive_month, closed_months, sales_entity, sales_total  # noqa: E402
+from config import Config  # noqa: E402
+from db import db  # noqa: E402
+from models import Product, Sale, Shop, User  # noqa: E402
+
+
+def month_starts(count):
+    first = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    starts = [first]
+    for _ in range(count - 1):
+        starts.append((starts[-1] - timedelta(days=1)).replace(day=1))
+    return list(reversed(starts))
+
+
+def seed(months, rows_per_month):
+    shop = Shop(shop_id='B-1', name='Bench')
+    product = Product(product_id='B-P', name='Bench', cost_price=1, selling_price=2, reorder_level=0)
+    db.session.add_all([shop, product])
+    db.session.flush()
+    user = User(employee_id='B-E', name='Bench', role='employee', shop_id=shop.id, username='b@x.io', password='x')
+    db.session.add(user)
+    db.session.flush()
+
+    rows = []
+    for start in month_starts(months):
+        for i in range(rows_per_month):
+            rows.append({
+                'ticket_id': f'#B-{start:%Y%m}-{i}',
+                'time': start + timedelta(minutes=random.randrange(27 * 24 * 60)),
+                'product_id': product.id,
+                'quantity': 1,
+                'total': 2.0,
+                'employee_id': user.id
+            })
+    db.session.execute(Sale.__table__.insert(), rows)
+    db.session.commit()
+
+
+def timed(fn, repeat=5):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def current_month_sales():
+    date_from = datetime.utcnow().strftime('%Y-%m-01')
+    SaleRow = sales_entity(date_from)
+    return db.session.query(SaleRow).filter(SaleRow.time >= date_from).all()
+
+
+def run(months, rows_per_month):
+    with tempfile.TemporaryDirectory() as tmp:
+        class BenchConfig(Config):
+            SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+
+        app = create_app(BenchConfig, with_blueprints=False)
+        with app.app_context():
+            db.create_all()
+            seed(months, rows_per_month)
+            before = (timed(sales_total), timed(current_month_sales))
+            for month in closed_months():
+                archive_month(month)
+            after = (timed(sales_total), timed(current_month_sales))
+            db.session.remove()
+            db.engine.dispose()
+    return before, after
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows-per-month', type=int, default=20000)
+    parser.add_argument('--months', type=int, nargs='+', default=[3, 6, 12, 24])
+    args = parser.parse_args()
+
+    print(f"{'months':>6} {'rows':>9} | {'dashboard total':>17} {'archived':>9} | {'month query':>12} {'archived':>9}")
+    for months in args.months:
+        (total_before, query_before), (total_after, query_after) = run(months, args.rows_per_month)
+        print(f"{months:>6} {months * args.rows_per_month:>9} | {total_before:>14.2f} ms {total_after:>6.2f} ms"
+              f" | {query_before:>9.2f} ms {query_after:>6.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
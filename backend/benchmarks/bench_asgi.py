@@ -0,0 +1,161 @@
+"""Concurrent-connection capacity of the sync, gthread and ASGI (uvicorn) workers.
+
+    python benchmarks/bench_asgi.py --workers 2 --idle 50 --concurrency 50 --requests 2000
+
+For each worker class gunicorn is started with the shipped profile on a fresh
+SQLite file, then:
+
+  idle:       `--idle` clients open a connection and send half a request, the
+              way a till on a stalled uplink does, while one more client
+              tries a normal GET /employee/stock. Reports whether it was
+              served within 5s.
+  throughput: `--requests` GETs of /employee/stock from `--concurrency`
+              concurrent clients. Reports requests/s and p50/p95 latency.
+
+Needs requirements-asgi.txt (and httpx) installed.
+"""
+import argparse
+import asyncio
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from flask_jwt_extended import create_access_token  # noqa: E402
+
+from app import create_app  # noqa: E402
+from config import Config  # noqa: E402
+from db import db  # noqa: E402
+from models import Inventory, Product, Shop, User  # noqa: E402
+
+
+def seed(database_url):
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = database_url
+        BCRYPT_ROUNDS = 4
+
+    app = create_app(BenchConfig, with_blueprints=False)
+    with app.app_context():
+        db.create_all()
+        shop = Shop(shop_id='B-1', name='Bench')
+        db.session.add(shop)
+        db.session.flush()
+        for index in range(50):
+            product = Product(product_id=f'B-P{index}', name=f'Bench {index}', cost_price=1, selling_price=2,
+                              reorder_level=5)
+            db.session.add(product)
+            db.session.flush()
+            db.session.add(Inventory(shop_id=shop.id, product_id=product.id, current_stock=index))
+        user = User(employee_id='B-E', name='Bench', role='employee', shop_id=shop.id, username='b@example.com')
+        user.set_password('x')
+        db.session.add(user)
+        db.session.commit()
+        token = create_access_token(identity=user.username,
+                                    additional_claims={'role': 'employee', 'shop_id': shop.id})
+        db.engine.dispose()
+    return token
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(worker_class, workers, port, env):
+    env = dict(env, GUNICORN_WORKER_CLASS=worker_class, GUNICORN_WORKERS=str(workers),
+               GUNICORN_BIND=f'127.0.0.1:{port}', GUNICORN_TIMEOUT='120')
+    process = subprocess.Popen([sys.executable, '-m', 'gunicorn', '--config', 'gunicorn.conf.py'],
+                               cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.2).close()
+            return process
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"{worker_class} server did not start")
+
+
+async def idle_probe(port, idle, headers):
+    writers = []
+    for _ in range(idle):
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(b'GET /employee/stock HTTP/1.1\r\nHost: bench\r\n')  # headers never finished
+        await writer.drain()
+        writers.append(writer)
+    await asyncio.sleep(0.5)
+    started = time.perf_counter()
+    try:
+        async with httpx.AsyncClient(base_url=f'http://127.0.0.1:{port}', timeout=5) as client:
+            response = await client.get('/employee/stock', headers=headers)
+        result = f"served in {(time.perf_counter() - started) * 1000:.0f} ms (HTTP {response.status_code})"
+    except httpx.TimeoutException:
+        result = "blocked (no response within 5s)"
+    for writer in writers:
+        writer.close()
+    return result
+
+
+async def throughput(port, concurrency, total, headers):
+    latencies = []
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=f'http://127.0.0.1:{port}', limits=limits, timeout=60) as client:
+        queue = iter(range(total))
+
+        async def client_loop():
+            for _ in queue:
+                started = time.perf_counter()
+                response = await client.get('/employee/stock', headers=headers)
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    latencies.sort()
+    return total / elapsed, statistics.median(latencies) * 1000, latencies[int(len(latencies) * 0.95)] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--idle', type=int, default=50)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--classes', nargs='+', default=['sync', 'gthread', 'uvicorn'])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        token = seed(database_url)
+        headers = {'Authorization': f'Bearer {token}'}
+        env = dict(os.environ, DATABASE_URL=database_url, RATELIMIT_ENABLED='false', CACHE_BACKEND='memory',
+                   GUNICORN_PIDFILE=os.path.join(tmp, 'gunicorn.pid'))
+
+        for worker_class in args.classes:
+            port = free_port()
+            process = start_server(worker_class, args.workers, port, env)
+            try:
+                idle = asyncio.run(idle_probe(port, args.idle, headers))
+                rps, p50, p95 = asyncio.run(throughput(port, args.concurrency, args.requests, headers))
+            finally:
+                process.send_signal(signal.SIGTERM)
+                process.wait(timeout=30)
+            print(f"{worker_class:>8}: {args.idle} idle connections -> {idle}")
+            print(f"{'':>8}  {args.concurrency} concurrent clients -> {rps:7.0f} req/s, "
+                  f"p50 {p50:6.1f} ms, p95 {p95:6.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+"""Sale writes from several shops at once, alone and with owner reports alongside.
+
+    python benchmarks/bench_contention.py --shops 1 4 --reporters 0 1 --journal-mode WAL DELETE --layout single sharded
+
+One process per shop posts 3-line tickets to POST /employee/sales as fast as it
+can on a shared SQLite file, while `--reporters` processes run the owner margin
+report over `--history` older sale lines in a loop. Reports tickets/s, p50/p99
+write latency and failed writes ("database is locked") per combination.
+
+With --reporters 0 only writers compete. SQLite has one write lock per file in
+every journal mode, so going from 1 to N shops shows how much each shop's
+tills wait on the others. With --layout sharded every shop writes its own
+file (SHARDS_DIR); the history is copied into the shards as `flask shards
+split` would.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from multiprocessing import Event, Process, Queue
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask_jwt_extended import create_access_token  # noqa: E402
+
+from app import create_app  # noqa: E402
+from config import Config  # noqa: E402
+from db import db  # noqa: E402
+from models import Product, Sale, Shop, User  # noqa: E402
+from shards import shards_enabled, split_central  # noqa: E402
+
+
+def make_config(database_url, journal_mode, shards_dir=None):
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = database_url
+        SQLITE_PRAGMAS = {'journal_mode': journal_mode, 'busy_timeout': 5000}
+        SHARDS_DIR = shards_dir
+        RATELIMIT_ENABLED = False
+        CACHE_ENABLED = False
+        LOG_STREAM = False
+    return BenchConfig
+
+
+def seed(config, shops, history):
+    app = create_app(config, with_blueprints=False)
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([Product(product_id=f'B-P{index}', name=f'Bench {index}', cost_price=1,
+                                    selling_price=2, reorder_level=0) for index in range(3)])
+        tokens = []
+        for index in range(shops):
+            shop = Shop(shop_id=f'B-{index}', name='Bench')
+            db.session.add(shop)
+            db.session.flush()
+            db.session.add(User(employee_id=f'B-E{index}', name='Bench', role='employee', shop_id=shop.id,
+                                username=f'b{index}@example.com', password='x'))
+            tokens.append(create_access_token(identity=f'b{index}@example.com',
+                                              additional_claims={'role': 'employee', 'shop_id': shop.id}))
+        db.session.add(User(employee_id='B-OWNER', name='Owner', role='owner', username='owner@example.com',
+                            password='x'))
+        db.session.flush()
+        start = datetime(2025, 1, 1)
+        for offset in range(0, history, 50000):
+            db.session.execute(Sale.__table__.insert(), [
+                {'ticket_id': f'#H-{index}', 'time': start + timedelta(seconds=index), 'product_id': index % 3 + 1,
+                 'quantity': 1, 'total': 2.0, 'employee_id': 1, 'unit_cost': 1.0, 'unit_price': 2.0}
+                for index in range(offset, min(offset + 50000, history))
+            ], bind_arguments={'bind': db.engine})
+        db.session.commit()
+        if shards_enabled():
+            # The history was written to the primary, as before sharded mode;
+            # it was sold by shop 1's employee
+            split_central()
+            app.extensions['shards'].dispose()
+        owner = create_access_token(identity='owner@example.com', additional_claims={'role': 'owner'})
+        db.engine.dispose()
+    return tokens, owner
+
+
+def till(config, token, stop, results):
+    client = create_app(config).test_client()
+    headers = {'Authorization': f'Bearer {token}'}
+    payload = {'items': [{'product_id': product_id, 'quantity': 1} for product_id in (1, 2, 3)]}
+    latencies, failures = [], 0
+    while not stop.is_set():
+        started = time.perf_counter()
+        if client.post('/employee/sales', json=payload, headers=headers).status_code == 201:
+            latencies.append(time.perf_counter() - started)
+        else:
+            failures += 1
+    results.put((latencies, failures))
+
+
+def reporter(config, token, stop):
+    client = create_app(config).test_client()
+    headers = {'Authorization': f'Bearer {token}'}
+    while not stop.is_set():
+        client.get('/owner/reports/margin?group_by=day', headers=headers)
+
+
+def run(layout, journal_mode, shops, reporters, seconds, history):
+    with tempfile.TemporaryDirectory() as tmp:
+        config = make_config(f"sqlite:///{os.path.join(tmp, 'bench.db')}", journal_mode,
+                             os.path.join(tmp, 'shards') if layout == 'sharded' else None)
+        tokens, owner = seed(config, shops, history)
+        stop, results = Event(), Queue()
+        processes = [Process(target=till, args=(config, token, stop, results)) for token in tokens]
+        processes += [Process(target=reporter, args=(config, owner, stop)) for _ in range(reporters)]
+        for process in processes:
+            process.start()
+        time.sleep(seconds)
+        stop.set()
+        collected = [results.get() for _ in tokens]
+        for process in processes:
+            process.join()
+
+    latencies = sorted(latency for part, _ in collected for latency in part)
+    failures = sum(failed for _, failed in collected)
+    p99 = latencies[int(len(latencies) * 0.99)] * 1000 if latencies else 0
+    p50 = statistics.median(latencies) * 1000 if latencies else 0
+    print(f"{layout:>7} {journal_mode:>8} {shops:>5} {reporters:>9} | {len(latencies) / seconds:9.0f} {p50:7.1f} "
+          f"{p99:8.1f} {failures:>6}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--shops', type=int, nargs='+', default=[1, 4])
+    parser.add_argument('--reporters', type=int, nargs='+', default=[0, 1])
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--history', type=int, default=200000)
+    parser.add_argument('--journal-mode', nargs='+', default=['WAL', 'DELETE'])
+    parser.add_argument('--layout', nargs='+', choices=['single', 'sharded'], default=['single'])
+    args = parser.parse_args()
+    print(f"{'layout':>7} {'journal':>8} {'shops':>5} {'reporters':>9} | {'tickets/s':>9} {'p50 ms':>7} {'p99 ms':>8} "
+          f"{'failed':>6}")
+    for layout in args.layout:
+        for journal_mode in args.journal_mode:
+            for reporters in args.reporters:
+                for shops in args.shops:
+                    run(layout, journal_mode, shops, reporters, args.seconds, args.history)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+"""Sale writes while a backfill runs: one UPDATE over the table vs chunked.
+
+    python benchmarks/bench_datamigration.py --rows 500000
+
+A fresh SQLite file (WAL) is seeded with `--rows` sale lines that have no
+ticket header. A till process then posts tickets to POST /employee/sales
+while the headers are backfilled, first with the single INSERT ... SELECT
+plus UPDATE the ticket-header schema migration ran, then with the
+ticket_headers data migration. Reports the backfill time and the till's
+p50/max latency and failed writes during it.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from multiprocessing import Event, Process, Queue
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask_jwt_extended import create_access_token  # noqa: E402
+
+from app import create_app  # noqa: E402
+from config import Config  # noqa: E402
+from datamigrations import run_data_migration  # noqa: E402
+from db import db  # noqa: E402
+from models import DataMigration, Product, Sale, Shop, Ticket, User  # noqa: E402
+
+
+def make_config(database_url):
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = database_url
+        RATELIMIT_ENABLED = False
+        CACHE_ENABLED = False
+    return BenchConfig
+
+
+def seed(config, rows):
+    app = create_app(config, with_blueprints=False)
+    with app.app_context():
+        db.create_all()
+        db.session.add(Shop(shop_id='B-1', name='Bench'))
+        db.session.add(Product(product_id='B-P1', name='Bench', cost_price=1, selling_price=2, reorder_level=0))
+        db.session.add(User(employee_id='B-E1', name='Bench', role='employee', shop_id=1, username='b@example.com',
+                            password='x'))
+        db.session.commit()
+        reset(rows)
+        token = create_access_token(identity='b@example.com', additional_claims={'role': 'employee', 'shop_id': 1})
+        db.engine.dispose()
+    return token
+
+
+def reset(rows):
+    db.session.execute(db.delete(Sale.__table__))
+    db.session.execute(db.delete(Ticket.__table__))
+    db.session.execute(db.delete(DataMigration.__table__))
+    start = datetime(2025, 1, 1)
+    for offset in range(0, rows, 50000):
+        db.session.execute(Sale.__table__.insert(), [
+            {'ticket_id': f'#L-{index // 3}', 'time': start + timedelta(seconds=index), 'product_id': 1,
+             'quantity': 1, 'total': 2.0, 'employee_id': 1}
+            for index in range(offset, min(offset + 50000, rows))
+        ])
+    db.session.commit()
+
+
+def till(config, token, stop, results):
+    client = create_app(config).test_client()
+    headers = {'Authorization': f'Bearer {token}'}
+    latencies, failures = [], 0
+    while not stop.is_set():
+        started = time.perf_counter()
+        if client.post('/employee/sales', json={'items': [{'product_id': 1, 'quantity': 1}]},
+                       headers=headers).status_code == 201:
+            latencies.append(time.perf_counter() - started)
+        else:
+            failures += 1
+        time.sleep(0.01)
+    results.put((latencies, failures))
+
+
+def single_statement():
+    db.session.execute(db.text(
+        'INSERT INTO ticket (ticket_id, time, shop_id, employee_id, line_count, total) '
+        'SELECT sale.ticket_id, MIN(sale.time), MIN(u.shop_id), MIN(sale.employee_id), COUNT(*), SUM(sale.total) '
+        'FROM sale JOIN "user" u ON u.id = sale.employee_id WHERE sale.ticket_pk IS NULL '
+        'GROUP BY sale.ticket_id'
+    ))
+    db.session.execute(db.text(
+        'UPDATE sale SET ticket_pk = (SELECT ticket.id FROM ticket WHERE ticket.ticket_id = sale.ticket_id) '
+        'WHERE ticket_pk IS NULL'
+    ))
+    db.session.commit()
+
+
+def measure(config, token, backfill):
+    stop, results = Event(), Queue()
+    process = Process(target=till, args=(config, token, stop, results))
+    process.start()
+    time.sleep(1)
+    started = time.perf_counter()
+    backfill()
+    seconds = time.perf_counter() - started
+    stop.set()
+    latencies, failures = results.get()
+    process.join()
+    return seconds, latencies, failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=500000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        config = make_config(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        token = seed(config, args.rows)
+        app = create_app(config, with_blueprints=False)
+        print(f"{'backfill':>16} {'seconds':>8} | {'tickets':>7} {'p50 ms':>7} {'max ms':>8} {'failed':>6}")
+        for label, backfill in (('single UPDATE', single_statement),
+                                ('chunked', lambda: run_data_migration('ticket_headers'))):
+            with app.app_context():
+                reset(args.rows)
+                seconds, latencies, failures = measure(config, token, backfill)
+            print(f"{label:>16} {seconds:>8.1f} | {len(latencies):>7} "
+                  f"{statistics.median(latencies) * 1000 if latencies else 0:>7.1f} "
+                  f"{max(latencies, default=0) * 1000:>8.1f} {failures:>6}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""Cost of a log call on the request thread: inline handlers vs the queue.
+
+    python benchmarks/bench_logging.py --records 100000 --threads 1 8
+
+Each thread logs `--records` / threads INFO lines with two arguments to a
+file. 'inline' is the setup app.py used to have: basicConfig's root handler
+plus the app logger's own StreamHandler, both formatting and writing on the
+calling thread. 'queue' is logs.py's pipeline. Reports the calling threads'
+wall time and p99 per call; for the queue, also how long the listener needed
+to write everything out.
+"""
+import argparse
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config  # noqa: E402
+from logs import TEXT_FORMAT, start_logging, stop_logging  # noqa: E402
+
+
+def inline(path):
+    root = logging.getLogger()
+    handlers = [logging.FileHandler(path), logging.FileHandler(path)]
+    handlers[0].setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+    handlers[1].setFormatter(logging.Formatter(TEXT_FORMAT))
+    root.addHandler(handlers[0])
+    logging.getLogger('app').addHandler(handlers[1])
+
+    def stop():
+        root.removeHandler(handlers[0])
+        logging.getLogger('app').removeHandler(handlers[1])
+        for handler in handlers:
+            handler.close()
+    return stop
+
+
+def queued(path):
+    start_logging({key: getattr(Config, key) for key in dir(Config) if key.startswith('LOG_')} | {
+        'LOG_STREAM': False, 'LOG_FILE': path, 'LOG_FILE_MAX_BYTES': 0, 'LOG_QUEUE_SIZE': 0
+    })
+    return stop_logging
+
+
+def run(records, threads):
+    logger = logging.getLogger('app')
+    timings = []
+
+    def worker():
+        own = []
+        for index in range(records // threads):
+            started = time.perf_counter()
+            logger.info('Sale %s posted for shop %s', index, 7)
+            own.append(time.perf_counter() - started)
+        timings.extend(own)
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return time.perf_counter() - started, statistics.quantiles(timings, n=100)[98]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--records', type=int, default=100000)
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 8])
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.INFO)
+    print(f"{'pipeline':>8} {'threads':>7} | {'callers s':>9} {'p99 us':>7} | {'drained s':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for threads in args.threads:
+            for label, setup in (('inline', inline), ('queue', queued)):
+                stop = setup(os.path.join(tmp, f'{label}-{threads}.log'))
+                seconds, p99 = run(args.records, threads)
+                started = time.perf_counter()
+                stop()
+                drained = seconds + time.perf_counter() - started
+                print(f"{label:>8} {threads:>7} | {seconds:>9.2f} {p99 * 1e6:>7.1f} | {drained:>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
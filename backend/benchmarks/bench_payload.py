@@ -0,0 +1,97 @@
+"""Payload size and latency of /owner/inventory and /owner/sales variants.
+
+    python benchmarks/bench_payload.py --shops 20 --products 300
+
+Seeds an in-memory database and compares the default response with sparse
+fieldsets, the normalized shape and gzip/brotli encodings. With the
+defaults (20 shops x 300 products), /owner/inventory came to 1065.4 KiB by
+default, 351.6 KiB with fields, 506.4 KiB normalized, 68.0 KiB gzipped and
+30.3 KiB normalized and gzipped.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask_jwt_extended import create_access_token  # noqa: E402
+
+from app import create_app  # noqa: E402
+from config import TestConfig  # noqa: E402
+from db import db  # noqa: E402
+from models import Inventory, Product, Sale, Shop, User  # noqa: E402
+from responses import brotli  # noqa: E402
+
+
+def seed(shops, products):
+    shop_rows = [Shop(shop_id=f'S-{i}', name=f'Shop number {i}', manager='Manager') for i in range(shops)]
+    product_rows = [Product(product_id=f'P-{i}', name=f'Eau de parfum {i}', category='Perfume',
+                            cost_price=10, selling_price=25, reorder_level=5) for i in range(products)]
+    db.session.add_all(shop_rows + product_rows)
+    db.session.flush()
+    db.session.execute(Inventory.__table__.insert(), [
+        {'shop_id': shop.id, 'product_id': product.id, 'current_stock': 10}
+        for shop in shop_rows for product in product_rows
+    ])
+    users = []
+    for shop in shop_rows:
+        user = User(employee_id=f'E-{shop.id}', name=f'Seller {shop.id}', role='employee',
+                    shop_id=shop.id, username=f'seller{shop.id}@example.com', password='x')
+        users.append(user)
+    owner = User(employee_id='OWNER', name='Owner', role='owner', username='owner@example.com', password='x')
+    db.session.add_all(users + [owner])
+    db.session.flush()
+    start = datetime(2025, 1, 1)
+    db.session.execute(Sale.__table__.insert(), [
+        {'ticket_id': f'#T-{i}', 'time': start + timedelta(minutes=i), 'product_id': product_rows[i % products].id,
+         'quantity': 1, 'total': 25, 'employee_id': users[i % shops].id}
+        for i in range(shops * products)
+    ])
+    db.session.commit()
+    return create_access_token(identity='owner@example.com', additional_claims={'role': 'owner'})
+
+
+def measure(client, url, headers, repeat=5):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = client.get(url, headers=headers)
+        samples.append(time.perf_counter() - start)
+    return len(response.data), statistics.median(samples) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--shops', type=int, default=20)
+    parser.add_argument('--products', type=int, default=300)
+    args = parser.parse_args()
+
+    app = create_app(TestConfig)
+    with app.app_context():
+        db.create_all()
+        token = seed(args.shops, args.products)
+    client = app.test_client()
+    auth = {'Authorization': f'Bearer {token}'}
+
+    variants = [('default', '', {}),
+                ('fields', 'fields=id,current_stock,shop_id,product_id', {}),
+                ('normalized', 'shape=normalized', {}),
+                ('default + gzip', '', {'Accept-Encoding': 'gzip'}),
+                ('normalized + gzip', 'shape=normalized', {'Accept-Encoding': 'gzip'})]
+    if brotli is not None:
+        variants.append(('normalized + br', 'shape=normalized', {'Accept-Encoding': 'br'}))
+
+    for path in ('/owner/inventory', '/owner/sales'):
+        print(f"\n{path} ({args.shops * args.products} rows)")
+        for label, query, extra in variants:
+            if path == '/owner/sales' and query.startswith('fields='):
+                query = 'fields=id,time,quantity,total,shop.shop_id'
+            size, latency = measure(client, f'{path}?{query}', {**auth, **extra})
+            print(f"  {label:20s} {size / 1024:9.1f} KiB {latency:9.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
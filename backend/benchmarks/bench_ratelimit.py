@@ -0,0 +1,65 @@
+"""Per-request cost of the rate limiter's before_request check.
+
+    python benchmarks/bench_ratelimit.py --iterations 20000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask_jwt_extended import create_access_token  # noqa: E402
+
+from app import create_app  # noqa: E402
+from config import TestConfig  # noqa: E402
+from ratelimit import limiter  # noqa: E402
+
+
+def bench(backend, method, path, authenticated, iterations, sqlite_path):
+    class BenchConfig(TestConfig):
+        RATELIMIT_ENABLED = True
+        RATELIMIT_BACKEND = backend
+        RATELIMIT_SQLITE_PATH = sqlite_path
+        RATELIMITS = {
+            'owner.get_sales': {'rate': '1000000/second', 'burst': 1000000, 'key': 'identity'},
+            'auth.login': {'rate': '1000000/second', 'burst': 1000000, 'key': 'ip'},
+        }
+
+    app = create_app(BenchConfig)
+    with app.app_context():
+        token = create_access_token(identity='owner@example.com', additional_claims={'role': 'owner'})
+    headers = {'Authorization': f'Bearer {token}'} if authenticated else {}
+
+    with app.test_request_context(path, method=method, headers=headers, json={'username': 'owner'},
+                                  environ_base={'REMOTE_ADDR': '10.0.0.1'}):
+        for _ in range(100):
+            limiter.check()
+        start = time.perf_counter()
+        for _ in range(iterations):
+            limiter.check()
+        return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=20000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sqlite_path = os.path.join(tmp, 'ratelimit.db')
+        cases = [
+            ('no rule for route', 'memory', 'GET', '/api/products', False),
+            ('ip key, memory', 'memory', 'POST', '/auth/login', False),
+            ('identity key, memory', 'memory', 'GET', '/owner/sales', True),
+            ('ip key, sqlite', 'sqlite', 'POST', '/auth/login', False),
+            ('identity key, sqlite', 'sqlite', 'GET', '/owner/sales', True),
+        ]
+        for label, backend, method, path, authenticated in cases:
+            micros = bench(backend, method, path, authenticated, args.iterations, sqlite_path)
+            print(f"{label:24s} {micros:8.2f} us/request")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""Inventory reconciliation time over a large sales history.
+
+    python benchmarks/bench_reconcile.py --sales 1000000 --shops 20 --products 200 --workers 1 2 4
+
+A fresh SQLite file is seeded with stock-ins, tickets and sale lines spread
+over the shops, then reconcile_inventory() is timed for each worker count.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app  # noqa: E402
+from config import Config  # noqa: E402
+from db import db  # noqa: E402
+from models import Inventory, Product, Sale, Shop, StockIn, Ticket, User  # noqa: E402
+from reconcile import reconcile_inventory  # noqa: E402
+
+
+def seed(sales, shops, products):
+    db.session.execute(Shop.__table__.insert(), [
+        {'id': shop, 'shop_id': f'B-{shop}', 'name': 'Bench'} for shop in range(1, shops + 1)
+    ])
+    db.session.execute(Product.__table__.insert(), [
+        {'id': product, 'product_id': f'B-P{product}', 'name': 'Bench', 'cost_price': 1, 'selling_price': 2,
+         'reorder_level': 0, 'version': 0} for product in range(1, products + 1)
+    ])
+    db.session.execute(User.__table__.insert(), [
+        {'id': shop, 'employee_id': f'B-E{shop}', 'name': 'Bench', 'role': 'employee', 'shop_id': shop,
+         'username': f'b{shop}@x.io', 'password': 'x'} for shop in range(1, shops + 1)
+    ])
+    db.session.execute(StockIn.__table__.insert(), [
+        {'stock_in_id': f'B-SI-{shop}-{product}', 'date': datetime(2025, 1, 1), 'shop_id': shop,
+         'product_id': product, 'quantity': 100000} for shop in range(1, shops + 1) for product in range(1, products + 1)
+    ])
+
+    start = datetime(2025, 1, 1)
+    tickets_per_batch, lines_per_ticket = 10000, 4
+    ticket_id = 0
+    sold = {}
+    for offset in range(0, sales, tickets_per_batch * lines_per_ticket):
+        tickets, lines = [], []
+        for _ in range(min(tickets_per_batch, (sales - offset) // lines_per_ticket or 1)):
+            ticket_id += 1
+            shop = random.randint(1, shops)
+            time_ = start + timedelta(minutes=ticket_id)
+            tickets.append({'id': ticket_id, 'ticket_id': f'#B-{ticket_id}', 'time': time_, 'shop_id': shop,
+                            'employee_id': shop, 'line_count': lines_per_ticket, 'total': 8.0})
+            for _ in range(lines_per_ticket):
+                product = random.randint(1, products)
+                sold[shop, product] = sold.get((shop, product), 0) + 1
+                lines.append({'ticket_id': f'#B-{ticket_id}', 'ticket_pk': ticket_id, 'time': time_,
+                              'product_id': product, 'quantity': 1, 'total': 2.0, 'employee_id': shop})
+        db.session.execute(Ticket.__table__.insert(), tickets)
+        db.session.execute(Sale.__table__.insert(), lines)
+
+    # Every hundredth pair drifts so the report has something to show
+    db.session.execute(Inventory.__table__.insert(), [
+        {'shop_id': shop, 'product_id': product, 'version': 0,
+         'current_stock': 100000 - sold.get((shop, product), 0) + (1 if (shop * products + product) % 100 == 0 else 0)}
+        for shop in range(1, shops + 1) for product in range(1, products + 1)
+    ])
+    db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sales', type=int, default=1000000)
+    parser.add_argument('--shops', type=int, default=20)
+    parser.add_argument('--products', type=int, default=200)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        class BenchConfig(Config):
+            SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+
+        app = create_app(BenchConfig, with_blueprints=False)
+        with app.app_context():
+            db.create_all()
+            started = time.perf_counter()
+            seed(args.sales, args.shops, args.products)
+            print(f"seeded {args.sales} sale lines in {time.perf_counter() - started:.1f}s")
+            for workers in args.workers:
+                report = reconcile_inventory(workers=workers)
+                print(f"workers={workers}: {report['seconds']:.2f}s, {report['pairs']} pairs, "
+                      f"{len(report['discrepancies'])} discrepancies")
+            db.session.remove()
+            db.engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+"""Measure cold import + create_app() time in fresh interpreters.
+
+    python benchmarks/bench_startup.py --runs 10
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SNIPPET = """
+import time
+start = time.perf_counter()
+from app import create_app
+from config import TestConfig
+app = create_app(TestConfig, with_blueprints={with_blueprints})
+print(time.perf_counter() - start)
+"""
+
+
+def measure(with_blueprints, runs):
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", SNIPPET.format(with_blueprints=with_blueprints)],
+            cwd=BACKEND_DIR, check=True, capture_output=True, text=True
+        ).stdout
+        samples.append(float(output.strip().splitlines()[-1]))
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    for label, with_blueprints in (("full app", True), ("no blueprints (CLI/worker)", False)):
+        samples = measure(with_blueprints, args.runs)
+        print(f"{label:28s} median {statistics.median(samples) * 1000:7.1f} ms"
+              f"  min {min(samples) * 1000:7.1f} ms  max {max(samples) * 1000:7.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
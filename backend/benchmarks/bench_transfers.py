@@ -0,0 +1,86 @@
+"""Stock transfer throughput for large rebalancing batches.
+
+    python benchmarks/bench_transfers.py --shops 50 --products 5000 --lines 100 1000 5000
+
+A fresh SQLite file is seeded with stock for every shop/product. Each batch
+size is then moved once with transfer_stock() and once the way it was done
+before transfers existed: an ORM read-modify-write of each side, committed
+per product like two manual stock-in calls.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app  # noqa: E402
+from config import Config  # noqa: E402
+from db import db  # noqa: E402
+from models import Inventory, Product, Shop  # noqa: E402
+from transfers import transfer_stock  # noqa: E402
+
+
+def seed(shops, products):
+    db.session.execute(Shop.__table__.insert(), [
+        {'id': shop, 'shop_id': f'B-{shop}', 'name': 'Bench'} for shop in range(1, shops + 1)
+    ])
+    db.session.execute(Product.__table__.insert(), [
+        {'id': product, 'product_id': f'B-P{product}', 'name': 'Bench', 'cost_price': 1, 'selling_price': 2,
+         'reorder_level': 0, 'version': 0} for product in range(1, products + 1)
+    ])
+    db.session.execute(Inventory.__table__.insert(), [
+        {'shop_id': shop, 'product_id': product, 'current_stock': 1000, 'version': 0}
+        for shop in range(1, shops + 1) for product in range(1, products + 1)
+    ])
+    db.session.commit()
+
+
+def per_line_moves(from_shop, to_shop, quantities):
+    for product_id, quantity in quantities.items():
+        source = Inventory.query.filter_by(shop_id=from_shop, product_id=product_id).first()
+        source.current_stock -= quantity
+        db.session.commit()
+        target = Inventory.query.filter_by(shop_id=to_shop, product_id=product_id).first()
+        target.current_stock += quantity
+        db.session.commit()
+
+
+def timed(run):
+    started = time.perf_counter()
+    run()
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--shops', type=int, default=50)
+    parser.add_argument('--products', type=int, default=5000)
+    parser.add_argument('--lines', type=int, nargs='+', default=[100, 1000, 5000])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        class BenchConfig(Config):
+            SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+            TRANSFER_MAX_LINES = max(args.lines)
+            CACHE_BACKEND = 'memory'
+
+        app = create_app(BenchConfig, with_blueprints=False)
+        with app.app_context():
+            db.create_all()
+            seed(args.shops, args.products)
+            print(f"{args.shops} shops x {args.products} products")
+            print(f"{'lines':>6} | {'transfer':>10} {'lines/s':>9} | {'per line':>10} {'lines/s':>9}")
+            for lines in args.lines:
+                quantities = {product: 1 for product in range(1, min(lines, args.products) + 1)}
+                batch = timed(lambda: transfer_stock(1, 2, quantities))
+                naive = timed(lambda: per_line_moves(3, 4, quantities))
+                print(f"{len(quantities):>6} | {batch * 1000:>7.1f} ms {len(quantities) / batch:>9.0f} | "
+                      f"{naive * 1000:>7.1f} ms {len(quantities) / naive:>9.0f}")
+            db.session.remove()
+            db.engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
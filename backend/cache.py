@@ -0,0 +1,256 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+
+class MemoryTier:
+    """LRU of (value, expires, tag_versions) per process."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._tags = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, value, expires, tag_versions):
+        with self._lock:
+            self._entries[key] = (value, expires, tag_versions)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def tag_versions(self, tags):
+        with self._lock:
+            return {tag: self._tags.get(tag, 0) for tag in tags}
+
+    def bump_tags(self, tags):
+        with self._lock:
+            for tag in tags:
+                self._tags[tag] = self._tags.get(tag, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SqliteTier:
+    """Entries and tag versions in a SQLite file shared by every worker on the host.
+
+    Values are stored as JSON, so only JSON-serialisable results can be shared.
+    Like the rate-limit buckets, this is throwaway state and runs with
+    synchronous=OFF.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=OFF')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS cache_entry '
+                '(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL, tags TEXT NOT NULL)'
+            )
+            connection.execute('CREATE TABLE IF NOT EXISTS cache_tag (tag TEXT PRIMARY KEY, version INTEGER NOT NULL)')
+            self._local.connection = connection
+        return connection
+
+    def get(self, key):
+        row = self._connection().execute(
+            'SELECT value, expires, tags FROM cache_entry WHERE key = ? AND expires > ?', (key, time.time())
+        ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1], json.loads(row[2])
+
+    def set(self, key, value, expires, tag_versions):
+        self._connection().execute(
+            'INSERT OR REPLACE INTO cache_entry (key, value, expires, tags) VALUES (?, ?, ?, ?)',
+            (key, json.dumps(value), expires, json.dumps(tag_versions))
+        )
+
+    def tag_versions(self, tags):
+        if not tags:
+            return {}
+        tags = list(tags)
+        rows = self._connection().execute(
+            f"SELECT tag, version FROM cache_tag WHERE tag IN ({','.join('?' * len(tags))})", tags
+        ).fetchall()
+        versions = dict(rows)
+        return {tag: versions.get(tag, 0) for tag in tags}
+
+    def bump_tags(self, tags):
+        connection = self._connection()
+        connection.executemany(
+            'INSERT INTO cache_tag (tag, version) VALUES (?, 1) '
+            'ON CONFLICT(tag) DO UPDATE SET version = version + 1',
+            [(tag,) for tag in tags]
+        )
+        connection.execute('DELETE FROM cache_entry WHERE expires <= ?', (time.time(),))
+
+    def clear(self):
+        self._connection().execute('DELETE FROM cache_entry')
+
+    def __len__(self):
+        return self._connection().execute('SELECT COUNT(*) FROM cache_entry').fetchone()[0]
+
+
+class _CacheState:
+    def __init__(self, memory, shared, default_ttl):
+        self.memory = memory
+        self.shared = shared
+        self.default_ttl = default_ttl
+        self.stats = {'memory_hits': 0, 'shared_hits': 0, 'misses': 0, 'invalidations': 0}
+        self.lock = threading.Lock()
+
+    def count(self, name):
+        with self.lock:
+            self.stats[name] += 1
+
+
+class Cache:
+    """Two-tier cache: an in-process LRU in front of an optional shared SQLite tier.
+
+    Every entry is stored with the versions of its tags at write time. Bumping
+    a tag (cache.invalidate, or a commit touching a table of that name) makes
+    every entry carrying the older version a miss, in every worker. Tag
+    versions live in the shared tier when there is one, so a worker's memory
+    tier never serves a value another worker has invalidated.
+
+    Cached values are shared between requests; treat them as read-only.
+    """
+
+    def init_app(self, app):
+        app.config.setdefault('CACHE_ENABLED', True)
+        app.config.setdefault('CACHE_BACKEND', 'memory')
+        app.config.setdefault('CACHE_MAX_ENTRIES', 1024)
+        app.config.setdefault('CACHE_DEFAULT_TTL', 60)
+        if not app.config['CACHE_ENABLED']:
+            return
+
+        shared = None
+        if app.config['CACHE_BACKEND'] == 'sqlite':
+            shared = SqliteTier(app.config['CACHE_SQLITE_PATH'])
+        app.extensions['cache'] = _CacheState(
+            MemoryTier(app.config['CACHE_MAX_ENTRIES']), shared, app.config['CACHE_DEFAULT_TTL']
+        )
+
+    def _state(self):
+        if not has_app_context():
+            return None
+        return current_app.extensions.get('cache')
+
+    def _tags_of(self, state):
+        return state.shared or state.memory
+
+    def get_or_set(self, key, compute, ttl=None, tags=()):
+        """Return the cached value for `key`, calling compute() to fill it on a miss."""
+        state = self._state()
+        if state is None:
+            return compute()
+
+        tags = tuple(tags)
+        versions = self._tags_of(state).tag_versions(tags)
+        entry = state.memory.get(key)
+        if entry is not None and entry[2] == versions:
+            state.count('memory_hits')
+            return entry[0]
+        if state.shared is not None:
+            entry = state.shared.get(key)
+            if entry is not None and entry[2] == versions:
+                state.count('shared_hits')
+                state.memory.set(key, *entry)
+                return entry[0]
+
+        state.count('misses')
+        value = compute()
+        expires = time.time() + (ttl or state.default_ttl)
+        state.memory.set(key, value, expires, versions)
+        if state.shared is not None:
+            state.shared.set(key, value, expires, versions)
+        return value
+
+    def invalidate(self, *tags):
+        state = self._state()
+        if state is None or not tags:
+            return
+        self._tags_of(state).bump_tags(tags)
+        with state.lock:
+            state.stats['invalidations'] += len(tags)
+
+    def clear(self):
+        state = self._state()
+        if state is None:
+            return
+        state.memory.clear()
+        if state.shared is not None:
+            state.shared.clear()
+
+    def stats(self):
+        state = self._state()
+        if state is None:
+            return {'enabled': False}
+        with state.lock:
+            counts = dict(state.stats)
+        lookups = counts['memory_hits'] + counts['shared_hits'] + counts['misses']
+        return {
+            'enabled': True,
+            'backend': 'sqlite' if state.shared is not None else 'memory',
+            'pid': os.getpid(),
+            **counts,
+            'hit_ratio': round((counts['memory_hits'] + counts['shared_hits']) / lookups, 3) if lookups else None,
+            'memory_entries': len(state.memory),
+            'shared_entries': len(state.shared) if state.shared is not None else None
+        }
+
+
+cache = Cache()
+
+
+# Tables written in a transaction are invalidated as tags once it commits, so
+# readers never repopulate the cache from data that may still roll back.
+@event.listens_for(Session, 'after_flush')
+def _collect_written_tables(session, flush_context):
+    written = session.info.setdefault('cache_tags', set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        table = getattr(obj, '__table__', None)
+        if table is not None:
+            written.add(table.name)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_written_tables(session):
+    tags = session.info.pop('cache_tags', None)
+    if tags:
+        cache.invalidate(*sorted(tags))
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_written_tables(session):
+    session.info.pop('cache_tags', None)
@@ -0,0 +1,135 @@
+import os
+from dotenv import load_dotenv
+from sqlalchemy.pool import StaticPool
+
+load_dotenv()
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class Config:
+    # Use an absolute path for the database to avoid ambiguity
+    SQLALCHEMY_DATABASE_URI = os.environ.get(
+        'DATABASE_URL', f"sqlite:///{os.path.join(BASE_DIR, 'instance', 'app.db')}"
+    )
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Applied to every connection of a file-backed SQLite primary. In WAL mode
+    # readers never block the tills' writes (nor the other way round), and a
+    # writer only waits for the commit in progress, up to busy_timeout ms.
+    SQLITE_PRAGMAS = {'journal_mode': 'WAL', 'busy_timeout': 5000}
+    # Optional read replica: a second SQLite file refreshed with
+    # `flask replica refresh`, or a Postgres standby.
+    REPLICA_DATABASE_URL = os.environ.get('REPLICA_DATABASE_URL')
+    SQLALCHEMY_BINDS = {'replica': REPLICA_DATABASE_URL} if REPLICA_DATABASE_URL else {}
+    # GET requests of these blueprints read from the replica
+    READ_REPLICA_BLUEPRINTS = ('owner',)
+    # Seconds the replica may trail the primary before reads fall back
+    REPLICA_MAX_LAG = 30
+    # Optional sharded mode (SQLite only): tickets, sales, inventory and
+    # stock-ins of shop n live in SHARDS_DIR/shop_n.db instead of the primary
+    SHARDS_DIR = os.environ.get('SHARDS_DIR')
+    JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY', 'super-secret')
+    CORS_ALLOWED_ORIGINS = os.environ.get('CORS_ALLOWED_ORIGINS', 'http://localhost:3000').split(',')
+    BCRYPT_ROUNDS = 12
+    # Threads hashing passwords in bulk employee imports (default: CPU count)
+    BCRYPT_WORKERS = int(os.environ.get('BCRYPT_WORKERS', 0)) or None
+
+    RATELIMIT_ENABLED = os.environ.get('RATELIMIT_ENABLED', 'true').lower() == 'true'
+    # 'memory' counts per process; 'sqlite' shares buckets across gunicorn workers
+    RATELIMIT_BACKEND = os.environ.get('RATELIMIT_BACKEND', 'sqlite')
+    RATELIMIT_SQLITE_PATH = os.path.join(BASE_DIR, 'instance', 'ratelimit.db')
+    # Per-process cap of the memory backend; least recently used buckets go first
+    RATELIMIT_MAX_BUCKETS = 100000
+    RATELIMITS = {
+        'auth.login': [
+            {'rate': '5/minute', 'burst': 5, 'key': ('ip', 'username')},
+            {'rate': '30/minute', 'burst': 30, 'key': 'ip'},
+        ],
+        'owner.get_sales': {'rate': '1/second', 'burst': 10, 'key': 'identity'},
+        'owner': {'rate': '20/second', 'burst': 60, 'key': 'identity'},
+        'employee': {'rate': '10/second', 'burst': 40, 'key': 'shop'},
+    }
+
+    # `flask db-maintenance backup` and the db_maintenance job write here
+    MAINTENANCE_BACKUP_DIR = os.path.join(BASE_DIR, 'instance', 'backups')
+    MAINTENANCE_BACKUP_KEEP = 7
+    # Free pages returned per vacuum run (0: all of them)
+    MAINTENANCE_VACUUM_PAGES = 5000
+
+    # Processes used by inventory reconciliation (default: CPU count)
+    RECONCILE_WORKERS = int(os.environ.get('RECONCILE_WORKERS', 0)) or None
+
+    # Chunked data migrations (flask data-migrate): rows per chunk at most,
+    # chunks resized to take about TARGET_CHUNK_MS, PAUSE_MS between chunks
+    # for the tills' writes, and seconds per data_migration job slice
+    DATA_MIGRATION_CHUNK_SIZE = 1000
+    DATA_MIGRATION_TARGET_CHUNK_MS = 200
+    DATA_MIGRATION_PAUSE_MS = 50
+    DATA_MIGRATION_JOB_SECONDS = 600
+    # A runner's lease on a data migration; another runner may take it over
+    # once it has gone this long without finishing a chunk
+    DATA_MIGRATION_LEASE_SECONDS = 60
+
+    # Products moved by one POST /owner/inventory/transfers
+    TRANSFER_MAX_LINES = 5000
+
+    # Rows per transaction when the soft_delete_purge job clears dependents
+    PURGE_CHUNK_SIZE = 500
+
+    # Owners may profile single requests (X-Profile: cpu,stacks,memory).
+    # Off: no hooks are installed. SAMPLE_RATE profiles that fraction of all
+    # requests with SAMPLE_MODES, for slowness that is hard to reproduce.
+    PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', 'false').lower() == 'true'
+    PROFILING_DIR = os.path.join(BASE_DIR, 'instance', 'profiles')
+    PROFILING_KEEP = 100
+    PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE', 0))
+    PROFILING_SAMPLE_MODES = ('cpu',)
+    PROFILING_STACK_INTERVAL_MS = 5
+    PROFILING_TRACEMALLOC_FRAMES = 1
+    # Functions and allocation sites listed per profile
+    PROFILING_TOP = 30
+
+    # Logging goes through a queue to a listener thread (logs.py). Records are
+    # JSON lines ('text' for the old format) on stderr and, if LOG_FILE is set,
+    # in a file rotated at LOG_FILE_MAX_BYTES; '{pid}' in the name gives each
+    # gunicorn worker its own file. INFO records of the loggers in
+    # LOG_SAMPLE_RATES are kept at that rate. Requests slower than
+    # LOG_SLOW_REQUEST_MS are logged as warnings and never sampled away.
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+    LOG_FORMAT = os.environ.get('LOG_FORMAT', 'json')
+    LOG_STREAM = True
+    LOG_FILE = os.environ.get('LOG_FILE')
+    LOG_FILE_MAX_BYTES = int(os.environ.get('LOG_FILE_MAX_BYTES', 10 * 1024 * 1024))
+    LOG_FILE_BACKUPS = int(os.environ.get('LOG_FILE_BACKUPS', 5))
+    # Records waiting for the listener; beyond this they are dropped and counted
+    LOG_QUEUE_SIZE = 10000
+    LOG_SAMPLE_RATES = {'perfume.access': float(os.environ.get('LOG_ACCESS_SAMPLE_RATE', 1))}
+    LOG_SLOW_REQUEST_MS = int(os.environ.get('LOG_SLOW_REQUEST_MS', 500))
+
+    # Sub-requests allowed in one POST /api/batch
+    BATCH_MAX_REQUESTS = 20
+
+    CACHE_ENABLED = os.environ.get('CACHE_ENABLED', 'true').lower() == 'true'
+    # 'memory' caches per process; 'sqlite' adds a tier shared by every worker
+    CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'sqlite')
+    CACHE_SQLITE_PATH = os.path.join(BASE_DIR, 'instance', 'cache.db')
+    CACHE_MAX_ENTRIES = 1024
+    CACHE_DEFAULT_TTL = 60
+
+
+class TestConfig(Config):
+    TESTING = True
+    # One shared in-memory connection so every session sees the same schema
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    SQLALCHEMY_BINDS = {}
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'poolclass': StaticPool,
+        'connect_args': {'check_same_thread': False}
+    }
+    JWT_SECRET_KEY = 'test-secret'
+    # Minimum bcrypt cost keeps password fixtures fast
+    BCRYPT_ROUNDS = 4
+    RATELIMIT_ENABLED = False
+    CACHE_BACKEND = 'memory'
+    # pytest captures log records itself
+    LOG_STREAM = False
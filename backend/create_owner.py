@@ -5,10 +5,12 @@ from getpass import getpass
 # Add the backend directory to the Python path
 sys.path.append(os.path.abspath(os.path.dirname(__file__)))
 
-from app import app, db
+from app import create_app
+from db import db
 from models import User
 
 def create_owner():
+    app = create_app(with_blueprints=False)
     with app.app_context():
         username = input("Enter owner username: ")
         password = getpass("Enter owner password: ")
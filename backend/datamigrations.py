@@ -0,0 +1,278 @@
+import os
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy.exc import IntegrityError
+
+from db import db
+from jobs import enqueue, job
+from models import DataMigration, Sale, Ticket, User
+from shards import SHARDED_TABLES, require_unsharded
+
+# Schema migrations stay small: add a nullable column or a table, which
+# SQLite does without rewriting anything. Filling it in is a data migration
+# registered here and run by `flask data-migrate run NAME` or the job worker.
+#
+# A data migration walks one table in primary-key order. Each chunk of ids is
+# handled in its own short transaction together with its checkpoint, so a
+# run that stops (a deploy, a crash, --max-chunks) resumes exactly where it
+# left off. Chunks grow or shrink to take about DATA_MIGRATION_TARGET_CHUNK_MS,
+# and the runner sleeps DATA_MIGRATION_PAUSE_MS between them, so the write
+# lock the tills need is never held for long.
+#
+# Only one runner works a migration at a time: it holds a lease on the
+# checkpoint row, renewed by every chunk's checkpoint. A second runner is
+# refused until the lease lapses (DATA_MIGRATION_LEASE_SECONDS without a
+# chunk); a runner whose lease was taken over stops at its next checkpoint,
+# which it can no longer write.
+
+# name -> (table, pending, handler). Handlers register themselves with @data_migration(...)
+DATA_MIGRATIONS = {}
+
+MIN_CHUNK_SIZE = 10
+
+
+def data_migration(name, table, pending=None):
+    """Register handler(connection, low_id, high_id) for the rows of `table`.
+
+    `pending` is an optional condition selecting the rows still to migrate;
+    chunks are then taken from those rows only. The handler must touch rows
+    with low_id <= id <= high_id only and must not commit.
+    """
+    def wrapper(fn):
+        DATA_MIGRATIONS[name] = (table, pending, fn)
+        return fn
+    return wrapper
+
+
+class DataMigrationBusy(RuntimeError):
+    def __init__(self, name, locked_by):
+        super().__init__(f"Data migration {name!r} is being run by {locked_by}")
+        self.locked_by = locked_by
+
+
+def _state(name, chunk_size):
+    state = db.session.get(DataMigration, name)
+    if state is None:
+        table, pending, _ = DATA_MIGRATIONS[name]
+        now = datetime.utcnow()
+        count = db.select(db.func.count()).select_from(table)
+        db.session.add(DataMigration(
+            name=name, status='running', last_id=0, rows_done=0, chunk_size=chunk_size, started_at=now,
+            updated_at=now, rows_total=db.session.execute(count.where(pending) if pending is not None else count).scalar()
+        ))
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # Another runner created it first
+            db.session.rollback()
+        state = db.session.get(DataMigration, name)
+    return state
+
+
+def _claim(name, runner, lease):
+    now = datetime.utcnow()
+    claimed = DataMigration.query.filter(
+        DataMigration.name == name,
+        db.or_(DataMigration.locked_by.is_(None), DataMigration.locked_until < now)
+    ).update({'locked_by': runner, 'locked_until': now + lease}, synchronize_session=False)
+    db.session.commit()
+    if not claimed:
+        raise DataMigrationBusy(name, db.session.get(DataMigration, name).locked_by)
+
+
+def _release(name, runner):
+    DataMigration.query.filter_by(name=name, locked_by=runner).update(
+        {'locked_by': None, 'locked_until': None}, synchronize_session=False
+    )
+    db.session.commit()
+
+
+def run_data_migration(name, chunk_size=None, pause_ms=None, max_chunks=None, max_seconds=None, progress=None):
+    """Run (or resume) a registered data migration. Returns its state as a dict.
+
+    Stops after `max_chunks` chunks or `max_seconds` with status 'running';
+    the next call carries on from the checkpoint. Raises DataMigrationBusy
+    when another runner holds it, RuntimeError for a shop-scoped table in
+    sharded mode.
+    """
+    if name not in DATA_MIGRATIONS:
+        raise LookupError(f"Unknown data migration {name!r}")
+    config = current_app.config
+    table, pending, handler = DATA_MIGRATIONS[name]
+    if table.name in SHARDED_TABLES:
+        # Chunks walk one table's ids; shards would each need their own walk
+        require_unsharded(f"Data migration {name!r}")
+    pause = (config['DATA_MIGRATION_PAUSE_MS'] if pause_ms is None else pause_ms) / 1000
+    target = config['DATA_MIGRATION_TARGET_CHUNK_MS'] / 1000
+    lease = timedelta(seconds=config['DATA_MIGRATION_LEASE_SECONDS'])
+    max_size = chunk_size or config['DATA_MIGRATION_CHUNK_SIZE']
+    runner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    state = _state(name, max_size)
+    if state.status == 'done':
+        return data_migration_to_dict(state)
+    _claim(name, runner, lease)
+    try:
+        size = min(state.chunk_size, max_size)
+        started = time.monotonic()
+        chunks = 0
+        while state.status != 'done':
+            if (max_chunks is not None and chunks >= max_chunks) or (
+                    max_seconds is not None and time.monotonic() - started >= max_seconds):
+                break
+            chunk_started = time.monotonic()
+            ids = db.select(table.c.id).where(table.c.id > state.last_id)
+            if pending is not None:
+                ids = ids.where(pending)
+            ids = db.session.execute(ids.order_by(table.c.id).limit(size)).scalars().all()
+
+            now = datetime.utcnow()
+            checkpoint = {'updated_at': now, 'chunk_size': size, 'locked_until': now + lease}
+            if not ids:
+                checkpoint.update(status='done', finished_at=now)
+            else:
+                handler(db.session.connection(), ids[0], ids[-1])
+                checkpoint.update(last_id=ids[-1], rows_done=DataMigration.rows_done + len(ids))
+            # Written only while the lease is still ours, in the chunk's own transaction
+            written = DataMigration.query.filter_by(name=name, locked_by=runner).update(
+                checkpoint, synchronize_session=False
+            )
+            if not written:
+                db.session.rollback()
+                raise DataMigrationBusy(name, db.session.get(DataMigration, name).locked_by)
+            db.session.commit()
+            state = db.session.get(DataMigration, name)
+            chunks += 1
+
+            elapsed = time.monotonic() - chunk_started
+            if elapsed > target:
+                size = max(MIN_CHUNK_SIZE, size // 2)
+            elif elapsed < target / 2:
+                size = min(max_size, size * 2)
+            if progress:
+                progress(state.rows_done, max(state.rows_total or 0, state.rows_done))
+            if state.status != 'done' and pause:
+                time.sleep(pause)
+    finally:
+        db.session.rollback()
+        _release(name, runner)
+    return data_migration_to_dict(db.session.get(DataMigration, name))
+
+
+def data_migration_to_dict(state):
+    return {
+        'name': state.name,
+        'status': state.status,
+        'last_id': state.last_id,
+        'rows_done': state.rows_done,
+        'rows_total': state.rows_total,
+        'chunk_size': state.chunk_size,
+        'started_at': state.started_at,
+        'finished_at': state.finished_at
+    }
+
+
+@job('data_migration')
+def data_migration_job(payload, ctx):
+    # Runs in slices so a long backfill never looks like a stale job; each
+    # slice queues the next one until the migration is done. A migration
+    # someone else is running is left to them.
+    try:
+        result = run_data_migration(payload['name'], max_seconds=current_app.config['DATA_MIGRATION_JOB_SECONDS'],
+                                    progress=ctx.set_progress)
+    except DataMigrationBusy as e:
+        return {'name': payload['name'], 'status': 'busy', 'locked_by': e.locked_by}
+    if result['status'] != 'done':
+        result['next_job_id'] = enqueue('data_migration', payload).id
+    return result
+
+
+# Sale lines with no ticket header (written by older clients or imports) get
+# one per ticket, like the migration that introduced headers did at once. A
+# ticket is its code, time and employee together: old codes were short enough
+# to repeat, and a repeated code gets a '/2', '/3', ... suffix on its header.
+@data_migration('ticket_headers', Sale.__table__, pending=Sale.__table__.c.ticket_pk.is_(None))
+def backfill_ticket_headers(connection, low_id, high_id):
+    sale, ticket, user = Sale.__table__, Ticket.__table__, User.__table__
+    chunk = db.and_(sale.c.id.between(low_id, high_id), sale.c.ticket_pk.is_(None))
+    groups = connection.execute(
+        db.select(sale.c.ticket_id, sale.c.time, sale.c.employee_id, db.func.min(user.c.shop_id))
+        .select_from(sale.join(user, user.c.id == sale.c.employee_id))
+        .where(chunk)
+        .group_by(sale.c.ticket_id, sale.c.time, sale.c.employee_id)
+        .order_by(db.func.min(sale.c.id))
+    ).all()
+
+    headers = []
+    for code, time, employee_id, shop_id in groups:
+        same_code = db.or_(ticket.c.ticket_id == code, ticket.c.ticket_id.startswith(f'{code}/', autoescape=True))
+        header = connection.execute(db.select(ticket.c.id).where(
+            same_code, ticket.c.time == time, ticket.c.employee_id == employee_id
+        )).scalar()
+        if header is None:
+            taken = set(connection.execute(db.select(ticket.c.ticket_id).where(same_code)).scalars())
+            suffix, free = 1, code
+            while free in taken:
+                suffix += 1
+                free = f'{code}/{suffix}'
+            header = connection.execute(ticket.insert().values(
+                ticket_id=free, time=time, shop_id=shop_id, employee_id=employee_id, line_count=0, total=0
+            )).inserted_primary_key[0]
+        connection.execute(sale.update().where(
+            chunk, sale.c.ticket_id == code, sale.c.time == time, sale.c.employee_id == employee_id
+        ).values(ticket_pk=header))
+        headers.append(header)
+
+    # A ticket's lines may span chunks: recount from everything linked so far
+    lines = db.select(sale).where(sale.c.ticket_pk == ticket.c.id)
+    connection.execute(ticket.update().where(ticket.c.id.in_(headers)).values(
+        line_count=lines.with_only_columns(db.func.count()).scalar_subquery(),
+        total=lines.with_only_columns(db.func.coalesce(db.func.sum(sale.c.total), 0)).scalar_subquery()
+    ))
+
+
+@click.group('data-migrate')
+def data_migrate_cli():
+    """Run chunked, resumable data migrations (backfills)."""
+
+
+@data_migrate_cli.command('list')
+@with_appcontext
+def list_command():
+    states = {state.name: state for state in DataMigration.query}
+    for name in sorted(DATA_MIGRATIONS):
+        state = states.get(name)
+        if state is None:
+            click.echo(f"{name}: not started")
+        else:
+            running = f"  (running on {state.locked_by})" if state.locked_by else ''
+            click.echo(f"{name}: {state.status}  {state.rows_done}/{state.rows_total} rows  last id {state.last_id}"
+                       f"{running}")
+
+
+@data_migrate_cli.command('run')
+@click.argument('name')
+@click.option('--chunk-size', type=int, help='Largest chunk (default: DATA_MIGRATION_CHUNK_SIZE).')
+@click.option('--pause-ms', type=int, help='Sleep between chunks (default: DATA_MIGRATION_PAUSE_MS).')
+@click.option('--max-chunks', type=int, help='Stop after this many chunks; run again to resume.')
+@click.option('--background', is_flag=True, help='Queue it for the job worker instead.')
+@with_appcontext
+def run_command(name, chunk_size, pause_ms, max_chunks, background):
+    if name not in DATA_MIGRATIONS:
+        raise click.BadParameter(f"unknown data migration {name!r}", param_hint='NAME')
+    if background:
+        click.echo(f"Queued job {enqueue('data_migration', {'name': name}).id}")
+        return
+    try:
+        result = run_data_migration(name, chunk_size=chunk_size, pause_ms=pause_ms, max_chunks=max_chunks,
+                                    progress=lambda done, total: click.echo(f"\r{done}/{total} rows", nl=False))
+    except RuntimeError as e:
+        # DataMigrationBusy, or a migration sharded mode cannot run
+        raise click.ClickException(str(e))
+    click.echo(f"\n{name}: {result['status']}")
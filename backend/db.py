@@ -1,3 +1,51 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from flask_sqlalchemy.session import Session
 
-db = SQLAlchemy()
+
+class RoutingSession(Session):
+    # Installed by replica.init_replica(): returns the engine reads of the
+    # current request should use, or None for the primary.
+    read_router = None
+    # Installed by shards.init_shards(): returns the shard engine statements
+    # on shop-scoped tables run on, or None when they touch none. It also
+    # sets connection_callable, which a flush asks for each row's connection.
+    shard_router = None
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and self.shard_router is not None:
+            engine = self.shard_router(mapper, clause)
+            if engine is not None:
+                return engine
+        if (bind is None and self.read_router is not None and not self._flushing
+                and not getattr(clause, 'is_dml', False)):
+            engine = self.read_router()
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def sqlite_file(engine):
+    """Path of a file-backed SQLite engine's database, else None."""
+    if engine.url.get_backend_name() == 'sqlite' and engine.url.database not in (None, '', ':memory:'):
+        return engine.url.database
+    return None
+
+
+def init_sqlite(app):
+    """Run SQLITE_PRAGMAS on every new connection to a file-backed SQLite primary."""
+    pragmas = app.config.get('SQLITE_PRAGMAS') or {}
+    with app.app_context():
+        engine = db.engine
+    if not pragmas or sqlite_file(engine) is None:
+        return
+
+    @event.listens_for(engine, 'connect')
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+        cursor.close()
+
+
+db = SQLAlchemy(session_options={'class_': RoutingSession})
@@ -1,7 +1,14 @@
 from flask import Blueprint, request, jsonify
-from models import Sale, User, Inventory, Product
+from models import Sale, User, Inventory, Product, StockIn, Ticket
 from db import db
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy.exc import IntegrityError
+from tickets import TICKET_CODE_ATTEMPTS, new_ticket_code, ticket_to_dict
+from archive import sales_entity, sales_total
+from responses import list_response
+from cache import cache
+from money import from_minor, to_minor
+from sync import changes_since
 import uuid
 from datetime import datetime
 
@@ -12,22 +19,24 @@ employee_bp = Blueprint('employee', __name__)
 def get_sales():
     current_user_username = get_jwt_identity()
     user = User.query.filter_by(username=current_user_username).first()
-    query = Sale.query.filter_by(employee_id=user.id).options(db.joinedload(Sale.product))
-
     date_from = request.args.get('date_from')
+    date_to = request.args.get('date_to')
+
+    SaleRow = sales_entity(date_from, date_to)
+    query = db.session.query(SaleRow).filter(SaleRow.employee_id == user.id).options(db.joinedload(SaleRow.product))
+
     if date_from:
-        query = query.filter(Sale.time >= date_from)
+        query = query.filter(SaleRow.time >= date_from)
 
-    date_to = request.args.get('date_to')
     if date_to:
-        query = query.filter(Sale.time <= date_to)
+        query = query.filter(SaleRow.time <= date_to)
 
     product_name = request.args.get('product_name')
     if product_name:
-        query = query.join(Product).filter(Product.name.ilike(f'%{product_name}%'))
+        query = query.join(SaleRow.product).filter(Product.name.ilike(f'%{product_name}%'))
 
     sales = query.all()
-    return jsonify([{
+    return list_response([{
         'id': sale.id,
         'ticket_id': sale.ticket_id,
         'time': sale.time,
@@ -36,9 +45,10 @@ def get_sales():
         'total': sale.total,
         'notes': sale.notes,
         'product': {
+            'id': sale.product.id,
             'name': sale.product.name
         }
-    } for sale in sales])
+    } for sale in sales], refs=('product',))
 
 @employee_bp.route('/sales', methods=['POST'])
 @jwt_required()
@@ -54,8 +64,6 @@ def create_sale():
     current_user_username = get_jwt_identity()
     user = User.query.filter_by(username=current_user_username).first()
 
-    ticket_id = f"#T-{uuid.uuid4().hex[:6].upper()}"
-
     sale_time_str = data.get("time")
     if sale_time_str:
         try:
@@ -65,63 +73,121 @@ def create_sale():
     else:
         sale_time = datetime.utcnow()
 
+    # Validate every line and read the products before writing anything: the
+    # write transaction (and SQLite's database-wide write lock) then lasts only
+    # for the inserts, not for the lookups, so other shops' tills barely wait.
+    lines = []
+    for item in items:
+        # Cast product_id to integer
+        try:
+            product_id = int(item.get("product_id"))
+        except (TypeError, ValueError):
+            return jsonify({"msg": f"Invalid product_id {item.get('product_id')}"}), 400
+
+        product = db.session.get(Product, product_id)
+        if not product:
+            return jsonify({"msg": f"Product with id {item.get('product_id')} not found"}), 404
+
+        # Cast and validate quantity
+        try:
+            quantity = int(item.get("quantity"))
+        except (TypeError, ValueError):
+            return jsonify({"msg": f"Invalid quantity {item.get('quantity')} for product {product_id}"}), 400
+
+        if quantity <= 0:
+            return jsonify({"msg": f"Quantity must be a positive integer for product {product_id}"}), 400
+
+        # Ensure selling_price is non-negative
+        if product.selling_price < 0:
+            return jsonify({"msg": f"Product {product_id} has a negative selling price"}), 400
+
+        lines.append((product, quantity, item.get('notes')))
+
     try:
-        with db.session.begin_nested():
-            for item in items:
-                # Cast product_id to integer
-                try:
-                    product_id = int(item.get("product_id"))
-                except (TypeError, ValueError):
-                    return jsonify({"msg": f"Invalid product_id {item.get('product_id')}"}), 400
-
-                product = Product.query.get(product_id)
-                if not product:
-                    return jsonify({"msg": f"Product with id {item.get('product_id')} not found"}), 404
-
-                # Cast and validate quantity
-                try:
-                    quantity = int(item.get("quantity"))
-                except (TypeError, ValueError):
-                    return jsonify({"msg": f"Invalid quantity {item.get('quantity')} for product {product_id}"}), 400
-
-                if quantity <= 0:
-                    return jsonify({"msg": f"Quantity must be a positive integer for product {product_id}"}), 400
-
-                # Ensure selling_price is non-negative
-                if product.selling_price < 0:
-                    return jsonify({"msg": f"Product {product_id} has a negative selling price"}), 400
-
-                total = product.selling_price * quantity
-
-                new_sale = Sale(
-                    ticket_id=ticket_id,
-                    time=sale_time,
-                    product_id=product_id,
-                    quantity=quantity,
-                    total=total,
-                    notes=item.get('notes'),
-                    employee_id=user.id
-                )
-                db.session.add(new_sale)
+        # Ticket codes are random: on the rare clash with an earlier ticket
+        # the savepoint is rolled back and the sale written under a new code.
+        for attempt in range(TICKET_CODE_ATTEMPTS):
+            ticket_id = new_ticket_code()
+            try:
+                with db.session.begin_nested():
+                    # Header row written once per ticket; lines reference it by id
+                    ticket = Ticket(
+                        ticket_id=ticket_id,
+                        time=sale_time,
+                        shop_id=user.shop_id,
+                        employee_id=user.id,
+                        line_count=len(lines),
+                        total=from_minor(sum(to_minor(product.selling_price) * quantity
+                                             for product, quantity, _ in lines))
+                    )
+                    db.session.add(ticket)
+                    db.session.add_all([Sale(
+                        ticket_id=ticket_id,
+                        ticket=ticket,
+                        time=sale_time,
+                        product_id=product.id,
+                        quantity=quantity,
+                        total=from_minor(to_minor(product.selling_price) * quantity),
+                        notes=notes,
+                        employee_id=user.id,
+                        unit_cost=product.cost_price,
+                        unit_price=product.selling_price
+                    ) for product, quantity, notes in lines])
+                break
+            except IntegrityError:
+                if attempt == TICKET_CODE_ATTEMPTS - 1:
+                    raise
         db.session.commit()
-        return jsonify({'message': 'Sale created successfully'}), 201
+        return jsonify({
+            'message': 'Sale created successfully',
+            'ticket': {
+                'id': ticket.id,
+                'ticket_id': ticket.ticket_id,
+                'line_count': ticket.line_count,
+                'total': ticket.total
+            }
+        }), 201
     except Exception:
         db.session.rollback()
         return jsonify({"msg": "An internal error occurred"}), 500
 
-@employee_bp.route('/stock', methods=['GET'])
+@employee_bp.route('/tickets/<int:id>', methods=['GET'])
 @jwt_required()
-def get_stock():
+def get_ticket(id):
     current_user_username = get_jwt_identity()
     user = User.query.filter_by(username=current_user_username).first()
-    inventory = Inventory.query.filter_by(shop_id=user.shop_id).all()
-    return jsonify([{
+    ticket = Ticket.query.filter_by(id=id, employee_id=user.id).first()
+    if not ticket:
+        return jsonify({'message': 'Ticket not found'}), 404
+    return jsonify(ticket_to_dict(ticket))
+
+def stock_item_to_dict(item):
+    return {
         'id': item.id,
         'product_id': item.product_id,
         'product_name': item.product.name,
         'current_stock': item.current_stock,
         'reorder_level': item.product.reorder_level
-    } for item in inventory])
+    }
+
+@employee_bp.route('/stock', methods=['GET'])
+@jwt_required()
+def get_stock():
+    current_user_username = get_jwt_identity()
+    user = User.query.filter_by(username=current_user_username).first()
+    # Inventory of a deleted product lingers until its purge job runs
+    inventory = Inventory.query.join(Inventory.product).filter(
+        Inventory.shop_id == user.shop_id, Product.deleted_at.is_(None)
+    ).options(db.contains_eager(Inventory.product)).all()
+    return list_response([stock_item_to_dict(item) for item in inventory])
+
+@employee_bp.route('/stock/changes', methods=['GET'])
+@jwt_required()
+def get_stock_changes():
+    current_user_username = get_jwt_identity()
+    user = User.query.filter_by(username=current_user_username).first()
+    since = request.args.get('since', 0, type=int)
+    return jsonify(changes_since(Inventory, since, stock_item_to_dict, shop_id=user.shop_id))
 
 @employee_bp.route('/stock-in', methods=['POST'])
 @jwt_required()
@@ -151,8 +217,12 @@ def stock_in():
         )
         db.session.add(inventory_item)
 
+    # Recorded in the same commit so reconciliation counts it as received
+    record = StockIn(stock_in_id=f'#SI-{uuid.uuid4().hex[:8].upper()}', date=datetime.utcnow(), shop_id=user.shop_id,
+                     product_id=product_id, quantity=quantity, supplier=data.get('supplier'), notes=data.get('notes'))
+    db.session.add(record)
     db.session.commit()
-    return jsonify({'message': 'Stock added successfully'}), 201
+    return jsonify({'message': 'Stock added successfully', 'stock_in_id': record.stock_in_id}), 201
 
 @employee_bp.route('/dashboard', methods=['GET'])
 @jwt_required()
@@ -160,13 +230,15 @@ def dashboard():
     current_user_username = get_jwt_identity()
     user = User.query.filter_by(username=current_user_username).first()
 
-    total_sales = db.session.query(db.func.sum(Sale.total)).filter_by(employee_id=user.id).scalar()
-    low_stock_count = db.session.query(Inventory).join(Product).filter(
-        Inventory.shop_id == user.shop_id,
-        Inventory.current_stock <= Product.reorder_level
-    ).count()
-
-    return jsonify({
-        'total_sales': total_sales,
-        'low_stock_count': low_stock_count
-    })
+    def compute():
+        low_stock_count = db.session.query(Inventory).join(Product).filter(
+            Inventory.shop_id == user.shop_id,
+            Inventory.current_stock <= Product.reorder_level,
+            Product.deleted_at.is_(None)
+        ).count()
+        return {'total_sales': sales_total(employee_id=user.id), 'low_stock_count': low_stock_count}
+
+    return jsonify(cache.get_or_set(
+        f'employee:dashboard:{user.id}:{user.shop_id}', compute,
+        tags=('sale', 'archived_month', 'inventory', 'product')
+    ))
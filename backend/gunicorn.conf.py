@@ -0,0 +1,55 @@
+# Production profile for `gunicorn -c gunicorn.conf.py` (used by start.py).
+# Every setting can be overridden through GUNICORN_* environment variables.
+import multiprocessing
+import os
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+wsgi_app = 'app:create_app()'
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+
+# sync: one request per process. gthread: a small thread pool per process,
+# better when clients hold connections open on slow links. uvicorn: the ASGI
+# app from asgi.py on an event loop (needs requirements-asgi.txt).
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'sync')
+if worker_class not in ('sync', 'gthread', 'uvicorn'):
+    raise RuntimeError(f"GUNICORN_WORKER_CLASS must be 'sync', 'gthread' or 'uvicorn', got {worker_class!r}")
+
+_cpus = multiprocessing.cpu_count()
+if worker_class == 'uvicorn':
+    worker_class = 'uvicorn_worker.UvicornWorker'
+    wsgi_app = 'asgi:create_asgi_app()'
+    workers = int(os.environ.get('GUNICORN_WORKERS', _cpus + 1))
+    threads = 1
+elif worker_class == 'gthread':
+    workers = int(os.environ.get('GUNICORN_WORKERS', _cpus + 1))
+    threads = int(os.environ.get('GUNICORN_THREADS', 4))
+else:
+    workers = int(os.environ.get('GUNICORN_WORKERS', _cpus * 2 + 1))
+    threads = 1
+
+# Import the app once in the master so workers fork with it already loaded.
+preload_app = True
+
+# Recycle workers periodically; jitter keeps them from restarting together.
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 100))
+
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+
+pidfile = os.environ.get('GUNICORN_PIDFILE', os.path.join(BACKEND_DIR, 'instance', 'gunicorn.pid'))
+
+
+def post_fork(server, worker):
+    # The preloaded master may already hold pooled DB connections; a forked
+    # worker must never reuse them (SQLite file handles and Postgres sockets
+    # are not fork-safe). close=False leaves the master's connections alone.
+    from db import db
+
+    app = server.app.wsgi()
+    app = getattr(app, 'flask_app', app)  # unwrap asgi.AsyncApp
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
@@ -0,0 +1,58 @@
+from db import db
+from models import Inventory, Product, Shop
+from shards import each_shard
+
+SHAPES = ('dense', 'sparse')
+
+
+def inventory_matrix(shop_ids=None, product_name=None, low_only=False, shape=None):
+    """Stock of every shop x product as a pivot, in one query (one per shard in sharded mode).
+
+    `shops` and `products` are the axes; cells refer to them by index.
+    dense:  stock[shop_index][product_index], null where there is no row.
+    sparse: cells = [[shop_index, product_index, stock], ...].
+    `low` lists the [shop_index, product_index] pairs at or under the reorder
+    level. With no shape, whichever of the two is smaller is used.
+    """
+    query = (
+        db.select(Inventory.shop_id, Inventory.product_id, Inventory.current_stock,
+                  Shop.shop_id.label('shop_code'), Shop.name.label('shop_name'),
+                  Product.product_id.label('product_code'), Product.name.label('product_name'),
+                  Product.reorder_level)
+        .join(Shop, Shop.id == Inventory.shop_id)
+        .join(Product, Product.id == Inventory.product_id)
+        # Inventory of a deleted shop or product lingers until its purge job runs
+        .where(Shop.deleted_at.is_(None), Product.deleted_at.is_(None))
+    )
+    if shop_ids:
+        query = query.where(Inventory.shop_id.in_(shop_ids))
+    if product_name:
+        query = query.where(Product.name.ilike(f'%{product_name}%'))
+    if low_only:
+        query = query.where(Inventory.current_stock <= Product.reorder_level)
+    rows = [row for part in each_shard(lambda: db.session.execute(query).all(), shop_ids or None) for row in part]
+
+    shops = sorted({(row.shop_code, row.shop_id, row.shop_name) for row in rows})
+    products = sorted({(row.product_name, row.product_id, row.product_code, row.reorder_level) for row in rows})
+    shop_index = {shop_id: index for index, (_, shop_id, _) in enumerate(shops)}
+    product_index = {product_id: index for index, (_, product_id, _, _) in enumerate(products)}
+
+    if shape not in SHAPES:
+        shape = 'dense' if 2 * len(rows) >= len(shops) * len(products) else 'sparse'
+
+    cells = [(shop_index[row.shop_id], product_index[row.product_id], row.current_stock) for row in rows]
+    matrix = {
+        'shape': shape,
+        'shops': [{'id': shop_id, 'shop_id': code, 'name': name} for code, shop_id, name in shops],
+        'products': [{'id': product_id, 'product_id': code, 'name': name, 'reorder_level': reorder_level}
+                     for name, product_id, code, reorder_level in products],
+        'low': sorted([i, j] for (i, j, _), row in zip(cells, rows) if row.current_stock <= row.reorder_level)
+    }
+    if shape == 'dense':
+        stock = [[None] * len(products) for _ in shops]
+        for i, j, current_stock in cells:
+            stock[i][j] = current_stock
+        matrix['stock'] = stock
+    else:
+        matrix['cells'] = sorted([i, j, current_stock] for i, j, current_stock in cells)
+    return matrix
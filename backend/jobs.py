@@ -0,0 +1,161 @@
+import json
+import logging
+import os
+import socket
+import time
+import traceback
+from datetime import datetime, timedelta
+
+from db import db
+from models import Job
+
+logger = logging.getLogger(__name__)
+
+# kind -> handler(payload, ctx). Handlers register themselves with @job(...)
+JOB_HANDLERS = {}
+
+RETRY_BASE_SECONDS = 5
+STALE_JOB_SECONDS = 30 * 60
+
+
+def job(kind):
+    def wrapper(fn):
+        JOB_HANDLERS[kind] = fn
+        return fn
+    return wrapper
+
+
+class JobContext:
+    """Handed to every handler so it can report progress while it runs."""
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+
+    def set_progress(self, done, total=None):
+        # Commits the current session, so call it between units of work.
+        progress = done if total is None else (done / total if total else 1.0)
+        Job.query.filter_by(id=self.job_id).update(
+            {'progress': max(0.0, min(float(progress), 1.0))}, synchronize_session=False
+        )
+        db.session.commit()
+
+
+def enqueue(kind, payload=None, *, max_attempts=3, created_by_id=None, run_after=None):
+    if kind not in JOB_HANDLERS:
+        raise ValueError(f"Unknown job kind: {kind}")
+
+    now = datetime.utcnow()
+    new_job = Job(
+        kind=kind,
+        status='queued',
+        payload=json.dumps(payload or {}),
+        max_attempts=max_attempts,
+        run_after=run_after or now,
+        created_at=now,
+        created_by_id=created_by_id
+    )
+    db.session.add(new_job)
+    db.session.commit()
+    return new_job
+
+
+def job_to_dict(job_row, include_result=False):
+    data = {
+        'id': job_row.id,
+        'kind': job_row.kind,
+        'status': job_row.status,
+        'progress': job_row.progress,
+        'attempts': job_row.attempts,
+        'max_attempts': job_row.max_attempts,
+        'created_at': job_row.created_at,
+        'started_at': job_row.started_at,
+        'finished_at': job_row.finished_at,
+        'error': job_row.error.strip().splitlines()[-1] if job_row.error else None
+    }
+    if include_result:
+        data['result'] = json.loads(job_row.result) if job_row.result else None
+    return data
+
+
+def claim_next(worker_id):
+    now = datetime.utcnow()
+    candidate = db.session.query(Job.id).filter(
+        Job.status == 'queued',
+        Job.run_after <= now
+    ).order_by(Job.run_after, Job.id).first()
+    if not candidate:
+        db.session.rollback()
+        return None
+
+    # Conditional update so two workers polling the same row cannot both win it.
+    claimed = Job.query.filter_by(id=candidate.id, status='queued').update({
+        'status': 'running',
+        'started_at': now,
+        'locked_by': worker_id,
+        'attempts': Job.attempts + 1
+    }, synchronize_session=False)
+    db.session.commit()
+    if not claimed:
+        return None
+    return db.session.get(Job, candidate.id)
+
+
+def run_job(job_row):
+    job_id = job_row.id
+    handler = JOB_HANDLERS.get(job_row.kind)
+    try:
+        if handler is None:
+            raise LookupError(f"No handler registered for job kind {job_row.kind}")
+        result = handler(json.loads(job_row.payload or '{}'), JobContext(job_id))
+    except Exception:
+        db.session.rollback()
+        job_row = db.session.get(Job, job_id)
+        job_row.error = traceback.format_exc()
+        job_row.locked_by = None
+        if handler is not None and job_row.attempts < job_row.max_attempts:
+            delay = RETRY_BASE_SECONDS * 2 ** (job_row.attempts - 1)
+            job_row.status = 'queued'
+            job_row.run_after = datetime.utcnow() + timedelta(seconds=delay)
+            logger.warning("Job %s (%s) failed, retrying in %ss", job_id, job_row.kind, delay)
+        else:
+            job_row.status = 'failed'
+            job_row.finished_at = datetime.utcnow()
+            logger.error("Job %s (%s) failed permanently", job_id, job_row.kind)
+    else:
+        job_row = db.session.get(Job, job_id)
+        job_row.status = 'succeeded'
+        job_row.result = json.dumps(result, default=str) if result is not None else None
+        job_row.progress = 1.0
+        job_row.error = None
+        job_row.locked_by = None
+        job_row.finished_at = datetime.utcnow()
+    db.session.commit()
+    return job_row
+
+
+def requeue_stale(max_age_seconds=STALE_JOB_SECONDS):
+    # Jobs left 'running' by a worker that died are put back on the queue.
+    cutoff = datetime.utcnow() - timedelta(seconds=max_age_seconds)
+    count = Job.query.filter(Job.status == 'running', Job.started_at < cutoff).update({
+        'status': 'queued',
+        'locked_by': None,
+        'run_after': datetime.utcnow()
+    }, synchronize_session=False)
+    db.session.commit()
+    return count
+
+
+def work(poll_interval=1.0, once=False):
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    requeue_stale()
+    logger.info("Job worker %s started", worker_id)
+    while True:
+        job_row = claim_next(worker_id)
+        if job_row is not None:
+            logger.info("Running job %s (%s)", job_row.id, job_row.kind)
+            run_job(job_row)
+            continue
+        if once:
+            return
+        db.session.remove()
+        time.sleep(poll_interval)
@@ -0,0 +1,248 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import re
+import sys
+import time
+import uuid
+from copy import copy
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+from flask import current_app, has_request_context, request
+from flask_jwt_extended import get_jwt
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Every record goes through one QueueHandler on the root logger. On the
+# calling thread it is only sampled, stamped with the request context and put
+# on a queue (dropped, never waited for, past LOG_QUEUE_SIZE records). A
+# QueueListener thread formats it as one JSON line and writes it to stderr
+# and/or a rotating LOG_FILE.
+#
+# Each request adds one access record on the 'perfume.access' logger with its
+# latency and query count. Those are INFO and can be sampled with
+# LOG_SAMPLE_RATES; slow requests (WARNING) and server errors (ERROR) are
+# always kept.
+
+ACCESS_LOGGER = 'perfume.access'
+CONTEXT_FIELDS = ('request_id', 'user', 'shop', 'route')
+ACCESS_FIELDS = ('method', 'path', 'status', 'latency_ms', 'queries', 'sample_rate')
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+# Accepted from a proxy or client as X-Request-ID; anything else gets a new id
+REQUEST_ID = re.compile(r'[A-Za-z0-9._-]{1,64}')
+ENVIRON_KEY = 'perfume.log'
+
+access_logger = logging.getLogger(ACCESS_LOGGER)
+_exception_formatter = logging.Formatter()
+_pipeline = None
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        data = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'pid': record.process
+        }
+        for field in CONTEXT_FIELDS + ACCESS_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                data[field] = value
+        if record.exc_text:
+            data['exception'] = record.exc_text
+        if record.stack_info:
+            data['stack'] = record.stack_info
+        return json.dumps(data, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps a fraction of the INFO and DEBUG records of the loggers in `rates`."""
+
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = dict(rates)
+
+    def filter(self, record):
+        if record.levelno > logging.INFO or not self.rates:
+            return True
+        name = record.name
+        while name and name not in self.rates:
+            name = name.rpartition('.')[0]
+        rate = self.rates.get(name, 1)
+        if rate >= 1:
+            return True
+        record.sample_rate = rate
+        return random.random() < rate
+
+
+class ContextQueueHandler(QueueHandler):
+    """Stamps the request context on the record and queues it without blocking."""
+
+    def __init__(self, log_queue, max_size=0):
+        super().__init__(log_queue)
+        self.max_size = max_size
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Everything that needs the calling thread happens here; formatting is
+        # left to the listener.
+        record = copy(record)
+        record.msg, record.args = record.getMessage(), None
+        if record.exc_info:
+            record.exc_text = _exception_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        if has_request_context():
+            context = request.environ.get(ENVIRON_KEY)
+            if context is not None:
+                record.request_id = getattr(record, 'request_id', None) or context['request_id']
+            record.route = getattr(record, 'route', None) or (request.url_rule.rule if request.url_rule else None)
+            if getattr(record, 'user', None) is None:
+                claims = _claims()
+                record.user, record.shop = claims.get('sub'), claims.get('shop_id')
+        return record
+
+    def enqueue(self, record):
+        # SimpleQueue has no bound of its own but is much cheaper to put on
+        # than queue.Queue; the size check is approximate across threads.
+        if self.max_size and self.queue.qsize() >= self.max_size:
+            self.dropped += 1
+            return
+        if self.dropped:
+            self.queue.put_nowait(logging.makeLogRecord({
+                'name': __name__, 'levelno': logging.WARNING, 'levelname': 'WARNING',
+                'msg': f"Dropped {self.dropped} log records: queue full"
+            }))
+            self.dropped = 0
+        self.queue.put_nowait(record)
+
+
+class _Pipeline:
+    def __init__(self, settings):
+        self.settings = settings
+        self.queue = queue.SimpleQueue()
+        self.handler = ContextQueueHandler(self.queue, settings['LOG_QUEUE_SIZE'])
+        self.handler.addFilter(SamplingFilter(settings['LOG_SAMPLE_RATES']))
+        formatter = JsonFormatter() if settings['LOG_FORMAT'] == 'json' else logging.Formatter(TEXT_FORMAT)
+        self.sinks = []
+        if settings['LOG_STREAM']:
+            self.sinks.append(logging.StreamHandler(sys.stderr))
+        if settings['LOG_FILE']:
+            path = settings['LOG_FILE'].format(pid=os.getpid())
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self.sinks.append(RotatingFileHandler(path, maxBytes=settings['LOG_FILE_MAX_BYTES'],
+                                                  backupCount=settings['LOG_FILE_BACKUPS'], encoding='utf-8'))
+        for sink in self.sinks:
+            sink.setFormatter(formatter)
+        self.listener = QueueListener(self.queue, *self.sinks)
+        self.running = False
+
+    def start(self):
+        root = logging.getLogger()
+        root.setLevel(self.settings['LOG_LEVEL'])
+        if self.sinks:
+            self.listener.start()
+            self.running = True
+            root.addHandler(self.handler)
+
+    def stop(self):
+        logging.getLogger().removeHandler(self.handler)
+        if self.running:
+            self.listener.stop()
+            self.running = False
+        for sink in self.sinks:
+            sink.close()
+
+
+def start_logging(config):
+    """(Re)build the process-wide pipeline from `config`; the last call wins."""
+    global _pipeline
+    if _pipeline is not None:
+        _pipeline.stop()
+    _pipeline = _Pipeline({key: config[key] for key in (
+        'LOG_LEVEL', 'LOG_FORMAT', 'LOG_STREAM', 'LOG_FILE', 'LOG_FILE_MAX_BYTES', 'LOG_FILE_BACKUPS',
+        'LOG_QUEUE_SIZE', 'LOG_SAMPLE_RATES'
+    )})
+    _pipeline.start()
+
+
+def stop_logging():
+    """Write out everything queued and detach the pipeline."""
+    global _pipeline
+    if _pipeline is not None:
+        _pipeline.stop()
+        _pipeline = None
+
+
+def _restart_in_child():
+    # A forked process (preloaded gunicorn workers, reconcile's pool) inherits
+    # the handler but not the listener thread; give it a pipeline of its own.
+    global _pipeline
+    if _pipeline is not None:
+        inherited, _pipeline = _pipeline, _Pipeline(_pipeline.settings)
+        logging.getLogger().removeHandler(inherited.handler)
+        _pipeline.start()
+
+
+os.register_at_fork(after_in_child=_restart_in_child)
+atexit.register(stop_logging)
+
+
+def _claims():
+    try:
+        return get_jwt()
+    except RuntimeError:
+        return {}
+
+
+def request_id():
+    """Id of the current request, or None outside one."""
+    context = request.environ.get(ENVIRON_KEY) if has_request_context() else None
+    return context['request_id'] if context else None
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _count_query(*args):
+    if has_request_context():
+        context = request.environ.get(ENVIRON_KEY)
+        if context is not None:
+            context['queries'] += 1
+
+
+def _begin_request():
+    incoming = request.headers.get('X-Request-ID', '')
+    request.environ[ENVIRON_KEY] = {
+        'request_id': incoming if REQUEST_ID.fullmatch(incoming) else uuid.uuid4().hex,
+        'started': time.perf_counter(),
+        'queries': 0
+    }
+
+
+def _log_request(response):
+    context = request.environ.get(ENVIRON_KEY)
+    if context is None:
+        return response
+    response.headers['X-Request-ID'] = context['request_id']
+    latency_ms = (time.perf_counter() - context['started']) * 1000
+    if response.status_code >= 500:
+        level = logging.ERROR
+    elif latency_ms >= current_app.config['LOG_SLOW_REQUEST_MS']:
+        level = logging.WARNING
+    else:
+        level = logging.INFO
+    if access_logger.isEnabledFor(level):
+        access_logger.log(level, '%s %s %s %.1fms', request.method, request.path, response.status_code, latency_ms,
+                          extra={'method': request.method, 'path': request.path, 'status': response.status_code,
+                                 'latency_ms': round(latency_ms, 2), 'queries': context['queries']})
+    return response
+
+
+def init_logging(app):
+    start_logging(app.config)
+    app.before_request(_begin_request)
+    app.after_request(_log_request)
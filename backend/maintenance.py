@@ -0,0 +1,234 @@
+import logging
+import os
+import sqlite3
+import time
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+from db import db, sqlite_file
+from jobs import enqueue, job
+from revocation import delete_expired_revocations
+
+logger = logging.getLogger(__name__)
+
+# Pages copied per backup step; the source is unlocked between steps so
+# writers are never held up for long.
+BACKUP_STEP_PAGES = 1024
+BACKUP_STEP_SLEEP = 0.005
+
+
+def _database_path():
+    path = sqlite_file(db.engine)
+    if path is None:
+        raise RuntimeError("Database maintenance only handles file-backed SQLite databases")
+    return path
+
+
+def _connect(path):
+    # Autocommit, so VACUUM and the pragmas run outside a transaction
+    return sqlite3.connect(path, timeout=30, isolation_level=None)
+
+
+def _size(connection):
+    page_size = connection.execute('PRAGMA page_size').fetchone()[0]
+    page_count = connection.execute('PRAGMA page_count').fetchone()[0]
+    free_pages = connection.execute('PRAGMA freelist_count').fetchone()[0]
+    return {'bytes': page_size * page_count, 'free_bytes': page_size * free_pages}
+
+
+def _timed(task, run):
+    started = time.perf_counter()
+    result = run()
+    return {'task': task, **result, 'seconds': round(time.perf_counter() - started, 3)}
+
+
+def backup_database(directory=None, keep=None):
+    """Hot copy of the database through the SQLite online backup API.
+
+    Keeps the newest `keep` backups in `directory` and deletes older ones.
+    """
+    directory = directory or current_app.config['MAINTENANCE_BACKUP_DIR']
+    keep = keep or current_app.config['MAINTENANCE_BACKUP_KEEP']
+    source_path = _database_path()
+
+    def run():
+        os.makedirs(directory, exist_ok=True)
+        name = os.path.splitext(os.path.basename(source_path))[0]
+        target = os.path.join(directory, f"{name}-{datetime.utcnow().strftime('%Y%m%d-%H%M%S-%f')}.db")
+        source = _connect(source_path)
+        destination = sqlite3.connect(target)
+        try:
+            source.backup(destination, pages=BACKUP_STEP_PAGES, sleep=BACKUP_STEP_SLEEP)
+        finally:
+            destination.close()
+            source.close()
+
+        backups = sorted(
+            os.path.join(directory, entry) for entry in os.listdir(directory)
+            if entry.startswith(f'{name}-') and entry.endswith('.db')
+        )
+        pruned = backups[:-keep] if len(backups) > keep else []
+        for path in pruned:
+            os.remove(path)
+        return {'path': target, 'bytes': os.path.getsize(target), 'pruned': [os.path.basename(p) for p in pruned]}
+
+    return _timed('backup', run)
+
+
+def analyze():
+    """Refresh planner statistics (sqlite_stat1) and let SQLite apply its own optimisations."""
+    def run():
+        connection = _connect(_database_path())
+        try:
+            connection.execute('ANALYZE')
+            connection.execute('PRAGMA optimize')
+            tables = connection.execute('SELECT COUNT(DISTINCT tbl) FROM sqlite_stat1').fetchone()[0]
+            return {'tables': tables, **_size(connection)}
+        finally:
+            connection.close()
+
+    return _timed('analyze', run)
+
+
+def vacuum(pages=None, convert=False):
+    """Return up to `pages` free pages (default MAINTENANCE_VACUUM_PAGES) to the filesystem.
+
+    Needs auto_vacuum=INCREMENTAL. Switching an existing database over takes
+    one full VACUUM, which rewrites the file and holds the write lock
+    throughout, so it only happens with convert=True (`flask db-maintenance
+    vacuum --convert`). Otherwise such a database is skipped.
+    """
+    pages = current_app.config['MAINTENANCE_VACUUM_PAGES'] if pages is None else pages
+
+    def run():
+        connection = _connect(_database_path())
+        try:
+            before = _size(connection)
+            incremental = connection.execute('PRAGMA auto_vacuum').fetchone()[0] == 2
+            if not incremental and not convert:
+                logger.warning("Skipping vacuum: auto_vacuum is not INCREMENTAL; "
+                               "run `flask db-maintenance vacuum --convert` once, off hours")
+                return {'skipped': True, 'converted': False, 'bytes': before['bytes'],
+                        'free_bytes': before['free_bytes']}
+            if not incremental:
+                connection.execute('PRAGMA auto_vacuum = INCREMENTAL')
+                connection.execute('VACUUM')
+            else:
+                # execute() steps the pragma only once (one page); executescript runs it to completion
+                connection.executescript(f'PRAGMA incremental_vacuum({int(pages)});')
+            after = _size(connection)
+            return {
+                'skipped': False,
+                'converted': not incremental,
+                'bytes_before': before['bytes'],
+                'bytes': after['bytes'],
+                'reclaimed_bytes': before['bytes'] - after['bytes'],
+                'free_bytes': after['free_bytes']
+            }
+        finally:
+            connection.close()
+
+    return _timed('vacuum', run)
+
+
+def integrity_check(quick=False):
+    def run():
+        connection = _connect(_database_path())
+        try:
+            pragma = 'quick_check' if quick else 'integrity_check'
+            problems = [row[0] for row in connection.execute(f'PRAGMA {pragma}') if row[0] != 'ok']
+            foreign_keys = connection.execute('PRAGMA foreign_key_check').fetchall()
+            problems += [f"{table} rowid {rowid}: missing {parent} row" for table, rowid, parent, _ in foreign_keys]
+            return {'ok': not problems, 'problems': problems[:100], **_size(connection)}
+        finally:
+            connection.close()
+
+    return _timed('integrity', run)
+
+
+def prune_revocations():
+    """Drop revoked-token rows that can no longer match an unexpired token."""
+    return _timed('revocations', lambda: {'deleted': delete_expired_revocations()})
+
+
+TASKS = {
+    'backup': backup_database,
+    'analyze': analyze,
+    'vacuum': vacuum,
+    'integrity': integrity_check,
+    'revocations': prune_revocations,
+}
+# Run by the db_maintenance job and POST /owner/maintenance when no tasks are given
+DEFAULT_TASKS = ('integrity', 'revocations', 'backup', 'analyze', 'vacuum')
+
+
+@job('db_maintenance')
+def maintenance_job(payload, ctx):
+    tasks = payload.get('tasks') or list(DEFAULT_TASKS)
+    unknown = [task for task in tasks if task not in TASKS]
+    if unknown:
+        raise ValueError(f"Unknown maintenance tasks: {', '.join(unknown)}")
+
+    results = []
+    for index, task in enumerate(tasks):
+        results.append(TASKS[task]())
+        ctx.set_progress(index + 1, len(tasks))
+
+    # Recurring schedules re-enqueue themselves once a run has succeeded
+    every_hours = payload.get('every_hours')
+    if every_hours:
+        next_job = enqueue('db_maintenance', payload, run_after=datetime.utcnow() + timedelta(hours=every_hours))
+        return {'results': results, 'next_job_id': next_job.id}
+    return {'results': results}
+
+
+def _echo(result):
+    details = '  '.join(f'{key}={value}' for key, value in result.items() if key not in ('task', 'seconds'))
+    click.echo(f"{result['task']}: {result['seconds']}s  {details}")
+
+
+@click.group('db-maintenance')
+def maintenance_cli():
+    """Back up, analyze, vacuum and check the SQLite database."""
+
+
+@maintenance_cli.command('backup')
+@click.option('--dir', 'directory', help='Backup directory (default: MAINTENANCE_BACKUP_DIR).')
+@click.option('--keep', type=int, help='Backups to keep (default: MAINTENANCE_BACKUP_KEEP).')
+@with_appcontext
+def backup_command(directory, keep):
+    _echo(backup_database(directory, keep))
+
+
+@maintenance_cli.command('analyze')
+@with_appcontext
+def analyze_command():
+    _echo(analyze())
+
+
+@maintenance_cli.command('vacuum')
+@click.option('--pages', type=int, help='Free at most this many pages (default: MAINTENANCE_VACUUM_PAGES, 0 = all).')
+@click.option('--convert', is_flag=True,
+              help='Switch the file to auto_vacuum=INCREMENTAL first if needed (one full, blocking VACUUM).')
+@with_appcontext
+def vacuum_command(pages, convert):
+    _echo(vacuum(pages, convert=convert))
+
+
+@maintenance_cli.command('check')
+@click.option('--quick', is_flag=True, help='Run quick_check instead of the full integrity_check.')
+@with_appcontext
+def check_command(quick):
+    result = integrity_check(quick)
+    _echo(result)
+    if not result['ok']:
+        raise SystemExit(1)
+
+
+@maintenance_cli.command('revocations')
+@with_appcontext
+def revocations_command():
+    _echo(prune_revocations())
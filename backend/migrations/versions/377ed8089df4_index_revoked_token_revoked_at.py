@@ -0,0 +1,26 @@
+"""index revoked_token.revoked_at
+
+Revision ID: 377ed8089df4
+Revises: fd0bdffabb79
+Create Date: 2026-10-19 16:06:24.050994
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '377ed8089df4'
+down_revision = 'fd0bdffabb79'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('revoked_token', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_revoked_token_revoked_at'), ['revoked_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('revoked_token', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_revoked_token_revoked_at'))
@@ -0,0 +1,72 @@
+"""add stock_transfer, stock_transfer_line and an inventory (shop, product) index
+
+Revision ID: 39c58af57d0b
+Revises: 3673b71e1be7
+Create Date: 2026-03-31 14:18:05.732416
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '39c58af57d0b'
+down_revision = '3673b71e1be7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('stock_transfer',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('transfer_id', sa.String(length=50), nullable=False),
+    sa.Column('date', sa.DateTime(), nullable=False),
+    sa.Column('from_shop_id', sa.Integer(), nullable=False),
+    sa.Column('to_shop_id', sa.Integer(), nullable=False),
+    sa.Column('line_count', sa.Integer(), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('notes', sa.Text(), nullable=True),
+    sa.Column('created_by_id', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['created_by_id'], ['user.id'], ),
+    sa.ForeignKeyConstraint(['from_shop_id'], ['shop.id'], ),
+    sa.ForeignKeyConstraint(['to_shop_id'], ['shop.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('transfer_id')
+    )
+    with op.batch_alter_table('stock_transfer', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_stock_transfer_date'), ['date'], unique=False)
+        batch_op.create_index(batch_op.f('ix_stock_transfer_from_shop_id'), ['from_shop_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_stock_transfer_to_shop_id'), ['to_shop_id'], unique=False)
+
+    op.create_table('stock_transfer_line',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('transfer_pk', sa.Integer(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['product_id'], ['product.id'], ),
+    sa.ForeignKeyConstraint(['transfer_pk'], ['stock_transfer.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('stock_transfer_line', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_stock_transfer_line_product_id'), ['product_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_stock_transfer_line_transfer_pk'), ['transfer_pk'], unique=False)
+
+    with op.batch_alter_table('inventory', schema=None) as batch_op:
+        batch_op.create_index('ix_inventory_shop_product', ['shop_id', 'product_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('inventory', schema=None) as batch_op:
+        batch_op.drop_index('ix_inventory_shop_product')
+
+    with op.batch_alter_table('stock_transfer_line', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_stock_transfer_line_transfer_pk'))
+        batch_op.drop_index(batch_op.f('ix_stock_transfer_line_product_id'))
+
+    op.drop_table('stock_transfer_line')
+    with op.batch_alter_table('stock_transfer', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_stock_transfer_to_shop_id'))
+        batch_op.drop_index(batch_op.f('ix_stock_transfer_from_shop_id'))
+        batch_op.drop_index(batch_op.f('ix_stock_transfer_date'))
+
+    op.drop_table('stock_transfer')
@@ -0,0 +1,78 @@
+"""add ticket headers
+
+Revision ID: 8d41b0c6e2a9
+Revises: 5c2e8a1f7d40
+Create Date: 2026-01-19 16:02:47.530118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d41b0c6e2a9'
+down_revision = '5c2e8a1f7d40'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('ticket',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('ticket_id', sa.String(length=50), nullable=False),
+    sa.Column('time', sa.DateTime(), nullable=False),
+    sa.Column('shop_id', sa.Integer(), nullable=True),
+    sa.Column('employee_id', sa.Integer(), nullable=False),
+    sa.Column('line_count', sa.Integer(), nullable=False),
+    sa.Column('total', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['employee_id'], ['user.id'], ),
+    sa.ForeignKeyConstraint(['shop_id'], ['shop.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('ticket_id')
+    )
+    with op.batch_alter_table('ticket', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_ticket_employee_id'), ['employee_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_ticket_shop_id'), ['shop_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_ticket_time'), ['time'], unique=False)
+
+    with op.batch_alter_table('sale', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('ticket_pk', sa.Integer(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_sale_ticket_id'), ['ticket_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_sale_ticket_pk'), ['ticket_pk'], unique=False)
+        batch_op.create_foreign_key('fk_sale_ticket_pk_ticket', 'ticket', ['ticket_pk'], ['id'])
+
+    # Backfill one header per ticket, then point the lines at it. A ticket is
+    # its code, time and employee together: the old 6-character codes repeat,
+    # so a repeated code gets a '/2', '/3', ... suffix on its later headers.
+    op.execute(
+        'INSERT INTO ticket (ticket_id, time, shop_id, employee_id, line_count, total) '
+        "SELECT CASE WHEN g.n = 1 THEN g.ticket_id ELSE g.ticket_id || '/' || g.n END, "
+        'g.time, g.shop_id, g.employee_id, g.line_count, g.total FROM ('
+        'SELECT sale.ticket_id, sale.time, sale.employee_id, MIN(u.shop_id) AS shop_id, '
+        'COUNT(*) AS line_count, SUM(sale.total) AS total, '
+        'ROW_NUMBER() OVER (PARTITION BY sale.ticket_id ORDER BY MIN(sale.id)) AS n '
+        'FROM sale JOIN "user" u ON u.id = sale.employee_id '
+        'GROUP BY sale.ticket_id, sale.time, sale.employee_id'
+        ') g'
+    )
+    op.execute(
+        'UPDATE sale SET ticket_pk = (SELECT ticket.id FROM ticket '
+        'WHERE ticket.time = sale.time AND ticket.employee_id = sale.employee_id AND ('
+        "ticket.ticket_id = sale.ticket_id OR substr(ticket.ticket_id, 1, length(sale.ticket_id) + 1) = sale.ticket_id || '/'"
+        '))'
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('sale', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_sale_ticket_pk_ticket', type_='foreignkey')
+        batch_op.drop_index(batch_op.f('ix_sale_ticket_pk'))
+        batch_op.drop_index(batch_op.f('ix_sale_ticket_id'))
+        batch_op.drop_column('ticket_pk')
+
+    with op.batch_alter_table('ticket', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_ticket_time'))
+        batch_op.drop_index(batch_op.f('ix_ticket_shop_id'))
+        batch_op.drop_index(batch_op.f('ix_ticket_employee_id'))
+
+    op.drop_table('ticket')
@@ -0,0 +1,43 @@
+"""add sales archive registry
+
+Revision ID: a37f95d2c81e
+Revises: 8d41b0c6e2a9
+Create Date: 2026-02-03 11:48:22.907316
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a37f95d2c81e'
+down_revision = '8d41b0c6e2a9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('archived_month',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('month', sa.String(length=7), nullable=False),
+    sa.Column('table_name', sa.String(length=50), nullable=False),
+    sa.Column('row_count', sa.Integer(), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('total', sa.Float(), nullable=False),
+    sa.Column('archived_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('month')
+    )
+
+    # Rebuild sale with AUTOINCREMENT so ids of archived rows are never
+    # handed out again (restores would otherwise collide).
+    with op.batch_alter_table('sale', schema=None, recreate='always',
+                              table_kwargs={'sqlite_autoincrement': True}) as batch_op:
+        pass
+
+
+def downgrade():
+    with op.batch_alter_table('sale', schema=None, recreate='always') as batch_op:
+        pass
+
+    op.drop_table('archived_month')
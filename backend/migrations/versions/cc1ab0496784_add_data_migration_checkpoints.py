@@ -0,0 +1,35 @@
+"""add data_migration checkpoints for chunked backfills
+
+Revision ID: cc1ab0496784
+Revises: 39c58af57d0b
+Create Date: 2026-04-07 09:41:18.250673
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'cc1ab0496784'
+down_revision = '39c58af57d0b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('data_migration',
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('last_id', sa.Integer(), nullable=False),
+    sa.Column('rows_done', sa.Integer(), nullable=False),
+    sa.Column('rows_total', sa.Integer(), nullable=True),
+    sa.Column('chunk_size', sa.Integer(), nullable=False),
+    sa.Column('started_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade():
+    op.drop_table('data_migration')
@@ -0,0 +1,28 @@
+"""add write marks for replica read-your-writes
+
+Revision ID: d82a6c4e1f57
+Revises: c5e1f3a9b064
+Create Date: 2026-02-24 10:37:55.216904
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd82a6c4e1f57'
+down_revision = 'c5e1f3a9b064'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('write_mark',
+    sa.Column('identity', sa.String(length=100), nullable=False),
+    sa.Column('written_at', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('identity')
+    )
+
+
+def downgrade():
+    op.drop_table('write_mark')
@@ -0,0 +1,63 @@
+"""add product price history and unit cost/price on sale lines
+
+Revision ID: e4b7c29d5a13
+Revises: d82a6c4e1f57
+Create Date: 2026-03-03 09:12:40.581337
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4b7c29d5a13'
+down_revision = 'd82a6c4e1f57'
+branch_labels = None
+depends_on = None
+
+
+def _sale_tables():
+    # The hot table plus every sale_archive_YYYYMM partition
+    archived = op.get_bind().execute(sa.text('SELECT table_name FROM archived_month')).scalars().all()
+    return ['sale'] + list(archived)
+
+
+def upgrade():
+    op.create_table('product_price_history',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('cost_price', sa.Float(), nullable=False),
+    sa.Column('selling_price', sa.Float(), nullable=False),
+    sa.Column('effective_from', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['product_id'], ['product.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('product_price_history', schema=None) as batch_op:
+        batch_op.create_index('ix_product_price_history_product_effective', ['product_id', 'effective_from'], unique=False)
+
+    # Current prices are the earliest history there is
+    op.execute(
+        "INSERT INTO product_price_history (product_id, cost_price, selling_price, effective_from) "
+        "SELECT id, cost_price, selling_price, COALESCE(updated_at, CURRENT_TIMESTAMP) FROM product"
+    )
+
+    # Plain ADD COLUMN: a batch rebuild would drop sale's AUTOINCREMENT
+    for table in _sale_tables():
+        op.add_column(table, sa.Column('unit_cost', sa.Float(), nullable=True))
+        op.add_column(table, sa.Column('unit_price', sa.Float(), nullable=True))
+        # The price charged is exact; the cost is today's, the best record there is
+        op.execute(
+            f"UPDATE {table} SET unit_price = total / quantity, "
+            f"unit_cost = (SELECT cost_price FROM product WHERE product.id = {table}.product_id)"
+        )
+
+
+def downgrade():
+    for table in _sale_tables():
+        op.execute(f'ALTER TABLE {table} DROP COLUMN unit_price')
+        op.execute(f'ALTER TABLE {table} DROP COLUMN unit_cost')
+
+    with op.batch_alter_table('product_price_history', schema=None) as batch_op:
+        batch_op.drop_index('ix_product_price_history_product_effective')
+
+    op.drop_table('product_price_history')
@@ -0,0 +1,30 @@
+"""add deleted_at to shop, product and user
+
+Revision ID: f19a3d6c8b27
+Revises: e4b7c29d5a13
+Create Date: 2026-03-10 16:40:12.904215
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f19a3d6c8b27'
+down_revision = 'e4b7c29d5a13'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('shop', 'product', 'user'):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('deleted_at', sa.DateTime(), nullable=True))
+            batch_op.create_index(batch_op.f(f'ix_{table}_deleted_at'), ['deleted_at'], unique=False)
+
+
+def downgrade():
+    for table in ('user', 'product', 'shop'):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_index(batch_op.f(f'ix_{table}_deleted_at'))
+            batch_op.drop_column('deleted_at')
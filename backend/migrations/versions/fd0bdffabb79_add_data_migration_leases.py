@@ -0,0 +1,28 @@
+"""add data_migration leases
+
+Revision ID: fd0bdffabb79
+Revises: cc1ab0496784
+Create Date: 2026-10-19 16:03:24.234199
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'fd0bdffabb79'
+down_revision = 'cc1ab0496784'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('data_migration', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('locked_by', sa.String(length=100), nullable=True))
+        batch_op.add_column(sa.Column('locked_until', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('data_migration', schema=None) as batch_op:
+        batch_op.drop_column('locked_until')
+        batch_op.drop_column('locked_by')
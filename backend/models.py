@@ -1,5 +1,7 @@
 from db import db
-from bcrypt import hashpw, gensalt, checkpw
+from bcrypt import checkpw
+from passwords import hash_password
+from money import Money
 
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -10,10 +12,13 @@ class User(db.Model):
     contact = db.Column(db.String(50), nullable=True)
     username = db.Column(db.String(50), unique=True, nullable=False)
     password = db.Column(db.String(100), nullable=False)
+    deleted_at = db.Column(db.DateTime, nullable=True, index=True)
+    # Carried in tokens as 'tv'; bumping it revokes every older token
+    token_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     shop = db.relationship('Shop', backref=db.backref('employees', lazy=True))
 
     def set_password(self, password):
-        self.password = hashpw(password.encode('utf-8'), gensalt()).decode('utf-8')
+        self.password = hash_password(password)
 
     def check_password(self, password):
         return checkpw(password.encode('utf-8'), self.password.encode('utf-8'))
@@ -23,35 +28,79 @@ class Shop(db.Model):
     shop_id = db.Column(db.String(50), unique=True, nullable=False)
     name = db.Column(db.String(100), nullable=False)
     manager = db.Column(db.String(100), nullable=True)
+    deleted_at = db.Column(db.DateTime, nullable=True, index=True)
 
 class Product(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     product_id = db.Column(db.String(50), unique=True, nullable=False)
     name = db.Column(db.String(100), nullable=False)
     category = db.Column(db.String(100), nullable=True)
-    cost_price = db.Column(db.Float, nullable=False)
-    selling_price = db.Column(db.Float, nullable=False)
+    cost_price = db.Column(Money, nullable=False)
+    selling_price = db.Column(Money, nullable=False)
     reorder_level = db.Column(db.Integer, nullable=False)
+    version = db.Column(db.Integer, nullable=False, default=0, index=True)
+    updated_at = db.Column(db.DateTime, nullable=True)
+    deleted_at = db.Column(db.DateTime, nullable=True, index=True)
 
 class Inventory(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     shop_id = db.Column(db.Integer, db.ForeignKey('shop.id'), nullable=False)
     product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
     current_stock = db.Column(db.Integer, nullable=False)
+    version = db.Column(db.Integer, nullable=False, default=0, index=True)
+    updated_at = db.Column(db.DateTime, nullable=True)
     shop = db.relationship('Shop', backref=db.backref('inventory', lazy=True))
     product = db.relationship('Product', backref=db.backref('inventory', lazy=True))
+    __table_args__ = (db.Index('ix_inventory_shop_product', 'shop_id', 'product_id'),)
+
+class Ticket(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    ticket_id = db.Column(db.String(50), unique=True, nullable=False)
+    time = db.Column(db.DateTime, nullable=False, index=True)
+    shop_id = db.Column(db.Integer, db.ForeignKey('shop.id'), nullable=True, index=True)
+    employee_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    line_count = db.Column(db.Integer, nullable=False)
+    total = db.Column(Money, nullable=False)
+    shop = db.relationship('Shop', backref=db.backref('tickets', lazy=True))
+    employee = db.relationship('User', backref=db.backref('tickets', lazy=True))
 
 class Sale(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    ticket_id = db.Column(db.String(50), nullable=False)
+    ticket_id = db.Column(db.String(50), nullable=False, index=True)
+    ticket_pk = db.Column(db.Integer, db.ForeignKey('ticket.id'), nullable=True, index=True)
     time = db.Column(db.DateTime, nullable=False)
     product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
     quantity = db.Column(db.Integer, nullable=False)
-    total = db.Column(db.Float, nullable=False)
+    total = db.Column(Money, nullable=False)
     notes = db.Column(db.Text, nullable=True)
     employee_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    # Product cost and price when the line was sold, so margins need no joins
+    unit_cost = db.Column(Money, nullable=True)
+    unit_price = db.Column(Money, nullable=True)
     product = db.relationship('Product', backref=db.backref('sales', lazy=True))
     employee = db.relationship('User', backref=db.backref('sales', lazy=True))
+    ticket = db.relationship('Ticket', backref=db.backref('lines', lazy=True))
+    # Never reuse ids: archived rows keep theirs and may be restored later
+    __table_args__ = {'sqlite_autoincrement': True}
+
+class ProductPriceHistory(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
+    cost_price = db.Column(Money, nullable=False)
+    selling_price = db.Column(Money, nullable=False)
+    effective_from = db.Column(db.DateTime, nullable=False)
+    # No backref: history outlives deleted products
+    product = db.relationship('Product')
+    __table_args__ = (db.Index('ix_product_price_history_product_effective', 'product_id', 'effective_from'),)
+
+class ArchivedMonth(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    month = db.Column(db.String(7), unique=True, nullable=False)
+    table_name = db.Column(db.String(50), nullable=False)
+    row_count = db.Column(db.Integer, nullable=False)
+    quantity = db.Column(db.Integer, nullable=False)
+    total = db.Column(Money, nullable=False)
+    archived_at = db.Column(db.DateTime, nullable=False)
 
 class StockIn(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -64,3 +113,83 @@ class StockIn(db.Model):
     notes = db.Column(db.Text, nullable=True)
     shop = db.relationship('Shop', backref=db.backref('stock_ins', lazy=True))
     product = db.relationship('Product', backref=db.backref('stock_ins', lazy=True))
+
+class StockTransfer(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    transfer_id = db.Column(db.String(50), unique=True, nullable=False)
+    date = db.Column(db.DateTime, nullable=False, index=True)
+    from_shop_id = db.Column(db.Integer, db.ForeignKey('shop.id'), nullable=False, index=True)
+    to_shop_id = db.Column(db.Integer, db.ForeignKey('shop.id'), nullable=False, index=True)
+    line_count = db.Column(db.Integer, nullable=False)
+    quantity = db.Column(db.Integer, nullable=False)
+    notes = db.Column(db.Text, nullable=True)
+    created_by_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    from_shop = db.relationship('Shop', foreign_keys=[from_shop_id])
+    to_shop = db.relationship('Shop', foreign_keys=[to_shop_id])
+    lines = db.relationship('StockTransferLine', backref='transfer', lazy=True)
+
+class StockTransferLine(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    transfer_pk = db.Column(db.Integer, db.ForeignKey('stock_transfer.id'), nullable=False, index=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False, index=True)
+    quantity = db.Column(db.Integer, nullable=False)
+    product = db.relationship('Product')
+
+class DataMigration(db.Model):
+    # Checkpoint of one chunked data migration (see datamigrations.py)
+    name = db.Column(db.String(100), primary_key=True)
+    status = db.Column(db.String(20), nullable=False, default='running')
+    last_id = db.Column(db.Integer, nullable=False, default=0)
+    rows_done = db.Column(db.Integer, nullable=False, default=0)
+    rows_total = db.Column(db.Integer, nullable=True)
+    chunk_size = db.Column(db.Integer, nullable=False)
+    started_at = db.Column(db.DateTime, nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=False)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    # Lease of the runner working it; renewed with every chunk
+    locked_by = db.Column(db.String(100), nullable=True)
+    locked_until = db.Column(db.DateTime, nullable=True)
+
+class Job(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(100), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='queued')
+    payload = db.Column(db.Text, nullable=True)
+    result = db.Column(db.Text, nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    progress = db.Column(db.Float, nullable=False, default=0.0)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=3)
+    run_after = db.Column(db.DateTime, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    locked_by = db.Column(db.String(100), nullable=True)
+    created_by_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    __table_args__ = (db.Index('ix_job_status_run_after', 'status', 'run_after'),)
+
+class SyncCounter(db.Model):
+    name = db.Column(db.String(50), primary_key=True)
+    value = db.Column(db.Integer, nullable=False)
+
+class Tombstone(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    entity = db.Column(db.String(50), nullable=False)
+    entity_id = db.Column(db.Integer, nullable=False)
+    shop_id = db.Column(db.Integer, nullable=True)
+    version = db.Column(db.Integer, nullable=False, index=True)
+    deleted_at = db.Column(db.DateTime, nullable=False)
+
+class WriteMark(db.Model):
+    identity = db.Column(db.String(100), primary_key=True)
+    written_at = db.Column(db.Float, nullable=False)
+
+class RevokedToken(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    # 'jti:<jti>' revokes one token; 'sub:<username>' every token of that
+    # identity with a 'tv' claim below token_version
+    key = db.Column(db.String(150), nullable=False, index=True)
+    token_version = db.Column(db.Integer, nullable=True)
+    revoked_at = db.Column(db.DateTime, nullable=False, index=True)
+    # Once every token it could match has expired the row can go
+    expires_at = db.Column(db.DateTime, nullable=True, index=True)
@@ -0,0 +1,44 @@
+from decimal import Decimal, ROUND_HALF_UP
+
+from sqlalchemy import Integer, func, type_coerce
+from sqlalchemy.types import TypeDecorator
+
+# Amounts are stored as integer minor units (cents), so SQL sums them exactly
+# with integer arithmetic. Python code and the JSON API keep major units.
+MINOR_UNITS = 100
+
+
+def to_minor(amount):
+    if amount is None:
+        return None
+    # Through str(): 19.99 * 100 is 1998.9999999999998 as a float
+    return int((Decimal(str(amount)) * MINOR_UNITS).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def from_minor(minor_units):
+    if minor_units is None:
+        return None
+    return minor_units / MINOR_UNITS
+
+
+class Money(TypeDecorator):
+    """An amount of money, in major units on the Python side, minor units in the database."""
+
+    impl = Integer
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return to_minor(value)
+
+    def process_result_value(self, value, dialect):
+        return from_minor(value)
+
+
+def minor(expression):
+    """A Money column or expression as its raw integer minor units, e.g. for SUM()."""
+    return type_coerce(expression, Integer)
+
+
+def minor_sum(expression):
+    """SUM() of a Money expression, as an exact integer of minor units."""
+    return func.sum(minor(expression))
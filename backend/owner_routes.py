@@ -1,9 +1,29 @@
-from flask import Blueprint, request, jsonify
-from models import User, Shop, Product, Inventory, Sale, StockIn
+from flask import Blueprint, request, jsonify, current_app, send_file
+from models import User, Shop, Product, Inventory, Sale, StockIn, StockTransfer, Job, Ticket, ProductPriceHistory
 from db import db
-from flask_jwt_extended import jwt_required
+from flask_jwt_extended import jwt_required, get_jwt_identity
 from decorators import owner_required
+from jobs import enqueue, job_to_dict
+from tickets import ticket_to_dict, basket_metrics
+from archive import sales_entity, sales_total
+from responses import list_response
+from cache import cache
+import reports  # noqa: F401  (registers job handlers)
+from maintenance import DEFAULT_TASKS as DEFAULT_MAINTENANCE_TASKS, TASKS as MAINTENANCE_TASKS
+import reconcile  # noqa: F401
+from pricing import margin_report
+from inventory_matrix import SHAPES as MATRIX_SHAPES, inventory_matrix
+from transfers import InsufficientStock, parse_items, transfer_stock, transfer_to_dict
+from softdelete import soft_delete
+from shards import each_shard, find, use_shard
+from revocation import revoke_user
+from profiling import list_profiles, load_profile, profile_path
 from email_validator import validate_email, EmailNotValidError
+from passwords import hash_passwords
+from datetime import datetime
+from itertools import islice
+import heapq
+import uuid
 
 owner_bp = Blueprint('owner', __name__)
 
@@ -12,7 +32,7 @@ owner_bp = Blueprint('owner', __name__)
 @owner_required()
 def get_employees():
     users = User.query.all()
-    return jsonify([{
+    return list_response([{
         'id': user.id,
         'employee_id': user.employee_id,
         'name': user.name,
@@ -47,7 +67,8 @@ def create_employee():
     except EmailNotValidError as e:
         return jsonify({"msg": str(e)}), 400
 
-    if User.query.filter_by(username=username).first():
+    # Deleted employees keep their username until the purge anonymizes them
+    if User.query.filter_by(username=username).execution_options(include_deleted=True).first():
         return jsonify({"msg": "User with this username already exists."}), 400
 
     new_user = User(
@@ -63,6 +84,104 @@ def create_employee():
     db.session.commit()
     return jsonify({'message': 'Employee created successfully'}), 201
 
+EMPLOYEE_FIELDS = ('employee_id', 'name', 'shop_id', 'role', 'contact', 'username')
+
+def _session_claims(user):
+    # What a login token records about its user (see auth.login)
+    return (user.username, user.role, user.shop_id)
+
+def _validate_employee_rows(rows):
+    """Per-row errors for a bulk employee payload, checked with one query per table."""
+    errors = []
+    ids = [row['id'] for row in rows if isinstance(row, dict) and row.get('id') is not None]
+    existing = {user.id: user for user in User.query.filter(User.id.in_(ids))} if ids else {}
+    usernames = [row.get('username') for row in rows if isinstance(row, dict) and row.get('username')]
+    employee_ids = [row.get('employee_id') for row in rows if isinstance(row, dict) and row.get('employee_id')]
+    taken = User.query.filter(
+        db.or_(User.username.in_(usernames), User.employee_id.in_(employee_ids))
+    ).execution_options(include_deleted=True).all()
+    taken_usernames = {user.username: user.id for user in taken}
+    taken_employee_ids = {user.employee_id: user.id for user in taken}
+    shop_ids = {row.get('shop_id') for row in rows if isinstance(row, dict) and row.get('shop_id') is not None}
+    known_shops = {shop_id for (shop_id,) in db.session.query(Shop.id).filter(Shop.id.in_(shop_ids))}
+
+    seen_usernames, seen_employee_ids, checked_domains = set(), set(), set()
+    for index, row in enumerate(rows):
+        if not isinstance(row, dict):
+            errors.append({'row': index, 'msg': 'Each employee must be an object'})
+            continue
+        user_id = row.get('id')
+        if user_id is not None and user_id not in existing:
+            errors.append({'row': index, 'msg': f'Employee {user_id} not found'})
+            continue
+        if user_id is None:
+            missing = [field for field in ('employee_id', 'name', 'role', 'username', 'password') if not row.get(field)]
+            if missing:
+                errors.append({'row': index, 'msg': f"Missing required fields: {', '.join(missing)}"})
+                continue
+
+        username = row.get('username')
+        if username:
+            domain = username.rpartition('@')[2].lower()
+            try:
+                # Deliverability (a DNS lookup) is checked once per domain
+                validate_email(username, check_deliverability=None if domain not in checked_domains else False)
+                checked_domains.add(domain)
+            except EmailNotValidError as e:
+                errors.append({'row': index, 'msg': str(e)})
+                continue
+            if taken_usernames.get(username, user_id) != user_id or username in seen_usernames:
+                errors.append({'row': index, 'msg': f'Username {username} already exists'})
+                continue
+            seen_usernames.add(username)
+
+        employee_id = row.get('employee_id')
+        if employee_id:
+            if taken_employee_ids.get(employee_id, user_id) != user_id or employee_id in seen_employee_ids:
+                errors.append({'row': index, 'msg': f'Employee id {employee_id} already exists'})
+                continue
+            seen_employee_ids.add(employee_id)
+
+        if row.get('shop_id') is not None and row['shop_id'] not in known_shops:
+            errors.append({'row': index, 'msg': f"Shop {row['shop_id']} not found"})
+    return errors, existing
+
+@owner_bp.route('/employees/bulk', methods=['POST'])
+@jwt_required()
+@owner_required()
+def bulk_upsert_employees():
+    data = request.get_json(silent=True) or {}
+    rows = data.get('employees')
+    if not isinstance(rows, list) or not rows:
+        return jsonify({"msg": "Missing employees in request"}), 400
+
+    errors, existing = _validate_employee_rows(rows)
+    if errors:
+        return jsonify({"msg": "No employees were saved", "errors": errors}), 400
+
+    # Hash every password up front, in parallel, before touching the session
+    hashes = iter(hash_passwords([row['password'] for row in rows if row.get('password')]))
+
+    created = updated = 0
+    for row in rows:
+        user = existing.get(row.get('id'))
+        if user is None:
+            user = User(**{field: row.get(field) for field in EMPLOYEE_FIELDS})
+            db.session.add(user)
+            created += 1
+        else:
+            before = _session_claims(user)
+            for field in EMPLOYEE_FIELDS:
+                if field in row:
+                    setattr(user, field, row[field])
+            updated += 1
+            if row.get('password') or _session_claims(user) != before:
+                revoke_user(user, before[0])
+        if row.get('password'):
+            user.password = next(hashes)
+    db.session.commit()
+    return jsonify({'message': 'Employees saved successfully', 'created': created, 'updated': updated}), 200
+
 @owner_bp.route('/employees/<int:id>', methods=['PUT'])
 @jwt_required()
 @owner_required()
@@ -72,6 +191,7 @@ def update_employee(id):
     if not user:
         return jsonify({'message': 'Employee not found'}), 404
 
+    before = _session_claims(user)
     user.employee_id = data.get('employee_id', user.employee_id)
     user.name = data.get('name', user.name)
     user.shop_id = data.get('shop_id', user.shop_id)
@@ -81,6 +201,9 @@ def update_employee(id):
 
     if 'password' in data:
         user.set_password(data['password'])
+    # Existing sessions end when the password or anything their token claims changes
+    if 'password' in data or _session_claims(user) != before:
+        revoke_user(user, before[0])
 
     db.session.commit()
     return jsonify({'message': 'Employee updated successfully'})
@@ -93,16 +216,16 @@ def delete_employee(id):
     if not user:
         return jsonify({'message': 'Employee not found'}), 404
 
-    db.session.delete(user)
-    db.session.commit()
-    return jsonify({'message': 'Employee deleted successfully'})
+    owner = User.query.filter_by(username=get_jwt_identity()).first()
+    purge_job = soft_delete(user, created_by_id=owner.id if owner else None)
+    return jsonify({'message': 'Employee deleted successfully', 'job_id': purge_job.id})
 
 @owner_bp.route('/shops', methods=['GET'])
 @jwt_required()
 @owner_required()
 def get_shops():
     shops = Shop.query.all()
-    return jsonify([{
+    return list_response([{
         'id': shop.id,
         'shop_id': shop.shop_id,
         'name': shop.name,
@@ -123,7 +246,8 @@ def create_shop():
     if not all([shop_id, name]):
         return jsonify({"msg": "Missing required fields"}), 400
 
-    if Shop.query.filter_by(shop_id=shop_id).first():
+    # Codes of deleted shops stay taken: their tickets still show them
+    if Shop.query.filter_by(shop_id=shop_id).execution_options(include_deleted=True).first():
         return jsonify({"msg": "Shop with this ID already exists."}), 400
 
     new_shop = Shop(
@@ -159,16 +283,16 @@ def delete_shop(id):
     if not shop:
         return jsonify({'message': 'Shop not found'}), 404
 
-    db.session.delete(shop)
-    db.session.commit()
-    return jsonify({'message': 'Shop deleted successfully'})
+    owner = User.query.filter_by(username=get_jwt_identity()).first()
+    purge_job = soft_delete(shop, created_by_id=owner.id if owner else None)
+    return jsonify({'message': 'Shop deleted successfully', 'job_id': purge_job.id})
 
 @owner_bp.route('/products', methods=['GET'])
 @jwt_required()
 @owner_required()
 def get_products():
     products = Product.query.all()
-    return jsonify([{
+    return list_response([{
         'id': product.id,
         'product_id': product.product_id,
         'name': product.name,
@@ -209,7 +333,7 @@ def create_product():
         return jsonify({"msg": "cost_price, selling_price and reorder_level must be non-negative"}), 400
 
     # Check if product with same product_id already exists
-    if Product.query.filter_by(product_id=product_id).first():
+    if Product.query.filter_by(product_id=product_id).execution_options(include_deleted=True).first():
         return jsonify({"msg": "Product with this ID already exists."}), 400
 
     # Create new product with validated numeric fields
@@ -281,15 +405,18 @@ def delete_product(id):
     if not product:
         return jsonify({'message': 'Product not found'}), 404
 
-    db.session.delete(product)
-    db.session.commit()
-    return jsonify({'message': 'Product deleted successfully'})
+    owner = User.query.filter_by(username=get_jwt_identity()).first()
+    purge_job = soft_delete(product, created_by_id=owner.id if owner else None)
+    return jsonify({'message': 'Product deleted successfully', 'job_id': purge_job.id})
 
 @owner_bp.route('/inventory', methods=['GET'])
 @jwt_required()
 @owner_required()
 def get_inventory():
-    query = Inventory.query.options(db.joinedload(Inventory.shop), db.joinedload(Inventory.product))
+    # Inventory of a deleted shop or product lingers until its purge job runs
+    query = Inventory.query.join(Inventory.shop).join(Inventory.product).filter(
+        Shop.deleted_at.is_(None), Product.deleted_at.is_(None)
+    ).options(db.contains_eager(Inventory.shop), db.contains_eager(Inventory.product))
 
     shop_id = request.args.get('shop_id')
     if shop_id:
@@ -297,27 +424,51 @@ def get_inventory():
 
     view = request.args.get('view')
     if view == 'low':
-        query = query.join(Product).filter(Inventory.current_stock <= Product.reorder_level)
+        query = query.filter(Inventory.current_stock <= Product.reorder_level)
 
     product_name = request.args.get('product_name')
     if product_name:
-        query = query.join(Product).filter(Product.name.ilike(f'%{product_name}%'))
+        query = query.filter(Product.name.ilike(f'%{product_name}%'))
 
-    inventory = query.all()
-    return jsonify([{
+    # In sharded mode one part per shop, in shop order
+    inventory = [item for part in each_shard(query.all, [shop_id] if shop_id else None) for item in part]
+    return list_response([{
         'id': item.id,
         'shop_id': item.shop_id,
         'product_id': item.product_id,
         'current_stock': item.current_stock,
         'shop': {
+            'id': item.shop.id,
             'shop_id': item.shop.shop_id,
             'name': item.shop.name
         },
         'product': {
+            'id': item.product.id,
             'name': item.product.name,
             'reorder_level': item.product.reorder_level
         }
-    } for item in inventory])
+    } for item in inventory], refs=('shop', 'product'))
+
+@owner_bp.route('/inventory/matrix', methods=['GET'])
+@jwt_required()
+@owner_required()
+def get_inventory_matrix():
+    # ?shop_id=1,2 (or repeated), ?product_name=, ?view=low, ?shape=dense|sparse
+    try:
+        shop_ids = sorted({int(part) for value in request.args.getlist('shop_id')
+                           for part in value.split(',') if part.strip()})
+    except ValueError:
+        return jsonify({"msg": "shop_id must be a list of shop ids"}), 400
+    shape = request.args.get('shape')
+    if shape and shape not in MATRIX_SHAPES:
+        return jsonify({"msg": f"shape must be one of: {', '.join(MATRIX_SHAPES)}"}), 400
+    product_name = request.args.get('product_name', '').strip()
+    low_only = request.args.get('view') == 'low'
+
+    key = f"owner:inventory:matrix:{','.join(map(str, shop_ids))}:{product_name.lower()}:{low_only}:{shape}"
+    return jsonify(cache.get_or_set(
+        key, lambda: inventory_matrix(shop_ids, product_name, low_only, shape), tags=('inventory', 'shop', 'product')
+    ))
 
 @owner_bp.route('/inventory/stock-in', methods=['POST'])
 @jwt_required()
@@ -334,93 +485,241 @@ def stock_in():
     if not all([shop_id, product_id, quantity]):
         return jsonify({"msg": "Missing required fields"}), 400
 
-    inventory_item = Inventory.query.filter_by(shop_id=shop_id, product_id=product_id).first()
+    try:
+        with use_shard(shop_id):
+            inventory_item = Inventory.query.filter_by(shop_id=shop_id, product_id=product_id).first()
+
+            if inventory_item:
+                inventory_item.current_stock += quantity
+            else:
+                inventory_item = Inventory(
+                    shop_id=shop_id,
+                    product_id=product_id,
+                    current_stock=quantity
+                )
+                db.session.add(inventory_item)
+
+            # Recorded in the same commit so reconciliation counts it as received
+            record = StockIn(stock_in_id=f'#SI-{uuid.uuid4().hex[:8].upper()}', date=datetime.utcnow(),
+                             shop_id=shop_id, product_id=product_id, quantity=quantity, supplier=data.get('supplier'),
+                             notes=data.get('notes'))
+            db.session.add(record)
+            db.session.commit()
+            return jsonify({'message': 'Stock added successfully', 'stock_in_id': record.stock_in_id}), 201
+    except LookupError as e:
+        # Sharded mode only: no shard file is created for an unknown shop
+        return jsonify({"msg": str(e)}), 404
+
+@owner_bp.route('/inventory/transfers', methods=['POST'])
+@jwt_required()
+@owner_required()
+def create_transfer():
+    data = request.get_json(silent=True) or {}
+    try:
+        from_shop_id, to_shop_id = int(data.get('from_shop_id')), int(data.get('to_shop_id'))
+    except (TypeError, ValueError):
+        return jsonify({"msg": "from_shop_id and to_shop_id are required"}), 400
 
-    if inventory_item:
-        inventory_item.current_stock += quantity
-    else:
-        inventory_item = Inventory(
-            shop_id=shop_id,
-            product_id=product_id,
-            current_stock=quantity
-        )
-        db.session.add(inventory_item)
+    owner = User.query.filter_by(username=get_jwt_identity()).first()
+    try:
+        transfer = transfer_stock(from_shop_id, to_shop_id, parse_items(data.get('items')), notes=data.get('notes'),
+                                  created_by_id=owner.id if owner else None)
+    except InsufficientStock as error:
+        return jsonify({"msg": "Insufficient stock, nothing was moved", "shortages": error.shortages}), 409
+    except LookupError as error:
+        return jsonify({"msg": str(error)}), 404
+    except ValueError as error:
+        return jsonify({"msg": str(error)}), 400
+    return jsonify(transfer_to_dict(transfer, with_lines=True)), 201
+
+@owner_bp.route('/inventory/transfers', methods=['GET'])
+@jwt_required()
+@owner_required()
+def get_transfers():
+    query = StockTransfer.query.options(db.joinedload(StockTransfer.from_shop), db.joinedload(StockTransfer.to_shop))
+    shop_id = request.args.get('shop_id', type=int)
+    if shop_id:
+        query = query.filter(db.or_(StockTransfer.from_shop_id == shop_id, StockTransfer.to_shop_id == shop_id))
+    transfers = query.order_by(StockTransfer.date.desc(), StockTransfer.id.desc()).all()
+    return list_response([transfer_to_dict(transfer) for transfer in transfers], refs=('from_shop', 'to_shop'))
 
-    db.session.commit()
-    return jsonify({'message': 'Stock added successfully'}), 201
+@owner_bp.route('/inventory/transfers/<int:id>', methods=['GET'])
+@jwt_required()
+@owner_required()
+def get_transfer(id):
+    transfer = db.session.get(StockTransfer, id)
+    if not transfer:
+        return jsonify({'message': 'Transfer not found'}), 404
+    return jsonify(transfer_to_dict(transfer, with_lines=True))
+
+@owner_bp.route('/inventory/reconcile', methods=['POST'])
+@jwt_required()
+@owner_required()
+def reconcile_inventory():
+    data = request.get_json(silent=True) or {}
+    owner = User.query.filter_by(username=get_jwt_identity()).first()
+    new_job = enqueue('inventory_reconcile', {
+        'shop_ids': data.get('shop_ids'),
+        'correct': bool(data.get('correct'))
+    }, max_attempts=1, created_by_id=owner.id if owner else None)
+    return jsonify({'job_id': new_job.id, 'status': new_job.status}), 202
 
 @owner_bp.route('/dashboard', methods=['GET'])
 @jwt_required()
 @owner_required()
 def dashboard():
-    total_sales = db.session.query(db.func.sum(Sale.total)).scalar()
-    low_stock_count = db.session.query(Inventory).join(Product).filter(Inventory.current_stock <= Product.reorder_level).count()
+    def compute():
+        low_stock = db.session.query(Inventory).join(Shop).join(Product).filter(
+            Inventory.current_stock <= Product.reorder_level,
+            Shop.deleted_at.is_(None),
+            Product.deleted_at.is_(None)
+        )
+        low_stock_count = sum(each_shard(low_stock.count))
+        return {'total_sales': sales_total(), 'low_stock_count': low_stock_count}
 
-    return jsonify({
-        'total_sales': total_sales,
-        'low_stock_count': low_stock_count
-    })
+    # Tagged with the tables the KPIs are computed from
+    return jsonify(cache.get_or_set(
+        'owner:dashboard', compute, tags=('sale', 'archived_month', 'inventory', 'product')
+    ))
 
 @owner_bp.route('/sales', methods=['GET'])
 @jwt_required()
 @owner_required()
 def get_sales():
-    query = Sale.query.options(db.joinedload(Sale.employee).joinedload(User.shop), db.joinedload(Sale.product))
-
     date_from = request.args.get('date_from')
+    date_to = request.args.get('date_to')
+
+    # Only the archived months overlapping the date range are scanned
+    SaleRow = sales_entity(date_from, date_to)
+    query = db.session.query(SaleRow).options(
+        db.joinedload(SaleRow.employee).joinedload(User.shop), db.joinedload(SaleRow.product)
+    )
+
     if date_from:
-        query = query.filter(Sale.time >= date_from)
+        query = query.filter(SaleRow.time >= date_from)
 
-    date_to = request.args.get('date_to')
     if date_to:
-        query = query.filter(Sale.time <= date_to)
+        query = query.filter(SaleRow.time <= date_to)
 
     shop_id = request.args.get('shop_id')
-    if shop_id:
-        query = query.join(User).filter(User.shop_id == shop_id)
-
     employee_name = request.args.get('employee_name')
+    if shop_id or employee_name:
+        query = query.join(SaleRow.employee)
+    if shop_id:
+        query = query.filter(User.shop_id == shop_id)
     if employee_name:
-        query = query.join(User).filter(User.name.ilike(f'%{employee_name}%'))
+        query = query.filter(User.name.ilike(f'%{employee_name}%'))
 
-    sales = query.all()
-    return jsonify([{
+    sales = [sale for part in each_shard(query.all) for sale in part]
+    return list_response([{
         'id': sale.id,
         'ticket_id': sale.ticket_id,
         'time': sale.time,
         'product': {
+            'id': sale.product.id,
             'name': sale.product.name
         },
         'quantity': sale.quantity,
         'total': sale.total,
         'employee': {
+            'id': sale.employee.id,
             'name': sale.employee.name
         },
         'shop': {
+            'id': sale.employee.shop.id,
             'shop_id': sale.employee.shop.shop_id,
             'name': sale.employee.shop.name
         }
-    } for sale in sales])
+    } for sale in sales], refs=('product', 'employee', 'shop'))
+
+@owner_bp.route('/tickets', methods=['GET'])
+@jwt_required()
+@owner_required()
+def get_tickets():
+    query = Ticket.query.options(db.joinedload(Ticket.shop), db.joinedload(Ticket.employee)).order_by(Ticket.time.desc())
+
+    ticket_id = request.args.get('ticket_id')
+    if ticket_id:
+        query = query.filter(Ticket.ticket_id == ticket_id)
+
+    date_from = request.args.get('date_from')
+    if date_from:
+        query = query.filter(Ticket.time >= date_from)
+
+    date_to = request.args.get('date_to')
+    if date_to:
+        query = query.filter(Ticket.time <= date_to)
+
+    shop_id = request.args.get('shop_id')
+    if shop_id:
+        query = query.filter(Ticket.shop_id == shop_id)
+
+    limit = request.args.get('limit', 100, type=int)
+    parts = each_shard(query.limit(limit).all, [shop_id] if shop_id else None)
+    # Every shard returns its own newest tickets: merge them and cut at the limit again
+    tickets = parts[0] if len(parts) == 1 else list(islice(
+        heapq.merge(*parts, key=lambda ticket: ticket.time, reverse=True), limit if limit >= 0 else None
+    ))
+    return list_response([{
+        'id': ticket.id,
+        'ticket_id': ticket.ticket_id,
+        'time': ticket.time,
+        'line_count': ticket.line_count,
+        'total': ticket.total,
+        'employee': {
+            'id': ticket.employee.id,
+            'name': ticket.employee.name
+        },
+        'shop': {
+            'id': ticket.shop.id,
+            'shop_id': ticket.shop.shop_id,
+            'name': ticket.shop.name
+        } if ticket.shop else None
+    } for ticket in tickets], refs=('employee', 'shop'))
+
+@owner_bp.route('/tickets/<int:id>', methods=['GET'])
+@jwt_required()
+@owner_required()
+def get_ticket(id):
+    shop_id, ticket = find(Ticket, id)
+    if not ticket:
+        return jsonify({'message': 'Ticket not found'}), 404
+    with use_shard(shop_id):
+        return jsonify(ticket_to_dict(ticket))
+
+@owner_bp.route('/tickets/metrics', methods=['GET'])
+@jwt_required()
+@owner_required()
+def get_ticket_metrics():
+    return jsonify(basket_metrics(
+        date_from=request.args.get('date_from'),
+        date_to=request.args.get('date_to'),
+        shop_id=request.args.get('shop_id'),
+        by_shop=request.args.get('by_shop') == 'true'
+    ))
 
 @owner_bp.route('/stock-in', methods=['GET'])
 @jwt_required()
 @owner_required()
 def get_stock_ins():
-    stock_ins = StockIn.query.options(db.joinedload(StockIn.shop), db.joinedload(StockIn.product)).all()
-    return jsonify([{
+    query = StockIn.query.options(db.joinedload(StockIn.shop), db.joinedload(StockIn.product))
+    stock_ins = [stock_in for part in each_shard(query.all) for stock_in in part]
+    return list_response([{
         'id': stock_in.id,
         'stock_in_id': stock_in.stock_in_id,
         'date': stock_in.date,
         'shop': {
+            'id': stock_in.shop.id,
             'shop_id': stock_in.shop.shop_id,
             'name': stock_in.shop.name
         },
         'product': {
+            'id': stock_in.product.id,
             'name': stock_in.product.name
         },
         'quantity': stock_in.quantity,
         'supplier': stock_in.supplier
-    } for stock_in in stock_ins])
+    } for stock_in in stock_ins], refs=('shop', 'product'))
 
 @owner_bp.route('/stock-in', methods=['POST'])
 @jwt_required()
@@ -436,6 +735,156 @@ def create_stock_in():
         supplier=data.get('supplier'),
         notes=data.get('notes')
     )
-    db.session.add(new_stock_in)
-    db.session.commit()
+    try:
+        with use_shard(data['shop_id']):
+            db.session.add(new_stock_in)
+            db.session.commit()
+    except LookupError as e:
+        return jsonify({"msg": str(e)}), 404
     return jsonify({'message': 'Stock-in record created successfully'}), 201
+
+@owner_bp.route('/reports/sales', methods=['POST'])
+@jwt_required()
+@owner_required()
+def create_sales_report():
+    data = request.get_json(silent=True) or {}
+    owner = User.query.filter_by(username=get_jwt_identity()).first()
+    new_job = enqueue('sales_report', {
+        'date_from': data.get('date_from'),
+        'date_to': data.get('date_to')
+    }, created_by_id=owner.id if owner else None)
+    return jsonify({'job_id': new_job.id, 'status': new_job.status}), 202
+
+@owner_bp.route('/maintenance', methods=['POST'])
+@jwt_required()
+@owner_required()
+def schedule_maintenance():
+    data = request.get_json(silent=True) or {}
+    tasks = data.get('tasks') or list(DEFAULT_MAINTENANCE_TASKS)
+    unknown = [task for task in tasks if task not in MAINTENANCE_TASKS]
+    if unknown:
+        return jsonify({"msg": f"Unknown maintenance tasks: {', '.join(unknown)}"}), 400
+
+    run_after = None
+    if data.get('run_at'):
+        try:
+            run_after = datetime.fromisoformat(data['run_at'])
+        except ValueError:
+            return jsonify({"msg": "run_at must be an ISO 8601 datetime"}), 400
+    every_hours = data.get('every_hours')
+    if every_hours is not None and (not isinstance(every_hours, (int, float)) or every_hours <= 0):
+        return jsonify({"msg": "every_hours must be a positive number"}), 400
+
+    owner = User.query.filter_by(username=get_jwt_identity()).first()
+    new_job = enqueue('db_maintenance', {'tasks': tasks, 'every_hours': every_hours},
+                      max_attempts=1, created_by_id=owner.id if owner else None, run_after=run_after)
+    return jsonify({'job_id': new_job.id, 'status': new_job.status}), 202
+
+@owner_bp.route('/reports/margin', methods=['GET'])
+@jwt_required()
+@owner_required()
+def get_margin_report():
+    try:
+        rows = margin_report(request.args.get('date_from'), request.args.get('date_to'),
+                             request.args.get('group_by', 'product'))
+    except ValueError as e:
+        return jsonify({"msg": str(e)}), 400
+    return list_response(rows)
+
+@owner_bp.route('/products/<int:id>/price-history', methods=['GET'])
+@jwt_required()
+@owner_required()
+def get_price_history(id):
+    history = ProductPriceHistory.query.filter_by(product_id=id).order_by(
+        ProductPriceHistory.effective_from, ProductPriceHistory.id
+    ).all()
+    return list_response([{
+        'id': entry.id,
+        'cost_price': entry.cost_price,
+        'selling_price': entry.selling_price,
+        'effective_from': entry.effective_from.isoformat()
+    } for entry in history])
+
+@owner_bp.route('/jobs', methods=['GET'])
+@jwt_required()
+@owner_required()
+def get_jobs():
+    query = Job.query.order_by(Job.id.desc())
+
+    status = request.args.get('status')
+    if status:
+        query = query.filter(Job.status == status)
+
+    kind = request.args.get('kind')
+    if kind:
+        query = query.filter(Job.kind == kind)
+
+    jobs = query.limit(request.args.get('limit', 50, type=int)).all()
+    return list_response([job_to_dict(job) for job in jobs])
+
+@owner_bp.route('/jobs/<int:id>', methods=['GET'])
+@jwt_required()
+@owner_required()
+def get_job(id):
+    job = db.session.get(Job, id)
+    if not job:
+        return jsonify({'message': 'Job not found'}), 404
+    return jsonify(job_to_dict(job, include_result=True))
+
+@owner_bp.route('/jobs/<int:id>/retry', methods=['POST'])
+@jwt_required()
+@owner_required()
+def retry_job(id):
+    job = db.session.get(Job, id)
+    if not job:
+        return jsonify({'message': 'Job not found'}), 404
+    if job.status != 'failed':
+        return jsonify({"msg": "Only failed jobs can be retried"}), 400
+
+    job.status = 'queued'
+    job.attempts = 0
+    job.error = None
+    job.progress = 0.0
+    job.finished_at = None
+    job.run_after = datetime.utcnow()
+    db.session.commit()
+    return jsonify(job_to_dict(job)), 202
+
+@owner_bp.route('/cache/stats', methods=['GET'])
+@jwt_required()
+@owner_required()
+def get_cache_stats():
+    # Counters are per worker process; the pid tells workers apart
+    return jsonify(cache.stats())
+
+@owner_bp.route('/profiles', methods=['GET'])
+@jwt_required()
+@owner_required()
+def get_profiles():
+    if not current_app.config['PROFILING_ENABLED']:
+        return jsonify({"msg": "Profiling is disabled"}), 404
+    return list_response(list_profiles())
+
+@owner_bp.route('/profiles/<profile_id>', methods=['GET'])
+@jwt_required()
+@owner_required()
+def get_profile(profile_id):
+    if not current_app.config['PROFILING_ENABLED']:
+        return jsonify({"msg": "Profiling is disabled"}), 404
+
+    output = request.args.get('format', 'json')
+    if output == 'json':
+        profile = load_profile(profile_id)
+        if profile is None:
+            return jsonify({'message': 'Profile not found'}), 404
+        return jsonify(profile)
+    if output not in ('pstats', 'collapsed'):
+        return jsonify({"msg": "format must be json, pstats or collapsed"}), 400
+
+    # pstats: load with pstats.Stats or snakeviz. collapsed: feed to flamegraph.pl or speedscope.
+    suffix, mimetype = ('.prof', 'application/octet-stream') if output == 'pstats' else ('.collapsed', 'text/plain')
+    path = profile_path(profile_id, suffix)
+    if path is None:
+        return jsonify({'message': f'No {output} data for this profile'}), 404
+    return send_file(path, mimetype=mimetype, as_attachment=output == 'pstats',
+                     download_name=f'{profile_id}{suffix}')
@@ -0,0 +1,26 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from bcrypt import gensalt, hashpw
+from flask import current_app
+
+
+def hash_password(password, rounds=None):
+    if rounds is None:
+        rounds = current_app.config.get('BCRYPT_ROUNDS', 12)
+    return hashpw(password.encode('utf-8'), gensalt(rounds)).decode('utf-8')
+
+
+def hash_passwords(passwords, rounds=None, workers=None):
+    """Hash many passwords at once, in the order given.
+
+    bcrypt releases the GIL while hashing, so a thread pool uses every core
+    without the start-up cost of worker processes.
+    """
+    if rounds is None:
+        rounds = current_app.config.get('BCRYPT_ROUNDS', 12)
+    workers = workers or current_app.config.get('BCRYPT_WORKERS') or os.cpu_count() or 1
+    if len(passwords) <= 1 or workers == 1:
+        return [hash_password(password, rounds) for password in passwords]
+    with ThreadPoolExecutor(max_workers=min(workers, len(passwords))) as pool:
+        return list(pool.map(lambda password: hash_password(password, rounds), passwords))
@@ -0,0 +1,87 @@
+from datetime import datetime
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from db import db
+from models import Product, ProductPriceHistory, User
+from archive import sales_entity
+from money import from_minor, minor, minor_sum
+from shards import each_shard, sum_groups
+
+PRICE_FIELDS = ('cost_price', 'selling_price')
+MARGIN_GROUPS = ('product', 'day', 'employee')
+
+
+@event.listens_for(Session, 'before_flush')
+def _record_price_changes(session, flush_context, instances):
+    # One history row per new product and per write that changes a price,
+    # whichever route or script made it.
+    now = datetime.utcnow()
+    for product in [obj for obj in session.new if isinstance(obj, Product)] + [
+            obj for obj in session.dirty if isinstance(obj, Product) and any(
+                db.inspect(obj).attrs[field].history.has_changes() for field in PRICE_FIELDS)]:
+        session.add(ProductPriceHistory(
+            product=product,
+            cost_price=product.cost_price,
+            selling_price=product.selling_price,
+            effective_from=now
+        ))
+
+
+def margin_report(date_from=None, date_to=None, group_by='product'):
+    """Revenue, cost and profit from the unit cost stored on each sale line.
+
+    Lines sold before costs were recorded have no unit_cost; they count in
+    revenue and in `lines_without_cost` but not in cost or profit.
+    """
+    if group_by not in MARGIN_GROUPS:
+        raise ValueError(f"group_by must be one of {', '.join(MARGIN_GROUPS)}")
+
+    SaleRow = sales_entity(date_from, date_to)
+    key = {
+        'product': SaleRow.product_id,
+        'day': db.func.date(SaleRow.time),
+        'employee': SaleRow.employee_id,
+    }[group_by]
+    costed = SaleRow.unit_cost.isnot(None)
+    query = db.session.query(
+        key.label('key'),
+        db.func.count(SaleRow.id),
+        db.func.sum(SaleRow.quantity),
+        minor_sum(SaleRow.total),
+        db.func.sum(db.case((costed, minor(SaleRow.total)), else_=0)),
+        db.func.sum(minor(SaleRow.unit_cost) * SaleRow.quantity),
+        db.func.sum(db.case((costed, 0), else_=1))
+    )
+    if date_from:
+        query = query.filter(SaleRow.time >= date_from)
+    if date_to:
+        query = query.filter(SaleRow.time <= date_to)
+    # Grouped in every shard, then added up per key
+    rows = sum_groups(each_shard(query.group_by(key).order_by(key).all))
+
+    # Names come from a lookup of the handful of keys, not a join on every
+    # line; deleted products and employees keep theirs
+    names = {}
+    if group_by in ('product', 'employee'):
+        model = Product if group_by == 'product' else User
+        names = dict(db.session.query(model.id, model.name).filter(model.id.in_([row[0] for row in rows]))
+                     .execution_options(include_deleted=True))
+
+    report = []
+    for key_value, lines, quantity, revenue, costed_revenue, cost, uncosted in rows:
+        # Sums are integer minor units; only the results are converted
+        profit = (costed_revenue or 0) - (cost or 0)
+        report.append({
+            group_by: key_value,
+            **({'name': names.get(key_value)} if group_by != 'day' else {}),
+            'lines': lines,
+            'quantity': quantity or 0,
+            'revenue': from_minor(revenue or 0),
+            'cost': from_minor(cost or 0),
+            'profit': from_minor(profit),
+            'margin': round(profit / costed_revenue, 4) if costed_revenue else None,
+            'lines_without_cost': uncosted or 0
+        })
+    return report
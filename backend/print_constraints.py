@@ -1,6 +1,9 @@
-from app import app, db
+from app import create_app
+from db import db
 from sqlalchemy import inspect
 
+app = create_app(with_blueprints=False)
+
 with app.app_context():
     inspector = inspect(db.engine)
     print(inspector.get_unique_constraints('sale'))
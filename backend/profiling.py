@@ -0,0 +1,242 @@
+import cProfile
+import json
+import os
+import pstats
+import random
+import re
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+from datetime import datetime
+
+from flask import current_app, g, request
+from flask_jwt_extended import get_jwt, verify_jwt_in_request
+
+# Owners profile a request with `X-Profile: cpu,stacks,memory` (or `all`), or
+# with ?_profile=... where headers are awkward. With PROFILING_ENABLED off no
+# hook is installed at all, so normal traffic pays nothing.
+#
+#   cpu     cProfile: exact call counts and times, stored as a pstats file
+#   stacks  the request thread's stack sampled every PROFILING_STACK_INTERVAL_MS,
+#           stored as collapsed stacks for flamegraph.pl / speedscope
+#   memory  tracemalloc: peak and retained bytes, top allocation sites
+MODES = ('cpu', 'stacks', 'memory')
+PROFILE_ID = re.compile(r'[0-9]{8}-[0-9]{6}-[0-9a-f]{8}')
+
+# tracemalloc is process-wide: one memory capture at a time
+_memory_lock = threading.Lock()
+# cProfile cannot run two profilers at once in one process (gthread and ASGI
+# workers serve requests concurrently): one cpu capture at a time as well
+_cpu_lock = threading.Lock()
+
+
+def parse_modes(value):
+    value = (value or '').strip().lower()
+    if value in ('1', 'all', 'true'):
+        return set(MODES)
+    return {mode for mode in (part.strip() for part in value.split(',')) if mode in MODES}
+
+
+def _is_owner():
+    try:
+        verify_jwt_in_request(optional=True)
+        return get_jwt().get('role') == 'owner'
+    except Exception:
+        return False
+
+
+class StackSampler(threading.Thread):
+    """Counts the stacks of one thread, sampled every `interval` seconds."""
+
+    def __init__(self, thread_id, interval):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._done = threading.Event()
+
+    def run(self):
+        while not self._done.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        self._done.set()
+        self.join()
+
+
+def _start():
+    requested = request.headers.get('X-Profile') or request.args.get('_profile')
+    config = current_app.config
+    if requested:
+        modes = parse_modes(requested)
+        if not modes or not _is_owner():
+            return
+    elif config['PROFILING_SAMPLE_RATE'] and random.random() < config['PROFILING_SAMPLE_RATE']:
+        modes = set(config['PROFILING_SAMPLE_MODES'])
+    else:
+        return
+
+    state = {'modes': modes, 'requested': bool(requested), 'started': time.perf_counter()}
+    if 'memory' in modes:
+        if not tracemalloc.is_tracing() and _memory_lock.acquire(blocking=False):
+            tracemalloc.start(config['PROFILING_TRACEMALLOC_FRAMES'])
+        else:
+            modes.discard('memory')
+    if 'cpu' in modes and not _cpu_lock.acquire(blocking=False):
+        modes.discard('cpu')
+    if not modes:
+        return
+    if 'stacks' in modes:
+        state['sampler'] = StackSampler(threading.get_ident(), config['PROFILING_STACK_INTERVAL_MS'] / 1000)
+        state['sampler'].start()
+    if 'cpu' in modes:
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+            state['profile'] = profile
+        except ValueError:
+            # Python 3.12+: some other profiler (a debugger, say) is active
+            modes.discard('cpu')
+            _cpu_lock.release()
+    g._profiling = state
+
+
+def _stop(state):
+    if 'profile' in state:
+        state['profile'].disable()
+        _cpu_lock.release()
+    if 'sampler' in state:
+        state['sampler'].stop()
+    if 'memory' in state['modes']:
+        tracemalloc.stop()
+        _memory_lock.release()
+
+
+def _discard(exc):
+    # after_request did not run (the response itself failed): release everything
+    state = g.pop('_profiling', None)
+    if state is not None:
+        _stop(state)
+
+
+def _finish(response):
+    state = g.pop('_profiling', None)
+    if state is None:
+        return response
+    if 'profile' in state:
+        state['profile'].disable()
+    duration = time.perf_counter() - state['started']
+    memory = None
+    if 'memory' in state['modes']:
+        current, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot()
+    _stop(state)
+    if 'memory' in state['modes']:
+        memory = {
+            'peak_bytes': peak,
+            'retained_bytes': current,
+            'top': [{
+                'location': f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                'size_bytes': stat.size,
+                'count': stat.count
+            } for stat in snapshot.statistics('lineno')[:current_app.config['PROFILING_TOP']]]
+        }
+
+    profile_id = f"{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    directory = current_app.config['PROFILING_DIR']
+    os.makedirs(directory, exist_ok=True)
+    if 'profile' in state:
+        state['profile'].dump_stats(os.path.join(directory, f'{profile_id}.prof'))
+    if 'sampler' in state:
+        with open(os.path.join(directory, f'{profile_id}.collapsed'), 'w') as handle:
+            handle.writelines(f'{stack} {count}\n' for stack, count in state['sampler'].stacks.most_common())
+    meta = {
+        'id': profile_id,
+        'method': request.method,
+        'path': request.full_path.rstrip('?'),
+        'endpoint': request.endpoint,
+        'status': response.status_code,
+        'seconds': round(duration, 4),
+        'modes': sorted(state['modes']),
+        'sampled': not state['requested'],
+        'identity': get_jwt().get('sub') if state['requested'] else None,
+        'created_at': datetime.utcnow().isoformat(),
+        'memory': memory
+    }
+    with open(os.path.join(directory, f'{profile_id}.json'), 'w') as handle:
+        json.dump(meta, handle)
+    _prune(directory, current_app.config['PROFILING_KEEP'])
+
+    if state['requested']:
+        response.headers['X-Profile-Id'] = profile_id
+    return response
+
+
+def _prune(directory, keep):
+    ids = sorted(name[:-5] for name in os.listdir(directory) if name.endswith('.json'))
+    for profile_id in ids[:-keep] if len(ids) > keep else []:
+        for suffix in ('.json', '.prof', '.collapsed'):
+            path = os.path.join(directory, profile_id + suffix)
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def list_profiles():
+    directory = current_app.config['PROFILING_DIR']
+    if not os.path.isdir(directory):
+        return []
+    profiles = []
+    for name in sorted(os.listdir(directory), reverse=True):
+        if name.endswith('.json'):
+            with open(os.path.join(directory, name)) as handle:
+                meta = json.load(handle)
+            meta.pop('memory', None)
+            profiles.append(meta)
+    return profiles
+
+
+def profile_path(profile_id, suffix):
+    """Path of one stored artifact ('.json', '.prof', '.collapsed'), or None."""
+    if not PROFILE_ID.fullmatch(profile_id):
+        return None
+    path = os.path.join(current_app.config['PROFILING_DIR'], profile_id + suffix)
+    return path if os.path.exists(path) else None
+
+
+def load_profile(profile_id):
+    """Stored metadata plus the top functions by cumulative time, or None."""
+    path = profile_path(profile_id, '.json')
+    if path is None:
+        return None
+    with open(path) as handle:
+        meta = json.load(handle)
+    stats_path = profile_path(profile_id, '.prof')
+    if stats_path is not None:
+        stats = pstats.Stats(stats_path).stats
+        top = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)[:current_app.config['PROFILING_TOP']]
+        meta['functions'] = [{
+            'function': f"{function} ({os.path.basename(filename)}:{line})",
+            'calls': calls,
+            'own_seconds': round(own, 6),
+            'cumulative_seconds': round(cumulative, 6)
+        } for (filename, line, function), (_, calls, own, cumulative, _) in top]
+    return meta
+
+
+def init_profiling(app):
+    app.config.setdefault('PROFILING_ENABLED', False)
+    if not app.config['PROFILING_ENABLED']:
+        return
+    app.before_request(_start)
+    app.after_request(_finish)
+    app.teardown_request(_discard)
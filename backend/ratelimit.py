@@ -0,0 +1,244 @@
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, jsonify, request
+from flask_jwt_extended import get_jwt, verify_jwt_in_request
+
+_PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+
+
+def parse_rate(rate):
+    """'10/minute' -> tokens per second."""
+    count, _, period = rate.partition('/')
+    return int(count) / _PERIODS[period.strip().rstrip('s')]
+
+
+# Buckets idle for longer than the slowest rule takes to refill are full
+# again, the same as no bucket at all. Backends drop them every
+# _SWEEP_SECONDS, since keys include client-supplied values (IPs, usernames).
+_SWEEP_SECONDS = 60
+
+
+class MemoryBackend:
+    """Buckets in a dict; per process, so each gunicorn worker counts separately.
+
+    Kept in least-recently-used order and capped at `max_size` buckets.
+    """
+
+    def __init__(self, idle_seconds=3600, max_size=100000):
+        self.idle_seconds = idle_seconds
+        self.max_size = max_size
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+        self._next_sweep = time.monotonic() + _SWEEP_SECONDS
+
+    def take(self, key, rate, burst):
+        now = time.monotonic()
+        with self._lock:
+            if now >= self._next_sweep:
+                self._sweep(now)
+            tokens, updated = self._buckets.pop(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_size:
+                self._buckets.popitem(last=False)
+        return allowed, tokens
+
+    def _sweep(self, now):
+        # Oldest first, so stop at the first bucket still in use
+        cutoff = now - self.idle_seconds
+        while self._buckets and next(iter(self._buckets.values()))[1] < cutoff:
+            self._buckets.popitem(last=False)
+        self._next_sweep = now + _SWEEP_SECONDS
+
+
+class SqliteBackend:
+    """Buckets in a small SQLite file shared by every worker on the host.
+
+    One UPSERT per check refills, decrements and reports the bucket atomically.
+    The file holds throwaway state, so it runs with synchronous=OFF.
+    """
+
+    _TAKE = (
+        "INSERT INTO bucket (key, tokens, updated, allowed) VALUES (:key, :burst - 1, :now, 1) "
+        "ON CONFLICT(key) DO UPDATE SET "
+        "  allowed = MIN(:burst, tokens + (:now - updated) * :rate) >= 1, "
+        "  tokens = MIN(:burst, tokens + (:now - updated) * :rate) "
+        "           - (MIN(:burst, tokens + (:now - updated) * :rate) >= 1), "
+        "  updated = :now "
+        "RETURNING allowed, tokens"
+    )
+
+    def __init__(self, path, idle_seconds=3600):
+        self.path = path
+        self.idle_seconds = idle_seconds
+        self._local = threading.local()
+        self._next_sweep = time.time() + _SWEEP_SECONDS
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=OFF')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS bucket '
+                '(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL, allowed INTEGER NOT NULL)'
+            )
+            self._local.connection = connection
+        return connection
+
+    def take(self, key, rate, burst):
+        now = time.time()
+        connection = self._connection()
+        if now >= self._next_sweep:
+            # Every worker sweeps on its own schedule; a sweep that overlaps
+            # another only finds less to delete
+            self._next_sweep = now + _SWEEP_SECONDS
+            connection.execute('DELETE FROM bucket WHERE updated < ?', (now - self.idle_seconds,))
+        allowed, tokens = connection.execute(
+            self._TAKE, {'key': key, 'rate': rate, 'burst': burst, 'now': now}
+        ).fetchone()
+        return bool(allowed), tokens
+
+
+_CLAIMS_CACHE_SIZE = 4096
+_claims_cache = OrderedDict()
+_claims_lock = threading.Lock()
+
+
+def _verified_claims():
+    """Claims of the request's bearer token, or {} when there is none or it is invalid.
+
+    Verifying a JWT costs far more than taking a token from a bucket, so
+    verified claims are remembered per raw token until the token expires.
+    """
+    header = request.headers.get('Authorization', '')
+    if not header.startswith('Bearer '):
+        return {}
+    token = header[7:]
+    with _claims_lock:
+        claims = _claims_cache.get(token)
+        if claims is not None:
+            _claims_cache.move_to_end(token)
+    if claims is not None and claims.get('exp', math.inf) > time.time():
+        return claims
+
+    try:
+        verify_jwt_in_request(optional=True)
+        claims = get_jwt()
+    except Exception:
+        # Invalid tokens are rejected by the view itself; limit them by IP here
+        return {}
+    with _claims_lock:
+        _claims_cache[token] = claims
+        if len(_claims_cache) > _CLAIMS_CACHE_SIZE:
+            _claims_cache.popitem(last=False)
+    return claims
+
+
+def _jwt_claim(name):
+    return _verified_claims().get(name)
+
+
+# No account has a longer username; longer values only grow the key
+_USERNAME_KEY_LENGTH = 50
+
+
+def _username():
+    data = request.get_json(silent=True)
+    username = data.get('username') if isinstance(data, dict) else None
+    return username[:_USERNAME_KEY_LENGTH] if isinstance(username, str) else None
+
+
+KEY_FUNCTIONS = {
+    'ip': lambda: request.remote_addr,
+    'identity': lambda: _jwt_claim('sub'),
+    'shop': lambda: _jwt_claim('shop_id'),
+    'username': _username,
+}
+
+
+class Rule:
+    def __init__(self, scope, rate, burst=None, key='ip'):
+        self.scope = scope
+        self.rate = parse_rate(rate)
+        self.burst = burst or max(1, math.ceil(self.rate))
+        self.keys = (key,) if isinstance(key, str) else tuple(key)
+
+    def bucket_key(self):
+        parts = []
+        for name in self.keys:
+            value = KEY_FUNCTIONS[name]()
+            if value is None:
+                # Unauthenticated callers of identity/shop rules fall back to their IP
+                if name in ('identity', 'shop'):
+                    value = f'ip={request.remote_addr}'
+                else:
+                    return None
+            parts.append(f'{name}={value}')
+        return f"{self.scope}|{'|'.join(parts)}"
+
+
+class RateLimiter:
+    """Token buckets per route, keyed by JWT identity, shop and/or client IP.
+
+    RATELIMITS maps an endpoint ('owner.get_sales') or a blueprint ('employee')
+    to one rule or a list of rules: {'rate': '10/second', 'burst': 20,
+    'key': 'identity' | 'shop' | 'ip' | 'username' | a tuple of these}.
+    Routes without a rule skip the limiter entirely.
+    """
+
+    def init_app(self, app):
+        app.config.setdefault('RATELIMIT_ENABLED', True)
+        app.config.setdefault('RATELIMIT_BACKEND', 'memory')
+        app.config.setdefault('RATELIMITS', {})
+        app.config.setdefault('RATELIMIT_MAX_BUCKETS', 100000)
+        if not app.config['RATELIMIT_ENABLED']:
+            return
+
+        rules = {}
+        for scope, scope_rules in app.config['RATELIMITS'].items():
+            scope_rules = [scope_rules] if isinstance(scope_rules, dict) else scope_rules
+            rules[scope] = [Rule(scope, **rule) for rule in scope_rules]
+
+        # Time for the slowest rule's empty bucket to fill up again
+        idle_seconds = max((rule.burst / rule.rate for scope_rules in rules.values() for rule in scope_rules),
+                           default=0)
+        if app.config['RATELIMIT_BACKEND'] == 'sqlite':
+            backend = SqliteBackend(app.config['RATELIMIT_SQLITE_PATH'], idle_seconds)
+        else:
+            backend = MemoryBackend(idle_seconds, app.config['RATELIMIT_MAX_BUCKETS'])
+
+        app.extensions['ratelimit'] = (backend, rules)
+        app.before_request(self.check)
+
+    def check(self):
+        backend, rules = current_app.extensions['ratelimit']
+        route_rules = rules.get(request.endpoint) or rules.get(request.blueprint)
+        if not route_rules:
+            return None
+        for rule in route_rules:
+            key = rule.bucket_key()
+            if key is None:
+                continue
+            allowed, tokens = backend.take(key, rule.rate, rule.burst)
+            if not allowed:
+                retry_after = max(1, math.ceil((1 - tokens) / rule.rate))
+                current_app.logger.warning("Rate limit hit for %s", key)
+                response = jsonify({"msg": "Too many requests, slow down"})
+                response.status_code = 429
+                response.headers['Retry-After'] = str(retry_after)
+                return response
+        return None
+
+
+limiter = RateLimiter()
@@ -0,0 +1,225 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import create_engine
+
+from db import db, sqlite_file
+from jobs import job
+from models import Inventory, Sale, Shop, StockIn, StockTransfer, StockTransferLine, Ticket, User
+from archive import archive_table, archived_months
+from shards import current_shard, each_shard, shard_connection, shards_enabled, use_shard
+
+# Expected stock of a shop/product is everything received through StockIn,
+# plus transfers in, minus transfers out and everything sold, archived months
+# included. Transfers are counted under 'received'. Sales count against the
+# ticket's shop, or the seller's shop for lines written before tickets.
+#
+# Work is split into `count` parts: part i takes every count-th shop for the
+# StockIn and Inventory sums, and the i-th id range of every sales table, so
+# no two processes scan the same sale rows. Parts are summed afterwards.
+#
+# In sharded mode each shop's shard is aggregated on its own connection,
+# one shard after the other; the primary's transfers and sellers are read
+# through the shard's ATTACH.
+
+
+def _id_slice(bounds, index, count):
+    low, high = bounds
+    size = high - low + 1
+    return low + size * index // count, low + size * (index + 1) // count - 1
+
+
+def _aggregate(connection, shop_ids, sale_bounds, index=0, count=1):
+    """{(shop_id, product_id): [received, sold, actual]} for one part of the work."""
+    totals = {}
+
+    def add(rows, position):
+        for shop_id, product_id, quantity in rows:
+            entry = totals.setdefault((shop_id, product_id), [0, 0, None])
+            entry[position] = (entry[position] or 0) + quantity
+
+    own_shops = shop_ids[index::count]
+    if own_shops:
+        stock_in = StockIn.__table__
+        add(connection.execute(
+            db.select(stock_in.c.shop_id, stock_in.c.product_id, db.func.sum(stock_in.c.quantity))
+            .where(stock_in.c.shop_id.in_(own_shops))
+            .group_by(stock_in.c.shop_id, stock_in.c.product_id)
+        ), 0)
+
+        transfer, line = StockTransfer.__table__, StockTransferLine.__table__
+        for shop_column, sign in ((transfer.c.to_shop_id, 1), (transfer.c.from_shop_id, -1)):
+            add(connection.execute(
+                db.select(shop_column, line.c.product_id, sign * db.func.sum(line.c.quantity))
+                .select_from(line.join(transfer, transfer.c.id == line.c.transfer_pk))
+                .where(shop_column.in_(own_shops))
+                .group_by(shop_column, line.c.product_id)
+            ), 0)
+
+        inventory = Inventory.__table__
+        add(connection.execute(
+            db.select(inventory.c.shop_id, inventory.c.product_id, db.func.sum(inventory.c.current_stock))
+            .where(inventory.c.shop_id.in_(own_shops))
+            .group_by(inventory.c.shop_id, inventory.c.product_id)
+        ), 2)
+
+    parts = []
+    for month, bounds in sale_bounds:
+        table = Sale.__table__ if month is None else archive_table(month)
+        low, high = _id_slice(bounds, index, count)
+        if low <= high:
+            parts.append(db.select(table.c.ticket_pk, table.c.employee_id, table.c.product_id, table.c.quantity)
+                         .where(table.c.id.between(low, high)))
+    if parts:
+        sales = (db.union_all(*parts) if len(parts) > 1 else parts[0]).subquery('sales')
+        ticket, user = Ticket.__table__, User.__table__
+        shop = db.func.coalesce(ticket.c.shop_id, user.c.shop_id)
+        add(connection.execute(
+            db.select(shop, sales.c.product_id, db.func.sum(sales.c.quantity))
+            .select_from(sales.outerjoin(ticket, ticket.c.id == sales.c.ticket_pk)
+                         .join(user, user.c.id == sales.c.employee_id))
+            .where(shop.in_(shop_ids))
+            .group_by(shop, sales.c.product_id)
+        ), 1)
+    return totals
+
+
+def _aggregate_part(database_uri, shop_ids, sale_bounds, index, count):
+    # Runs in a pool process: a private engine, never the parent's connections
+    engine = create_engine(database_uri)
+    try:
+        with engine.connect() as connection:
+            return _aggregate(connection, shop_ids, sale_bounds, index, count)
+    finally:
+        engine.dispose()
+
+
+def _sale_bounds(months):
+    """[(month or None for the hot table, (min id, max id))] of every non-empty sales table."""
+    bounds = []
+    for month in [None] + months:
+        table = Sale.__table__ if month is None else archive_table(month)
+        low, high = db.session.execute(db.select(db.func.min(table.c.id), db.func.max(table.c.id))).one()
+        if low is not None:
+            bounds.append((month, (low, high)))
+    return bounds
+
+
+def _merge(totals, part):
+    for key, values in part.items():
+        entry = totals.setdefault(key, [0, 0, None])
+        for position, value in enumerate(values):
+            if value is not None:
+                entry[position] = (entry[position] or 0) + value
+
+
+def reconcile_inventory(shop_ids=None, correct=False, workers=None, progress=None):
+    """Compare Inventory.current_stock with stock-ins minus sales for every shop/product.
+
+    The work is split across a process pool when the database is one other
+    processes can open; in-memory SQLite and shards are aggregated in-process. With
+    `correct`, mismatching Inventory rows are set to the expected stock
+    (pairs whose expected stock is negative are reported but left alone).
+    """
+    started = time.perf_counter()
+    shop_ids = list(shop_ids or [shop_id for (shop_id,) in db.session.query(Shop.id).order_by(Shop.id)])
+    months = archived_months()
+    # Taken per shard in sharded mode
+    sale_bounds = None if shards_enabled() else _sale_bounds(months)
+    workers = workers or current_app.config['RECONCILE_WORKERS'] or os.cpu_count() or 1
+    shareable = db.engine.url.get_backend_name() != 'sqlite' or sqlite_file(db.engine) is not None
+    if not shareable or not shop_ids or shards_enabled():
+        workers = 1
+
+    totals = {}
+    if shards_enabled():
+        def aggregate_shard():
+            shop_id = current_shard()
+            return _aggregate(shard_connection(shop_id), [shop_id], _sale_bounds(months))
+
+        for part in each_shard(aggregate_shard, shop_ids):
+            _merge(totals, part)
+        if progress:
+            progress(1, 1)
+    elif workers > 1:
+        database_uri = db.engine.url.render_as_string(hide_password=False)
+        with ProcessPoolExecutor(max_workers=workers, mp_context=get_context('spawn')) as pool:
+            futures = [pool.submit(_aggregate_part, database_uri, shop_ids, sale_bounds, index, workers)
+                       for index in range(workers)]
+            for done, future in enumerate(as_completed(futures), start=1):
+                _merge(totals, future.result())
+                if progress:
+                    progress(done, workers)
+    elif shop_ids:
+        _merge(totals, _aggregate(db.session.connection(), shop_ids, sale_bounds))
+        if progress:
+            progress(1, 1)
+
+    discrepancies = []
+    for (shop_id, product_id), (received, sold, actual) in sorted(totals.items()):
+        expected = (received or 0) - (sold or 0)
+        if (actual or 0) != expected:
+            discrepancies.append({
+                'shop_id': shop_id,
+                'product_id': product_id,
+                'received': received or 0,
+                'sold': sold or 0,
+                'expected': expected,
+                'actual': actual,
+                'difference': (actual or 0) - expected
+            })
+
+    corrected = 0
+    if correct and discrepancies:
+        for entry in discrepancies:
+            if entry['expected'] < 0:
+                continue
+            with use_shard(entry['shop_id']):
+                item = Inventory.query.filter_by(shop_id=entry['shop_id'], product_id=entry['product_id']).first()
+                if item is None:
+                    db.session.add(Inventory(shop_id=entry['shop_id'], product_id=entry['product_id'],
+                                             current_stock=entry['expected']))
+                else:
+                    item.current_stock = entry['expected']
+                corrected += 1
+        db.session.commit()
+
+    return {
+        'shops': len(shop_ids),
+        'pairs': len(totals),
+        'workers': workers,
+        'discrepancies': discrepancies,
+        'corrected': corrected,
+        'seconds': round(time.perf_counter() - started, 3)
+    }
+
+
+@job('inventory_reconcile')
+def reconcile_job(payload, ctx):
+    return reconcile_inventory(payload.get('shop_ids'), correct=payload.get('correct', False),
+                               progress=ctx.set_progress)
+
+
+@click.group('inventory')
+def inventory_cli():
+    """Check stock levels against stock-in and sales history."""
+
+
+@inventory_cli.command('reconcile')
+@click.option('--shop', 'shop_ids', type=int, multiple=True, help='Shop id to check (repeatable; default: all).')
+@click.option('--correct', is_flag=True, help='Set mismatching Inventory rows to the expected stock.')
+@click.option('--workers', type=int, help='Processes to aggregate with (default: RECONCILE_WORKERS or CPU count).')
+@with_appcontext
+def reconcile_command(shop_ids, correct, workers):
+    report = reconcile_inventory(list(shop_ids), correct=correct, workers=workers)
+    for entry in report['discrepancies']:
+        click.echo(f"shop {entry['shop_id']} product {entry['product_id']}: "
+                   f"expected {entry['expected']}, actual {entry['actual']}")
+    click.echo(f"{len(report['discrepancies'])} discrepancies in {report['pairs']} shop/product pairs "
+               f"({report['shops']} shops, {report['workers']} workers, {report['seconds']}s); "
+               f"corrected {report['corrected']}")
@@ -0,0 +1,183 @@
+import math
+import os
+import sqlite3
+import time
+
+import click
+from flask import current_app, g, has_request_context, request
+from flask.cli import with_appcontext
+from flask_jwt_extended import get_jwt
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from db import db, RoutingSession, sqlite_file
+from jobs import job
+from models import WriteMark
+
+REPLICA_BIND = 'replica'
+_LAG_CACHE_SECONDS = 1.0
+_lag_cache = {}
+
+
+def replica_enabled(app=None):
+    app = app or current_app
+    return REPLICA_BIND in (app.config.get('SQLALCHEMY_BINDS') or {})
+
+
+def refresh_replica():
+    """Copy the primary SQLite file into the replica with the online backup API.
+
+    The copy runs inside one write transaction on the replica, so readers see
+    either the previous snapshot or the new one. Postgres standbys replicate on
+    their own and need no refresh.
+    """
+    source = sqlite_file(db.engine)
+    target = sqlite_file(db.engines[REPLICA_BIND])
+    if source is None or target is None:
+        raise RuntimeError("refresh_replica only handles file-backed SQLite primaries and replicas")
+
+    started = time.perf_counter()
+    src = sqlite3.connect(source)
+    dst = sqlite3.connect(target)
+    try:
+        src.backup(dst)
+    finally:
+        dst.close()
+        src.close()
+    _lag_cache.clear()
+    return {'seconds': round(time.perf_counter() - started, 3), 'bytes': os.path.getsize(target)}
+
+
+def _file_lag(snapshot, last_write, now):
+    # The replica is as old as its snapshot once the primary has been written
+    # after it: lag is how long ago the snapshot was taken, not the gap between
+    # the two mtimes. mtimes move in filesystem clock ticks, so a write in the
+    # snapshot's own tick counts as after it.
+    if last_write < snapshot:
+        return 0.0
+    return max(now - snapshot, math.nextafter(0.0, math.inf))
+
+
+def replica_lag():
+    """(snapshot_time, lag_seconds) of the replica, cached briefly per process."""
+    cached = _lag_cache.get('lag')
+    now = time.time()
+    if cached and now - cached[0] < _LAG_CACHE_SECONDS:
+        return cached[1]
+
+    replica_engine = db.engines[REPLICA_BIND]
+    replica_file = sqlite_file(replica_engine)
+    if replica_file is not None:
+        primary_file = sqlite_file(db.engine)
+        if not os.path.exists(replica_file) or primary_file is None:
+            result = (None, None)
+        else:
+            # Any write to the primary touches the database file or its WAL
+            snapshot = os.path.getmtime(replica_file)
+            last_write = max(os.path.getmtime(path) for path in (primary_file, primary_file + '-wal')
+                             if os.path.exists(path))
+            result = (snapshot, _file_lag(snapshot, last_write, now))
+    else:
+        with replica_engine.connect() as connection:
+            lag = connection.exec_driver_sql(
+                'SELECT COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)'
+            ).scalar()
+        result = (now - float(lag), float(lag))
+
+    _lag_cache['lag'] = (now, result)
+    return result
+
+
+def _current_identity():
+    try:
+        return get_jwt().get('sub')
+    except RuntimeError:
+        return None
+
+
+def _wrote_since(identity, snapshot):
+    with db.engine.connect() as connection:
+        written_at = connection.execute(
+            db.select(WriteMark.written_at).where(WriteMark.identity == identity)
+        ).scalar()
+    return written_at is not None and written_at >= snapshot
+
+
+def _choose_read_engine():
+    app = current_app
+    if not replica_enabled(app):
+        return None
+    if request.method not in ('GET', 'HEAD') or request.blueprint not in app.config['READ_REPLICA_BLUEPRINTS']:
+        return None
+
+    snapshot, lag = replica_lag()
+    if snapshot is None or lag > app.config['REPLICA_MAX_LAG']:
+        return None
+    # Read-your-writes: anyone who wrote after the snapshot stays on the primary
+    if lag > 0:
+        identity = _current_identity()
+        if identity is None or _wrote_since(identity, snapshot):
+            return None
+    return db.engines[REPLICA_BIND]
+
+
+def route_read():
+    if not has_request_context():
+        return None
+    # Decided on the first query of the request (after the JWT is verified)
+    # and reused for the rest of it.
+    if '_db_read_engine' not in g:
+        g._db_read_engine = _choose_read_engine()
+    return g._db_read_engine
+
+
+@event.listens_for(Session, 'after_flush')
+def _mark_write(session, flush_context):
+    if not has_request_context() or not replica_enabled():
+        return
+    identity = _current_identity()
+    if identity is None:
+        return
+    marks = WriteMark.__table__
+    connection = session.connection()
+    now = time.time()
+    updated = connection.execute(
+        marks.update().where(marks.c.identity == identity).values(written_at=now)
+    ).rowcount
+    if not updated:
+        connection.execute(marks.insert().values(identity=identity, written_at=now))
+
+
+def init_replica(app):
+    if replica_enabled(app):
+        RoutingSession.read_router = staticmethod(route_read)
+
+
+@job('replica_refresh')
+def refresh_job(payload, ctx):
+    return refresh_replica()
+
+
+@click.group('replica')
+def replica_cli():
+    """Manage the read replica."""
+
+
+@replica_cli.command('refresh')
+@with_appcontext
+def refresh_command():
+    result = refresh_replica()
+    click.echo(f"Replica refreshed in {result['seconds']}s ({result['bytes']} bytes)")
+
+
+@replica_cli.command('status')
+@with_appcontext
+def status_command():
+    if not replica_enabled():
+        click.echo("No replica configured (set REPLICA_DATABASE_URL).")
+        return
+    snapshot, lag = replica_lag()
+    if snapshot is None:
+        click.echo("Replica has not been refreshed yet.")
+    else:
+        click.echo(f"Snapshot taken {time.time() - snapshot:.1f}s ago, behind the primary by {lag:.1f}s")
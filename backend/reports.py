@@ -0,0 +1,56 @@
+from datetime import datetime
+
+from db import db
+from jobs import job
+from models import Shop, User
+from archive import sales_entity
+from money import from_minor, minor_sum
+from shards import each_shard, shards_enabled, sum_groups
+
+
+@job('sales_report')
+def sales_report(payload, ctx):
+    date_from = payload.get('date_from')
+    date_to = payload.get('date_to')
+
+    # Shops deleted since still had sales in the period
+    shops = Shop.query.execution_options(include_deleted=True).order_by(Shop.id).all()
+    report = []
+    for index, shop in enumerate(shops):
+        SaleRow = sales_entity(date_from, date_to)
+        query = db.session.query(
+            db.func.date(SaleRow.time).label('day'),
+            db.func.count(SaleRow.id),
+            db.func.sum(SaleRow.quantity),
+            minor_sum(SaleRow.total)
+        )
+        if date_from:
+            query = query.filter(SaleRow.time >= date_from)
+        if date_to:
+            query = query.filter(SaleRow.time <= date_to)
+        query = query.group_by('day').order_by('day')
+
+        if shards_enabled():
+            # A shop's shard holds the sales made there, whoever sold them
+            days = sum_groups(each_shard(query.all, [shop.id]))
+        else:
+            days = query.join(User, SaleRow.employee_id == User.id).filter(User.shop_id == shop.id).all()
+        report.append({
+            'shop_id': shop.shop_id,
+            'name': shop.name,
+            'days': [{
+                'day': day,
+                'lines': lines,
+                'quantity': quantity or 0,
+                'total': from_minor(total or 0)
+            } for day, lines, quantity, total in days],
+            'total': from_minor(sum(total or 0 for _, _, _, total in days))
+        })
+        ctx.set_progress(index + 1, len(shops))
+
+    return {
+        'generated_at': datetime.utcnow().isoformat(),
+        'date_from': date_from,
+        'date_to': date_to,
+        'shops': report
+    }
@@ -0,0 +1,112 @@
+import gzip
+
+from flask import jsonify, request
+
+try:
+    import brotli
+except ImportError:  # optional: gzip is always available
+    brotli = None
+
+
+def _parse_fields(raw):
+    # "id,shop.name,product" -> {'id': None, 'shop': {'name': None}, 'product': None}
+    tree = {}
+    for path in filter(None, (part.strip() for part in raw.split(','))):
+        node = tree
+        *parents, leaf = path.split('.')
+        for name in parents:
+            child = node.get(name, {})
+            if child is None:  # whole object already selected
+                break
+            node = node.setdefault(name, child)
+        else:
+            node[leaf] = None
+    return tree
+
+
+def _project(value, tree):
+    if tree is None or not isinstance(value, dict):
+        return value
+    return {key: _project(value[key], sub) for key, sub in tree.items() if key in value}
+
+
+def list_response(rows, refs=()):
+    """jsonify a list of row dicts, honouring ?fields= and ?shape=normalized.
+
+    fields: comma-separated keys to keep; dotted paths select inside nested
+    objects (e.g. fields=id,current_stock,product.name).
+
+    shape=normalized: each nested object named in `refs` that carries an 'id'
+    is replaced by that id and sent once in a side table, e.g.
+    {"rows": [{"shop": 3, ...}], "shops": {"3": {...}}}.
+    """
+    normalized = request.args.get('shape') == 'normalized' and refs
+
+    fields = request.args.get('fields')
+    if fields:
+        tree = _parse_fields(fields)
+        if normalized:
+            # Keep nested ids so normalized rows can still reference them
+            for ref in refs:
+                if isinstance(tree.get(ref), dict):
+                    tree[ref]['id'] = None
+        rows = [_project(row, tree) for row in rows]
+
+    if not normalized:
+        return jsonify(rows)
+
+    side_tables = {f'{ref}s': {} for ref in refs}
+    flat_rows = []
+    for row in rows:
+        row = dict(row)
+        for ref in refs:
+            nested = row.get(ref)
+            if isinstance(nested, dict) and 'id' in nested:
+                side_tables[f'{ref}s'].setdefault(str(nested['id']), nested)
+                row[ref] = nested['id']
+        flat_rows.append(row)
+    return jsonify({'rows': flat_rows, **side_tables})
+
+
+def _accepted_encodings():
+    accepted = {}
+    for part in request.headers.get('Accept-Encoding', '').split(','):
+        name, _, params = part.strip().partition(';')
+        quality = 1.0
+        if params.strip().startswith('q='):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            accepted[name.lower()] = quality
+    return accepted
+
+
+def init_compression(app):
+    app.config.setdefault('COMPRESS_MIN_SIZE', 1024)
+    app.config.setdefault('COMPRESS_LEVEL', 6)
+    app.config.setdefault('COMPRESS_MIMETYPES', ('application/json', 'text/plain', 'text/csv'))
+
+    @app.after_request
+    def compress_response(response):
+        if (response.direct_passthrough or response.is_streamed
+                or 'Content-Encoding' in response.headers
+                or response.status_code < 200 or response.status_code in (204, 206, 304)
+                or response.mimetype not in app.config['COMPRESS_MIMETYPES']):
+            return response
+
+        data = response.get_data()
+        if len(data) < app.config['COMPRESS_MIN_SIZE']:
+            return response
+
+        accepted = _accepted_encodings()
+        response.vary.add('Accept-Encoding')
+        if brotli is not None and accepted.get('br', 0) > 0:
+            # brotli quality runs 0-11; map the shared 1-9 level onto it
+            response.set_data(brotli.compress(data, quality=min(11, app.config['COMPRESS_LEVEL'] + 1)))
+            response.headers['Content-Encoding'] = 'br'
+        elif accepted.get('gzip', 0) > 0:
+            response.set_data(gzip.compress(data, compresslevel=app.config['COMPRESS_LEVEL'], mtime=0))
+            response.headers['Content-Encoding'] = 'gzip'
+        return response
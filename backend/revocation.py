@@ -0,0 +1,243 @@
+import hashlib
+import math
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from db import db
+from models import RevokedToken
+
+# Every authenticated request asks "is this token revoked?". The answer is
+# almost always no, so each worker keeps a Bloom filter of the revoked keys:
+# a miss there is a definite no and costs a few hashes. Only a hit (a real
+# revocation or a rare false positive) is settled through an LRU of exact
+# entries, and on an LRU miss, one indexed query.
+#
+# Workers pick up each other's revocations by reading the rows added since
+# the last one they saw, at most every REVOCATION_SYNC_SECONDS. Ids can
+# commit out of order (Postgres sequences hand them out at insert), so rows
+# revoked within REVOCATION_SYNC_OVERLAP_SECONDS before the previous sync are
+# read again too; recording a revocation twice changes nothing. A revocation
+# committed in this worker applies at once.
+_NOT_REVOKED = object()
+
+
+class BloomFilter:
+    def __init__(self, capacity, error_rate):
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+        return ((first + i * second) % self.size for i in range(self.hashes))
+
+    def add(self, key):
+        for position in self._positions(key):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key):
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class _RevocationState:
+    def __init__(self, config):
+        self.config = config
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.bloom = BloomFilter(self.config['REVOCATION_BLOOM_CAPACITY'],
+                                     self.config['REVOCATION_BLOOM_ERROR_RATE'])
+            self.entries = OrderedDict()
+            self.last_id = None
+            self.synced_at = 0
+            self.synced_wall = None
+            self.loaded_at = 0
+            self.stats = {'checks': 0, 'bloom_hits': 0, 'lookups': 0}
+
+    def remember(self, key, value):
+        # Caller holds the lock
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.config['REVOCATION_LRU_SIZE']:
+            self.entries.popitem(last=False)
+
+    def record(self, key, token_version):
+        # Caller holds the lock. Several revocations of one identity keep the highest version.
+        self.bloom.add(key)
+        if key not in self.entries:
+            return
+        current = self.entries[key]
+        if current is None or token_version is None:
+            token_version = None if current is not _NOT_REVOKED else token_version
+        elif current is not _NOT_REVOKED:
+            token_version = max(current, token_version)
+        self.remember(key, token_version)
+
+
+def _state():
+    if not has_app_context():
+        return None
+    return current_app.extensions.get('revocations')
+
+
+def _query(statement):
+    # Always the primary: a replica could still be missing the revocation
+    return db.session.execute(statement, bind_arguments={'bind': db.engine})
+
+
+def _sync(state):
+    now = time.monotonic()
+    config = state.config
+    if state.last_id is not None and now - state.synced_at < config['REVOCATION_SYNC_SECONDS']:
+        return
+    reload = state.last_id is None or now - state.loaded_at >= config['REVOCATION_RELOAD_SECONDS']
+    wall = datetime.utcnow()
+    table = RevokedToken.__table__
+    statement = db.select(table.c.id, table.c.key, table.c.token_version).order_by(table.c.id)
+    if reload:
+        # A fresh filter drops the keys of revocations that have expired
+        statement = statement.where(db.or_(table.c.expires_at.is_(None), table.c.expires_at > wall))
+    else:
+        overlap = timedelta(seconds=config['REVOCATION_SYNC_OVERLAP_SECONDS'])
+        statement = statement.where(db.or_(table.c.id > state.last_id,
+                                           table.c.revoked_at >= state.synced_wall - overlap))
+    rows = _query(statement).all()
+
+    with state.lock:
+        if reload:
+            state.bloom = BloomFilter(config['REVOCATION_BLOOM_CAPACITY'], config['REVOCATION_BLOOM_ERROR_RATE'])
+            state.entries.clear()
+            state.loaded_at = now
+            state.last_id = state.last_id or 0
+        for row in rows:
+            state.record(row.key, row.token_version)
+            state.last_id = max(state.last_id, row.id)
+        state.synced_at, state.synced_wall = now, wall
+
+
+def _revoked_version(state, key):
+    """None if every token of `key` is revoked, a token_version bound, or _NOT_REVOKED."""
+    with state.lock:
+        if key not in state.bloom:
+            return _NOT_REVOKED
+        state.stats['bloom_hits'] += 1
+        if key in state.entries:
+            state.entries.move_to_end(key)
+            return state.entries[key]
+        state.stats['lookups'] += 1
+
+    table = RevokedToken.__table__
+    rows = _query(db.select(table.c.token_version).where(
+        table.c.key == key, db.or_(table.c.expires_at.is_(None), table.c.expires_at > datetime.utcnow())
+    )).scalars().all()
+    if not rows:
+        value = _NOT_REVOKED
+    elif None in rows:
+        value = None
+    else:
+        value = max(rows)
+    with state.lock:
+        state.remember(key, value)
+    return value
+
+
+def is_revoked(payload):
+    state = _state()
+    if state is None:
+        return False
+    _sync(state)
+    with state.lock:
+        state.stats['checks'] += 1
+
+    if 'jti' in payload and _revoked_version(state, f"jti:{payload['jti']}") is not _NOT_REVOKED:
+        return True
+    version = _revoked_version(state, f"sub:{payload.get('sub')}")
+    if version is _NOT_REVOKED:
+        return False
+    return version is None or payload.get('tv', 0) < version
+
+
+def _expires_at():
+    lifetime = current_app.config.get('JWT_ACCESS_TOKEN_EXPIRES')
+    if not lifetime:
+        return None
+    if not isinstance(lifetime, timedelta):
+        lifetime = timedelta(seconds=lifetime)
+    return datetime.utcnow() + lifetime
+
+
+def _add(key, token_version):
+    db.session.add(RevokedToken(key=key, token_version=token_version, revoked_at=datetime.utcnow(),
+                                expires_at=_expires_at()))
+    db.session.info.setdefault('revoked_keys', []).append((key, token_version))
+
+
+def revoke_token(jti):
+    """Revoke one token by its jti. Applies once the session commits."""
+    _add(f'jti:{jti}', None)
+
+
+def revoke_user(user, *usernames):
+    """Revoke every token issued to `user` so far; new logins get the next version.
+
+    Pass the previous username too when it is being changed, since older
+    tokens carry it. Applies once the session commits.
+    """
+    user.token_version = (user.token_version or 0) + 1
+    for username in dict.fromkeys((user.username,) + usernames):
+        _add(f'sub:{username}', user.token_version)
+
+
+def delete_expired_revocations():
+    """Delete the revocations whose tokens have all expired. Commits."""
+    table = RevokedToken.__table__
+    deleted = db.session.execute(table.delete().where(table.c.expires_at <= datetime.utcnow())).rowcount
+    db.session.commit()
+    return deleted
+
+
+def revocation_stats():
+    state = _state()
+    if state is None:
+        return {}
+    with state.lock:
+        return {**state.stats, 'lru_entries': len(state.entries), 'bloom_bits': state.bloom.size,
+                'bloom_hashes': state.bloom.hashes}
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_revocations(session):
+    revoked = session.info.pop('revoked_keys', None)
+    state = _state()
+    if revoked and state is not None:
+        with state.lock:
+            for key, token_version in revoked:
+                state.record(key, token_version)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_revocations(session):
+    session.info.pop('revoked_keys', None)
+
+
+def init_revocation(app, jwt):
+    app.config.setdefault('REVOCATION_SYNC_SECONDS', 1.0)
+    app.config.setdefault('REVOCATION_RELOAD_SECONDS', 3600)
+    app.config.setdefault('REVOCATION_SYNC_OVERLAP_SECONDS', 60)
+    app.config.setdefault('REVOCATION_LRU_SIZE', 4096)
+    app.config.setdefault('REVOCATION_BLOOM_CAPACITY', 100000)
+    app.config.setdefault('REVOCATION_BLOOM_ERROR_RATE', 0.001)
+    app.extensions['revocations'] = _RevocationState(app.config)
+
+    @jwt.token_in_blocklist_loader
+    def _check_revoked(jwt_header, jwt_payload):
+        return is_revoked(jwt_payload)
@@ -0,0 +1,355 @@
+import os
+import re
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import click
+from flask import current_app, g, has_app_context, has_request_context
+from flask.cli import with_appcontext
+from flask_jwt_extended import get_jwt
+from sqlalchemy import create_engine, event
+from sqlalchemy.schema import CreateIndex, CreateTable
+from sqlalchemy.sql.util import find_tables
+
+from db import db, RoutingSession, sqlite_file
+from models import Inventory, Sale, Shop, StockIn, Ticket, User
+
+# Optional sharded mode (SHARDS_DIR). Tickets, sales, inventory and stock-ins
+# of shop n live in SHARDS_DIR/shop_n.db, so one shop's tills only ever take
+# the write lock of their own file. Everything else stays in the primary,
+# which every shard connection ATTACHes: names a shard lacks (product, user,
+# stock_transfer, ...) resolve to the primary, so joins work unchanged.
+#
+# RoutingSession sends every statement that touches a shop-scoped table to
+# the current shard: the one given by use_shard(), else the signed-in user's
+# shop. Statements with no shard to go to raise ShardRequired rather than
+# read the primary's empty copies. A flush writes each row on its own shop's
+# shard, whatever is current. Cross-shop reads go through each_shard() and
+# merge the parts in Python.
+#
+# A write touching several files (a sale's inventory version, a transfer) is
+# atomic within each file but not across them: the primary commits first, so
+# a failure in between leaves a gap in sync versions or stock that
+# `flask inventory reconcile` reports.
+
+SHARDED_MODELS = (Ticket, Sale, Inventory, StockIn)
+SHARDED_TABLES = frozenset(model.__table__.name for model in SHARDED_MODELS)
+# Ids of shop n's rows start at n << SHARD_ID_BITS, so a new row's id names
+# its shard; they stay below 2**53 (exact in JSON) for the first 8191 shops.
+SHARD_ID_BITS = 40
+SHARD_FILE = re.compile(r'shop_(\d+)\.db')
+CENTRAL_SCHEMA = 'central'
+
+shard_metadata = db.MetaData()
+
+
+def _shard_table(table):
+    # Same columns and indexes; no foreign keys, their targets live in the primary
+    return db.Table(
+        table.name, shard_metadata,
+        *[db.Column(column.name, column.type, primary_key=column.primary_key, nullable=column.nullable,
+                    unique=column.unique) for column in table.columns],
+        *[db.Index(index.name, *[column.name for column in index.columns], unique=index.unique)
+          for index in table.indexes],
+        sqlite_autoincrement=True
+    )
+
+
+for _model in SHARDED_MODELS:
+    _shard_table(_model.__table__)
+
+
+class ShardRequired(RuntimeError):
+    def __init__(self):
+        super().__init__("Shop-scoped tables are sharded: run this inside shards.use_shard() or shards.each_shard()")
+
+
+class ShardSet:
+    def __init__(self, directory, central, pragmas):
+        self.directory = directory
+        self.central = central
+        self.pragmas = pragmas
+        self.engines = {}
+        self.lock = threading.Lock()
+
+    def path(self, shop_id):
+        return os.path.join(self.directory, f'shop_{shop_id}.db')
+
+    def shop_ids(self, requested=None):
+        """Shops that have a shard file, limited to `requested` when given."""
+        found = sorted(int(match.group(1)) for match in map(SHARD_FILE.fullmatch, os.listdir(self.directory))
+                       if match)
+        if requested is None:
+            return found
+        wanted = set()
+        for shop_id in requested:
+            try:
+                wanted.add(int(shop_id))
+            except (TypeError, ValueError):
+                pass
+        return [shop_id for shop_id in found if shop_id in wanted]
+
+    def engine(self, shop_id):
+        shop_id = int(shop_id)
+        engine = self.engines.get(shop_id)
+        if engine is None:
+            with self.lock:
+                engine = self.engines.get(shop_id)
+                if engine is None:
+                    engine = self.engines[shop_id] = self._open(shop_id)
+        return engine
+
+    def _open(self, shop_id):
+        path = self.path(shop_id)
+        if not os.path.exists(path):
+            shop = Shop.__table__
+            with db.engine.connect() as connection:
+                if connection.execute(db.select(shop.c.id).where(shop.c.id == shop_id)).scalar() is None:
+                    raise LookupError(f'Shop with id {shop_id} not found')
+
+        engine = create_engine(f'sqlite:///{path}')
+
+        @event.listens_for(engine, 'connect')
+        def _connect(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            # Before the ATTACH: journal_mode would otherwise apply to the primary too
+            for name, value in self.pragmas.items():
+                cursor.execute(f'PRAGMA {name} = {value}')
+            cursor.execute(f'ATTACH DATABASE ? AS {CENTRAL_SCHEMA}', (self.central,))
+            cursor.close()
+
+        with engine.begin() as connection:
+            # IF NOT EXISTS (not checkfirst, which would find the primary's
+            # tables through the ATTACH) also lets two processes race here
+            for table in shard_metadata.sorted_tables:
+                connection.execute(CreateTable(table, if_not_exists=True))
+                for index in table.indexes:
+                    connection.execute(CreateIndex(index, if_not_exists=True))
+                connection.exec_driver_sql(
+                    'INSERT INTO main.sqlite_sequence (name, seq) SELECT ?, ? '
+                    'WHERE NOT EXISTS (SELECT 1 FROM main.sqlite_sequence WHERE name = ?)',
+                    (table.name, shop_id << SHARD_ID_BITS, table.name)
+                )
+        return engine
+
+    def dispose(self):
+        with self.lock:
+            for engine in self.engines.values():
+                engine.dispose()
+            self.engines.clear()
+
+
+def _shards():
+    return current_app.extensions.get('shards') if has_app_context() else None
+
+
+def shards_enabled():
+    return _shards() is not None
+
+
+def require_unsharded(what):
+    if shards_enabled():
+        raise RuntimeError(f"{what} is not available in sharded mode")
+
+
+_shard = ContextVar('shard', default=None)
+
+
+@contextmanager
+def use_shard(shop_id):
+    """Run shop-scoped statements inside the block against `shop_id`'s shard."""
+    token = _shard.set(shop_id)
+    try:
+        yield
+    finally:
+        _shard.reset(token)
+
+
+def _user_shop():
+    try:
+        identity = get_jwt().get('sub')
+    except RuntimeError:
+        return None
+    # Called from get_bind, possibly mid-flush: read outside the session
+    user = User.__table__
+    with db.engine.connect() as connection:
+        return connection.execute(db.select(user.c.shop_id).where(user.c.username == identity)).scalar()
+
+
+def current_shard():
+    shop_id = _shard.get()
+    if shop_id is None and has_request_context():
+        if '_shard_shop_id' not in g:
+            g._shard_shop_id = _user_shop()
+        shop_id = g._shard_shop_id
+    return shop_id
+
+
+def _touches_shards(mapper, clause):
+    if mapper is not None and any(table.name in SHARDED_TABLES for table in mapper.tables):
+        return True
+    return clause is not None and any(getattr(table, 'name', None) in SHARDED_TABLES
+                                      for table in find_tables(clause, include_crud=True))
+
+
+def route_shard(mapper, clause):
+    shards = _shards()
+    if shards is None or not _touches_shards(mapper, clause):
+        return None
+    shop_id = current_shard()
+    if shop_id is None:
+        raise ShardRequired()
+    return shards.engine(shop_id)
+
+
+def _shop_of(instance):
+    # Tickets, inventory and stock-ins carry their shop; a sale line goes with its ticket
+    shop_id = getattr(instance, 'shop_id', None)
+    if shop_id is None and instance.__dict__.get('ticket') is not None:
+        shop_id = instance.__dict__['ticket'].shop_id
+    if shop_id is None:
+        shop_id = current_shard()
+    if shop_id is None:
+        raise ShardRequired()
+    return shop_id
+
+
+def flush_connection(session, mapper, instance):
+    """Connection a flush writes `instance` on (Session.connection_callable)."""
+    shards = _shards()
+    if shards is not None and any(table.name in SHARDED_TABLES for table in mapper.tables):
+        return session.connection(bind_arguments={'bind': shards.engine(_shop_of(instance))})
+    return session.connection(bind_arguments={'mapper': mapper})
+
+
+def each_shard(fn, shop_ids=None):
+    """[fn()] once per shard (of `shop_ids` only, when given), each run inside use_shard().
+
+    Without sharding it is just [fn()] on the one database, so callers merge
+    the parts the same way in both modes.
+    """
+    shards = _shards()
+    if shards is None:
+        return [fn()]
+    results = []
+    for shop_id in shards.shop_ids(shop_ids):
+        with use_shard(shop_id):
+            results.append(fn())
+    return results
+
+
+def find(model, id):
+    """(shop_id, row) of the shop-scoped row with primary key `id`, else (None, None).
+
+    Rows copied over by `flask shards split` kept their old ids, which name
+    no shard; those are looked for in every shard.
+    """
+    shards = _shards()
+    if shards is None:
+        return None, db.session.get(model, id)
+    shop_id = id >> SHARD_ID_BITS
+    for candidate in shards.shop_ids([shop_id] if shop_id else None):
+        with use_shard(candidate):
+            row = db.session.get(model, id)
+        if row is not None:
+            return candidate, row
+    return None, None
+
+
+def shard_connection(shop_id):
+    """The session's connection to `shop_id`'s shard, or to the primary without sharding."""
+    shards = _shards()
+    if shards is None:
+        return db.session.connection()
+    return db.session.connection(bind_arguments={'bind': shards.engine(shop_id)})
+
+
+def sum_groups(parts):
+    """Merge (key, *sums) rows grouped alike in several shards: one row per key, in key order."""
+    merged = {}
+    for rows in parts:
+        for key, *values in rows:
+            entry = merged.setdefault(key, [0] * len(values))
+            for position, value in enumerate(values):
+                entry[position] += value or 0
+    return [(key, *values) for key, values in sorted(merged.items(), key=lambda item: (item[0] is not None, item[0]))]
+
+
+# Shop of each shop-scoped row of the primary, as `flask shards split` places
+# it: a ticket without a shop goes with its seller, a line with its ticket.
+_SPLIT_SHOP = {
+    'inventory': 'src.shop_id',
+    'stock_in': 'src.shop_id',
+    'ticket': f'COALESCE(src.shop_id, (SELECT u.shop_id FROM {CENTRAL_SCHEMA}."user" u WHERE u.id = src.employee_id))',
+    'sale': f'COALESCE((SELECT t.shop_id FROM {CENTRAL_SCHEMA}.ticket t WHERE t.id = src.ticket_pk), '
+            f'(SELECT u.shop_id FROM {CENTRAL_SCHEMA}."user" u WHERE u.id = src.employee_id))'
+}
+
+
+def split_central():
+    """Copy the primary's shop-scoped rows into every shop's shard; {table: rows copied}.
+
+    Rows keep their ids and re-running copies only what is missing. The
+    primary's copies are left alone; sharded mode no longer reads them.
+    """
+    shards = _shards()
+    if shards is None:
+        raise RuntimeError("Set SHARDS_DIR to split the primary into shards")
+    with db.engine.connect() as connection:
+        shop_ids = connection.execute(db.select(Shop.__table__.c.id).order_by(Shop.__table__.c.id)).scalars().all()
+
+    copied = dict.fromkeys(_SPLIT_SHOP, 0)
+    for shop_id in shop_ids:
+        with shards.engine(shop_id).begin() as connection:
+            for table in shard_metadata.sorted_tables:
+                columns = ', '.join(f'"{column.name}"' for column in table.columns)
+                copied[table.name] += connection.exec_driver_sql(
+                    f'INSERT OR IGNORE INTO main.{table.name} ({columns}) SELECT {columns} '
+                    f'FROM {CENTRAL_SCHEMA}.{table.name} src WHERE {_SPLIT_SHOP[table.name]} = ?', (shop_id,)
+                ).rowcount
+    return copied
+
+
+def init_shards(app):
+    directory = app.config.get('SHARDS_DIR')
+    if not directory:
+        return
+    with app.app_context():
+        central = sqlite_file(db.engine)
+    if central is None:
+        raise RuntimeError("Sharded mode needs a file-backed SQLite primary")
+    os.makedirs(directory, exist_ok=True)
+    app.extensions['shards'] = ShardSet(directory, central, app.config.get('SQLITE_PRAGMAS') or {})
+    RoutingSession.shard_router = staticmethod(route_shard)
+    RoutingSession.connection_callable = flush_connection
+
+
+@click.group('shards')
+def shards_cli():
+    """Per-shop database files of the sharded mode (SHARDS_DIR)."""
+
+
+@shards_cli.command('list')
+@with_appcontext
+def list_command():
+    shards = _shards()
+    if shards is None:
+        click.echo("Sharded mode is off (set SHARDS_DIR).")
+        return
+    for shop_id in shards.shop_ids():
+        with shards.engine(shop_id).connect() as connection:
+            counts = [f"{table.name} {connection.execute(db.select(db.func.count()).select_from(table)).scalar()}"
+                      for table in shard_metadata.sorted_tables]
+        click.echo(f"shop {shop_id}: {', '.join(counts)}  ({os.path.getsize(shards.path(shop_id))} bytes)")
+
+
+@shards_cli.command('split')
+@with_appcontext
+def split_command():
+    """Copy existing tickets, sales, inventory and stock-ins into the shards (stop the tills first)."""
+    try:
+        copied = split_central()
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+    click.echo(', '.join(f"{count} {table} rows" for table, count in copied.items()) + " copied")
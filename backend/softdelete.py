@@ -0,0 +1,118 @@
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import Session, with_loader_criteria
+
+from cache import cache
+from db import db
+from jobs import enqueue, job
+from models import Inventory, Product, Shop, Tombstone, User
+from revocation import revoke_user
+from shards import each_shard
+from sync import next_version
+
+# Deleting a shop, product or employee only stamps deleted_at; the row stays
+# so sales, tickets and stock-ins keep their names. The soft_delete_purge job
+# then clears what still refers to it in small transactions.
+SOFT_DELETE_MODELS = {Shop: 'shop', Product: 'product', User: 'employee'}
+_MODELS_BY_ENTITY = {entity: model for model, entity in SOFT_DELETE_MODELS.items()}
+
+_not_deleted = {
+    model: with_loader_criteria(model, lambda cls: cls.deleted_at.is_(None), include_aliases=True)
+    for model in SOFT_DELETE_MODELS
+}
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _hide_deleted(execute_state):
+    # Only queries *for* shops, products or employees are filtered. Rows that
+    # merely point at one (a sale's product, a ticket's shop) still load it,
+    # and so do joins from such rows. Pass execution_options(include_deleted=True)
+    # to see deleted rows anyway.
+    if (not execute_state.is_select or execute_state.is_column_load or execute_state.is_relationship_load
+            or execute_state.execution_options.get('include_deleted', False)):
+        return
+    mapper = execute_state.bind_mapper
+    if mapper is not None and mapper.class_ in _not_deleted:
+        execute_state.statement = execute_state.statement.options(_not_deleted[mapper.class_])
+
+
+def soft_delete(obj, created_by_id=None):
+    """Hide `obj` from every query and queue the purge of its dependents. Commits."""
+    obj.deleted_at = datetime.utcnow()
+    if isinstance(obj, User):
+        revoke_user(obj)
+    return enqueue('soft_delete_purge', {'entity': SOFT_DELETE_MODELS[type(obj)], 'id': obj.id},
+                   created_by_id=created_by_id)
+
+
+def _delete_inventory(condition, chunk_size, progress):
+    # Clients syncing stock get a tombstone per removed row, like an ORM delete
+    inventory = Inventory.__table__
+    total = db.session.execute(db.select(db.func.count()).select_from(inventory).where(condition)).scalar()
+    deleted = 0
+    while True:
+        rows = db.session.execute(
+            db.select(inventory.c.id, inventory.c.shop_id).where(condition).order_by(inventory.c.id).limit(chunk_size)
+        ).all()
+        if not rows:
+            break
+        version = next_version(db.session.connection())
+        now = datetime.utcnow()
+        db.session.execute(Tombstone.__table__.insert(), [
+            {'entity': 'inventory', 'entity_id': row.id, 'shop_id': row.shop_id, 'version': version, 'deleted_at': now}
+            for row in rows
+        ])
+        db.session.execute(inventory.delete().where(inventory.c.id.in_([row.id for row in rows])))
+        db.session.commit()
+        deleted += len(rows)
+        if progress:
+            progress(deleted, total)
+    if deleted:
+        # Core statements bypass the flush that usually invalidates cached reads
+        cache.invalidate('inventory')
+    return deleted
+
+
+def _anonymize_employee(user_id):
+    # Sales keep pointing at the row; only the personal data goes
+    user = User.__table__
+    return db.session.execute(user.update().where(user.c.id == user_id).values(
+        name='Deleted employee',
+        contact=None,
+        username=f'deleted-{user_id}',
+        employee_id=f'DELETED-{user_id}',
+        password=''
+    )).rowcount
+
+
+def purge(entity, entity_id, chunk_size=None, progress=None):
+    """Remove or anonymize what still refers to a soft-deleted row."""
+    model = _MODELS_BY_ENTITY.get(entity)
+    if model is None:
+        raise ValueError(f"Unknown entity {entity!r}")
+    obj = db.session.get(model, entity_id, execution_options={'include_deleted': True})
+    if obj is None or obj.deleted_at is None:
+        raise LookupError(f"{entity} {entity_id} is not deleted")
+    chunk_size = chunk_size or current_app.config['PURGE_CHUNK_SIZE']
+
+    result = {'entity': entity, 'id': entity_id}
+    # A shop's rows are all in its own shard; a product's may be in any
+    if entity == 'shop':
+        result['inventory_deleted'] = sum(each_shard(
+            lambda: _delete_inventory(Inventory.__table__.c.shop_id == entity_id, chunk_size, progress), [entity_id]
+        ))
+    elif entity == 'product':
+        result['inventory_deleted'] = sum(each_shard(
+            lambda: _delete_inventory(Inventory.__table__.c.product_id == entity_id, chunk_size, progress)
+        ))
+    else:
+        result['anonymized'] = bool(_anonymize_employee(entity_id))
+        db.session.commit()
+    return result
+
+
+@job('soft_delete_purge')
+def purge_job(payload, ctx):
+    return purge(payload['entity'], payload['id'], progress=ctx.set_progress)
@@ -0,0 +1,79 @@
+from datetime import datetime
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from db import db
+from models import Inventory, Product, SyncCounter, Tombstone
+
+# Every write to these models takes the next value of one global counter, so a
+# client that remembers the highest version it has seen can ask for the rest.
+VERSIONED_MODELS = {Product: 'product', Inventory: 'inventory'}
+COUNTER_NAME = 'catalog'
+
+
+def next_version(connection):
+    """Increment and return the sync counter inside the caller's transaction.
+
+    The UPDATE locks the counter row until commit, so versions become visible
+    in increasing order. Bulk Core UPDATEs on versioned tables must set
+    version=next_version(...) themselves.
+    """
+    counter = SyncCounter.__table__
+    bumped = connection.execute(
+        counter.update().where(counter.c.name == COUNTER_NAME).values(value=counter.c.value + 1)
+    ).rowcount
+    if not bumped:
+        connection.execute(counter.insert().values(name=COUNTER_NAME, value=1))
+    return connection.execute(db.select(counter.c.value).where(counter.c.name == COUNTER_NAME)).scalar()
+
+
+def current_version():
+    return db.session.query(SyncCounter.value).filter_by(name=COUNTER_NAME).scalar() or 0
+
+
+@event.listens_for(Session, 'before_flush')
+def _stamp_versions(session, flush_context, instances):
+    changed = [obj for obj in session.new if type(obj) in VERSIONED_MODELS]
+    changed += [obj for obj in session.dirty
+                if type(obj) in VERSIONED_MODELS and session.is_modified(obj, include_collections=False)]
+    deleted = [obj for obj in session.deleted if type(obj) in VERSIONED_MODELS]
+    # Soft-deleted rows are gone as far as clients are concerned
+    deleted += [obj for obj in changed if getattr(obj, 'deleted_at', None) is not None
+                and db.inspect(obj).attrs.deleted_at.history.has_changes()]
+    if not changed and not deleted:
+        return
+
+    version = next_version(session.connection())
+    now = datetime.utcnow()
+    for obj in changed:
+        obj.version = version
+        obj.updated_at = now
+    for obj in deleted:
+        session.add(Tombstone(
+            entity=VERSIONED_MODELS[type(obj)],
+            entity_id=obj.id,
+            shop_id=getattr(obj, 'shop_id', None),
+            version=version,
+            deleted_at=now
+        ))
+
+
+def changes_since(model, since, serialize, shop_id=None):
+    """Rows of `model` written after version `since`, plus ids of deleted rows."""
+    version = current_version()
+    rows = model.query.filter(model.version > since, model.version <= version)
+    tombstones = Tombstone.query.filter(
+        Tombstone.entity == VERSIONED_MODELS[model],
+        Tombstone.version > since,
+        Tombstone.version <= version
+    )
+    if shop_id is not None:
+        rows = rows.filter(model.shop_id == shop_id)
+        tombstones = tombstones.filter(Tombstone.shop_id == shop_id)
+
+    return {
+        'version': version,
+        'changed': [serialize(row) for row in rows.order_by(model.version)],
+        'deleted': [tombstone.entity_id for tombstone in tombstones.order_by(Tombstone.version)]
+    }
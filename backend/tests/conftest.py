@@ -0,0 +1,144 @@
+import email_validator
+import pytest
+from flask_jwt_extended import create_access_token
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+
+from app import create_app
+from cache import cache
+from config import TestConfig
+from db import db
+from models import User, Shop, Product, Inventory
+
+
+# Route validation would otherwise resolve MX records over the network
+email_validator.CHECK_DELIVERABILITY = False
+
+
+class ConnectionSession(Session):
+    # Flask-SQLAlchemy resolves binds per table; pin everything to the test
+    # connection so its outer transaction can be rolled back.
+    def get_bind(self, *args, **kwargs):
+        return self.bind
+
+
+@pytest.fixture(scope='session')
+def app():
+    app = create_app(TestConfig)
+    with app.app_context():
+        # pysqlite's own transaction handling ignores SAVEPOINTs; let
+        # SQLAlchemy emit BEGIN itself so nested rollbacks work.
+        @event.listens_for(db.engine, 'connect')
+        def _disable_pysqlite_transactions(dbapi_connection, connection_record):
+            dbapi_connection.isolation_level = None
+
+        @event.listens_for(db.engine, 'begin')
+        def _emit_begin(connection):
+            connection.exec_driver_sql('BEGIN')
+
+        db.create_all()
+    yield app
+
+
+@pytest.fixture(autouse=True)
+def session(app):
+    # Every test runs inside one outer transaction that is rolled back at the
+    # end. Route commits only release savepoints, so the schema built once per
+    # session stays empty between tests.
+    with app.app_context():
+        connection = db.engine.connect()
+        transaction = connection.begin()
+        original_session = db.session
+        db.session = db._make_scoped_session({
+            'class_': ConnectionSession,
+            'bind': connection,
+            'join_transaction_mode': 'create_savepoint'
+        })
+        try:
+            yield db.session
+        finally:
+            db.session.remove()
+            db.session = original_session
+            transaction.rollback()
+            connection.close()
+            # Cached results may come from rows that were just rolled back
+            cache.clear()
+            # and so may the revocations this worker has loaded
+            app.extensions['revocations'].reset()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def shop(app, session):
+    with app.app_context():
+        new_shop = Shop(shop_id='SH-1', name='Main Street', manager='Mona')
+        session.add(new_shop)
+        session.commit()
+        return session.get(Shop, new_shop.id)
+
+
+@pytest.fixture
+def product(app, session):
+    with app.app_context():
+        new_product = Product(
+            product_id='P-1',
+            name='Oud Royale',
+            category='Oud',
+            cost_price=10.0,
+            selling_price=25.0,
+            reorder_level=5
+        )
+        session.add(new_product)
+        session.commit()
+        return session.get(Product, new_product.id)
+
+
+@pytest.fixture
+def inventory(app, session, shop, product):
+    with app.app_context():
+        item = Inventory(shop_id=shop.id, product_id=product.id, current_stock=20)
+        session.add(item)
+        session.commit()
+        return session.get(Inventory, item.id)
+
+
+def _make_user(app, session, **fields):
+    with app.app_context():
+        user = User(**fields)
+        user.set_password('secret')
+        session.add(user)
+        session.commit()
+        return session.get(User, user.id)
+
+
+@pytest.fixture
+def owner(app, session):
+    return _make_user(app, session, employee_id='OWNER', name='Owner', role='owner', username='owner@example.com')
+
+
+@pytest.fixture
+def employee(app, session, shop):
+    return _make_user(
+        app, session,
+        employee_id='E-1', name='Sara', role='employee', shop_id=shop.id, username='sara@example.com'
+    )
+
+
+def _auth_headers(app, user):
+    with app.app_context():
+        token = create_access_token(identity=user.username, additional_claims={'role': user.role})
+    return {'Authorization': f'Bearer {token}'}
+
+
+@pytest.fixture
+def owner_headers(app, owner):
+    return _auth_headers(app, owner)
+
+
+@pytest.fixture
+def employee_headers(app, employee):
+    return _auth_headers(app, employee)
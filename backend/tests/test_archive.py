@@ -0,0 +1,48 @@
+from datetime import datetime
+
+import pytest
+
+from archive import archive_month, restore_month, archived_months
+from db import db
+from models import ArchivedMonth, Sale
+
+
+@pytest.fixture
+def history(employee, product):
+    for ticket, time, total in (('#T-A', datetime(2025, 1, 10), 25.0),
+                                ('#T-B', datetime(2025, 2, 10), 50.0),
+                                ('#T-C', datetime(2025, 3, 10), 75.0)):
+        db.session.add(Sale(ticket_id=ticket, time=time, product_id=product.id, quantity=1,
+                            total=total, employee_id=employee.id))
+    db.session.commit()
+
+
+def test_archive_moves_rows_and_queries_stay_transparent(client, owner_headers, employee_headers, history):
+    assert archive_month('2025-01') == 1
+    assert archive_month('2025-02') == 1
+    assert Sale.query.count() == 1
+    assert db.session.get(ArchivedMonth, 1).total == 25.0
+
+    # Date filters only pull in the partitions they overlap
+    assert archived_months('2025-02-01', '2025-02-28') == ['2025-02']
+    feb = client.get('/owner/sales?date_from=2025-02-01&date_to=2025-02-28', headers=owner_headers).json
+    assert [sale['ticket_id'] for sale in feb] == ['#T-B']
+
+    everything = client.get('/owner/sales', headers=owner_headers).json
+    assert sorted(sale['ticket_id'] for sale in everything) == ['#T-A', '#T-B', '#T-C']
+
+    assert client.get('/owner/dashboard', headers=owner_headers).json['total_sales'] == 150.0
+    assert client.get('/employee/dashboard', headers=employee_headers).json['total_sales'] == 150.0
+    assert len(client.get('/employee/sales?date_to=2025-01-31', headers=employee_headers).json) == 1
+
+
+def test_restore_month(history):
+    archive_month('2025-01')
+    assert restore_month('2025-01') == 1
+    assert Sale.query.count() == 3
+    assert archived_months() == []
+
+
+def test_open_month_cannot_be_archived():
+    with pytest.raises(ValueError):
+        archive_month(datetime.utcnow().strftime('%Y-%m'))
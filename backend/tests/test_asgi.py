@@ -0,0 +1,106 @@
+import asyncio
+import threading
+
+import pytest
+
+pytest.importorskip('asgiref')
+pytest.importorskip('aiosqlite')
+httpx = pytest.importorskip('httpx')
+
+from flask_jwt_extended import create_access_token  # noqa: E402
+
+from asgi import AsyncApp  # noqa: E402
+from app import create_app  # noqa: E402
+from config import TestConfig  # noqa: E402
+from db import db, RoutingSession  # noqa: E402
+from models import Inventory, Product, Shop, User  # noqa: E402
+
+
+@pytest.fixture
+def asgi_app(tmp_path, monkeypatch):
+    # The async engine opens the database file itself, so use a real one
+    monkeypatch.setattr(db, 'session', db._make_scoped_session({'class_': RoutingSession}))
+
+    class FileConfig(TestConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'app.db'}"
+        SQLALCHEMY_ENGINE_OPTIONS = {}
+
+    flask_app = create_app(FileConfig)
+    with flask_app.app_context():
+        db.create_all()
+        shop = Shop(shop_id='SH-1', name='Main Street')
+        product = Product(product_id='P-1', name='Oud Royale', cost_price=10, selling_price=25, reorder_level=5)
+        db.session.add_all([shop, product])
+        db.session.flush()
+        owner = User(employee_id='OWNER', name='Owner', role='owner', username='owner@example.com')
+        employee = User(employee_id='E-1', name='Sara', role='employee', shop_id=shop.id, username='sara@example.com')
+        for user in (owner, employee):
+            user.set_password('secret')
+        db.session.add_all([owner, employee, Inventory(shop_id=shop.id, product_id=product.id, current_stock=3)])
+        db.session.commit()
+        flask_app.config['TOKENS'] = {
+            user.role: create_access_token(identity=user.username,
+                                           additional_claims={'role': user.role, 'shop_id': user.shop_id})
+            for user in (owner, employee)
+        }
+        yield AsyncApp(flask_app)
+        db.session.remove()
+        db.engine.dispose()
+
+
+def _get_all(app, requests):
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://test') as client:
+            responses = await asyncio.gather(*(client.get(path, headers=headers) for path, headers in requests))
+        await app.engine.dispose()
+        return responses
+    return asyncio.run(run())
+
+
+def test_async_routes_match_the_sync_routes(asgi_app):
+    tokens = asgi_app.flask_app.config['TOKENS']
+    owner = {'Authorization': f"Bearer {tokens['owner']}"}
+    employee = {'Authorization': f"Bearer {tokens['employee']}"}
+    paths = [
+        ('/owner/inventory?view=low&shape=normalized', owner),
+        ('/owner/shops?fields=name', owner),
+        ('/employee/stock', employee),
+        ('/owner/dashboard', owner),  # not async: served through the WSGI wrapper
+    ]
+
+    async_responses = _get_all(asgi_app, paths)
+    sync_client = asgi_app.flask_app.test_client()
+    for (path, headers), response in zip(paths, async_responses):
+        expected = sync_client.get(path, headers=headers)
+        assert response.status_code == expected.status_code == 200
+        assert response.json() == expected.json
+
+
+def test_async_routes_keep_auth_checks(asgi_app):
+    employee = {'Authorization': f"Bearer {asgi_app.flask_app.config['TOKENS']['employee']}"}
+    forbidden, missing = _get_all(asgi_app, [('/owner/shops', employee), ('/employee/stock', {})])
+    assert forbidden.status_code == 403
+    assert missing.status_code == 401
+
+
+def test_blocking_pipeline_steps_run_off_the_event_loop(asgi_app):
+    threads = []
+    asgi_app.flask_app.before_request(lambda: threads.append(threading.get_ident()))
+    employee = {'Authorization': f"Bearer {asgi_app.flask_app.config['TOKENS']['employee']}"}
+    [response] = _get_all(asgi_app, [('/employee/stock', employee)])
+    assert response.status_code == 200
+    assert threads and threading.get_ident() not in threads
+
+
+def test_employee_stock_follows_the_employee_to_a_new_shop(asgi_app):
+    # The token still carries the old shop_id claim
+    employee = {'Authorization': f"Bearer {asgi_app.flask_app.config['TOKENS']['employee']}"}
+    with asgi_app.flask_app.app_context():
+        shop = Shop(shop_id='SH-2', name='Harbour')
+        db.session.add(shop)
+        db.session.flush()
+        User.query.filter_by(username='sara@example.com').one().shop_id = shop.id
+        db.session.commit()
+    [response] = _get_all(asgi_app, [('/employee/stock', employee)])
+    assert response.json() == []
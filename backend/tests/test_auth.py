@@ -0,0 +1,30 @@
+from bcrypt import checkpw
+
+from passwords import hash_passwords
+
+
+def test_login_returns_token(client, owner):
+    response = client.post('/auth/login', json={'username': 'owner@example.com', 'password': 'secret'})
+    assert response.status_code == 200
+    assert response.json['access_token']
+
+
+def test_login_rejects_bad_password(client, owner):
+    response = client.post('/auth/login', json={'username': 'owner@example.com', 'password': 'wrong'})
+    assert response.status_code == 401
+
+
+def test_login_requires_credentials(client):
+    response = client.post('/auth/login', json={'username': 'owner@example.com'})
+    assert response.status_code == 400
+
+
+def test_owner_routes_reject_employees(client, employee_headers):
+    response = client.get('/owner/shops', headers=employee_headers)
+    assert response.status_code == 403
+
+
+def test_hash_passwords_in_parallel_keeps_order(app):
+    passwords = [f'pw-{index}' for index in range(5)]
+    hashes = hash_passwords(passwords, rounds=4, workers=3)
+    assert all(checkpw(password.encode(), hashed.encode()) for password, hashed in zip(passwords, hashes))
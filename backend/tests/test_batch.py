@@ -0,0 +1,60 @@
+from flask import g
+
+
+def test_batch_runs_sub_requests_under_one_call(client, owner_headers, shop, product, inventory):
+    response = client.post('/api/batch', json={'requests': [
+        {'path': '/owner/shops'},
+        {'path': '/owner/inventory', 'params': {'shop_id': shop.id}},
+        {'path': '/owner/dashboard'},
+        {'path': '/owner/products?fields=name'},
+        {'path': '/owner/nowhere'},
+    ]}, headers=owner_headers)
+    assert response.status_code == 200
+
+    shops, stock, dashboard, products, missing = response.json['responses']
+    assert shops['status'] == 200 and shops['body'][0]['shop_id'] == 'SH-1'
+    assert stock['body'][0]['current_stock'] == 20
+    assert dashboard['body'] == {'total_sales': None, 'low_stock_count': 0}
+    assert products['body'] == [{'name': 'Oud Royale'}]
+    assert missing['status'] == 404
+
+
+def test_batch_applies_each_routes_own_auth(client, employee_headers):
+    response = client.post('/api/batch', json={'requests': [
+        {'path': '/owner/shops'},
+        {'path': '/employee/stock'},
+    ]}, headers=employee_headers)
+    assert [item['status'] for item in response.json['responses']] == [403, 200]
+
+
+def test_batch_validation(client, owner_headers):
+    assert client.post('/api/batch', json={'requests': [{'path': '/owner/shops'}]}).status_code == 401
+    for payload in ({'requests': []},
+                    {'requests': [{'path': 'owner/shops'}]},
+                    {'requests': [{'path': '/owner/shops', 'method': 'POST'}]},
+                    {'requests': [{'path': '/api/batch'}]},
+                    {'requests': [{'path': '/owner/shops'}] * 21}):
+        assert client.post('/api/batch', json=payload, headers=owner_headers).status_code == 400
+
+
+def test_sub_requests_do_not_share_g(app, client, monkeypatch, owner_headers, shop, product):
+    seen = {}
+
+    def wrap(endpoint):
+        view = app.view_functions[endpoint]
+
+        def recording(*args, **kwargs):
+            seen[endpoint] = set(vars(g))
+            g.cached_lookup = endpoint
+            return view(*args, **kwargs)
+        monkeypatch.setitem(app.view_functions, endpoint, recording)
+
+    wrap('owner.get_shops')
+    wrap('owner.get_products')
+    response = client.post('/api/batch', json={'requests': [{'path': '/owner/shops'}, {'path': '/owner/products'}]},
+                           headers=owner_headers)
+    assert [item['status'] for item in response.json['responses']] == [200, 200]
+    assert 'cached_lookup' not in seen['owner.get_products']
+    # Nor do they start with the batch request's own state, such as its decoded token
+    assert all('_jwt_extended_jwt' not in keys for keys in seen.values())
+    assert 'cached_lookup' not in g
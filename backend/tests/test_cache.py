@@ -0,0 +1,78 @@
+import time
+
+import pytest
+
+from app import create_app
+from cache import cache
+from config import TestConfig
+
+
+def test_dashboard_is_cached_until_a_sale_commits(client, owner_headers, employee_headers, product, inventory):
+    before = client.get('/owner/dashboard', headers=owner_headers).json
+    assert before == {'total_sales': None, 'low_stock_count': 0}
+    assert client.get('/owner/dashboard', headers=owner_headers).json == before
+
+    stats = client.get('/owner/cache/stats', headers=owner_headers).json
+    assert stats['memory_hits'] >= 1
+
+    payload = {'items': [{'product_id': product.id, 'quantity': 2}]}
+    assert client.post('/employee/sales', json=payload, headers=employee_headers).status_code == 201
+    assert client.get('/owner/dashboard', headers=owner_headers).json['total_sales'] == 50.0
+
+
+def test_product_catalog_invalidated_by_owner_writes(client, owner_headers, product):
+    assert [row['name'] for row in client.get('/api/products', headers=owner_headers).json] == ['Oud Royale']
+
+    response = client.put(f'/owner/products/{product.id}', json={'name': 'Oud Noir'}, headers=owner_headers)
+    assert response.status_code == 200
+    assert [row['name'] for row in client.get('/api/products', headers=owner_headers).json] == ['Oud Noir']
+
+
+def test_cache_stats_are_owner_only(client, employee_headers):
+    assert client.get('/owner/cache/stats', headers=employee_headers).status_code == 403
+
+
+def test_memory_tier_evicts_and_expires(app):
+    class SmallConfig(TestConfig):
+        CACHE_MAX_ENTRIES = 2
+
+    small = create_app(SmallConfig)
+    with small.app_context():
+        calls = []
+
+        def compute(value):
+            calls.append(value)
+            return value
+
+        for key in ('a', 'b', 'c'):
+            cache.get_or_set(key, lambda key=key: compute(key))
+        cache.get_or_set('a', lambda: compute('a'))  # evicted as least recently used
+        assert calls == ['a', 'b', 'c', 'a']
+
+        cache.get_or_set('short', lambda: compute('short'), ttl=0.01)
+        time.sleep(0.02)
+        cache.get_or_set('short', lambda: compute('short'), ttl=0.01)
+        assert calls.count('short') == 2
+
+
+@pytest.fixture
+def shared_apps(tmp_path):
+    class SharedConfig(TestConfig):
+        CACHE_BACKEND = 'sqlite'
+        CACHE_SQLITE_PATH = str(tmp_path / 'cache.db')
+
+    return create_app(SharedConfig), create_app(SharedConfig)
+
+
+def test_shared_tier_spans_workers(shared_apps):
+    first, second = shared_apps
+    with first.app_context():
+        assert cache.get_or_set('kpi', lambda: {'total': 1}, tags=('sale',)) == {'total': 1}
+    with second.app_context():
+        # Served from the shared tier without recomputing
+        assert cache.get_or_set('kpi', lambda: {'total': 2}, tags=('sale',)) == {'total': 1}
+        assert cache.stats()['shared_hits'] == 1
+        cache.invalidate('sale')
+    with first.app_context():
+        # The first worker's memory copy carries a stale tag version
+        assert cache.get_or_set('kpi', lambda: {'total': 3}, tags=('sale',)) == {'total': 3}
@@ -0,0 +1,90 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from datamigrations import DataMigrationBusy, run_data_migration
+from db import db
+from jobs import enqueue, work
+from models import DataMigration, Job, Sale, Ticket
+
+
+def _legacy_lines(employee, product, tickets):
+    # Sale lines written without a header, three per ticket
+    db.session.execute(Sale.__table__.insert(), [
+        {'ticket_id': f'#L-{ticket}', 'time': datetime(2025, 1, 1, 9, ticket), 'product_id': product.id,
+         'quantity': 1, 'total': 2.5, 'employee_id': employee.id}
+        for ticket in range(tickets) for _ in range(3)
+    ])
+    db.session.commit()
+
+
+def test_backfill_resumes_from_its_checkpoint(app, shop, employee, product):
+    _legacy_lines(employee, product, tickets=4)
+
+    first = run_data_migration('ticket_headers', chunk_size=5, pause_ms=0, max_chunks=1)
+    assert (first['status'], first['rows_done'], first['rows_total']) == ('running', 5, 12)
+    # The second ticket is split across chunks and only half linked so far
+    assert Ticket.query.filter_by(ticket_id='#L-1').one().line_count == 2
+
+    done = run_data_migration('ticket_headers', chunk_size=5, pause_ms=0)
+    assert (done['status'], done['rows_done']) == ('done', 12)
+    assert Sale.query.filter(Sale.ticket_pk.is_(None)).count() == 0
+    assert sorted((t.ticket_id, t.shop_id, t.line_count, t.total) for t in Ticket.query) == [
+        (f'#L-{ticket}', shop.id, 3, 7.5) for ticket in range(4)]
+
+    # Finished migrations are not run again
+    assert run_data_migration('ticket_headers')['rows_done'] == 12
+
+
+def test_backfill_keeps_tickets_that_share_a_code_apart(app, owner, employee, product):
+    # Old 6-character codes repeat: same code, different time or employee
+    db.session.execute(Sale.__table__.insert(), [
+        {'ticket_id': '#T-A1B2C3', 'time': time, 'product_id': product.id, 'quantity': 1, 'total': total,
+         'employee_id': seller.id}
+        for time, seller, total in [(datetime(2025, 1, 1, 9), employee, 1.0), (datetime(2025, 1, 1, 9), employee, 2.0),
+                                    (datetime(2025, 2, 1, 9), employee, 4.0), (datetime(2025, 1, 1, 9), owner, 8.0)]
+    ])
+    db.session.commit()
+
+    run_data_migration('ticket_headers', chunk_size=2, pause_ms=0)
+    assert sorted((t.ticket_id, t.employee_id, t.line_count, t.total) for t in Ticket.query) == [
+        ('#T-A1B2C3', employee.id, 2, 3.0), ('#T-A1B2C3/2', employee.id, 1, 4.0), ('#T-A1B2C3/3', owner.id, 1, 8.0)]
+
+
+def test_backfill_runs_as_a_job_and_from_the_cli(app, monkeypatch, employee, product):
+    _legacy_lines(employee, product, tickets=2)
+    monkeypatch.setitem(app.config, 'DATA_MIGRATION_PAUSE_MS', 0)
+
+    queued = enqueue('data_migration', {'name': 'ticket_headers'})
+    work(once=True)
+    assert db.session.get(Job, queued.id).status == 'succeeded'
+    assert db.session.get(DataMigration, 'ticket_headers').status == 'done'
+
+    output = app.test_cli_runner().invoke(args=['data-migrate', 'list']).output
+    assert 'ticket_headers: done  6/6 rows' in output
+
+
+def test_a_migration_runs_under_one_lease_at_a_time(app, employee, product):
+    _legacy_lines(employee, product, tickets=2)
+    run_data_migration('ticket_headers', chunk_size=3, pause_ms=0, max_chunks=1)
+    state = db.session.get(DataMigration, 'ticket_headers')
+    assert state.locked_by is None
+    state.locked_by, state.locked_until = 'till-2:4242:ab12cd34', datetime.utcnow() + timedelta(minutes=1)
+    db.session.commit()
+
+    with pytest.raises(DataMigrationBusy):
+        run_data_migration('ticket_headers', pause_ms=0)
+    output = app.test_cli_runner().invoke(args=['data-migrate', 'run', 'ticket_headers']).output
+    assert "is being run by till-2:4242:ab12cd34" in output
+    queued = enqueue('data_migration', {'name': 'ticket_headers'})
+    work(once=True)
+    assert db.session.get(Job, queued.id).status == 'succeeded'
+    assert Job.query.count() == 1
+    assert db.session.get(DataMigration, 'ticket_headers').rows_done == 3
+
+    # A lease that lapsed (its runner died) is taken over
+    state = db.session.get(DataMigration, 'ticket_headers')
+    state.locked_until = datetime.utcnow() - timedelta(seconds=1)
+    db.session.commit()
+    assert run_data_migration('ticket_headers', pause_ms=0)['status'] == 'done'
+    assert db.session.get(DataMigration, 'ticket_headers').locked_by is None
@@ -0,0 +1,48 @@
+from models import Sale
+
+
+def test_create_sale_and_history(client, employee_headers, product, inventory):
+    payload = {'items': [{'product_id': product.id, 'quantity': 2}], 'time': '2025-02-01T12:00:00'}
+    assert client.post('/employee/sales', json=payload, headers=employee_headers).status_code == 201
+
+    sales = client.get('/employee/sales', headers=employee_headers).json
+    assert len(sales) == 1
+    assert sales[0]['total'] == 50.0
+    assert sales[0]['ticket_id'].startswith('#T-')
+
+
+def test_create_sale_validates_items(client, employee_headers, product):
+    assert client.post('/employee/sales', json={'items': []}, headers=employee_headers).status_code == 400
+
+    bad_quantity = {'items': [{'product_id': product.id, 'quantity': 0}]}
+    assert client.post('/employee/sales', json=bad_quantity, headers=employee_headers).status_code == 400
+
+    missing = {'items': [{'product_id': 999, 'quantity': 1}]}
+    assert client.post('/employee/sales', json=missing, headers=employee_headers).status_code == 404
+    assert Sale.query.count() == 0
+
+
+def test_stock_and_stock_in(client, employee_headers, product, inventory):
+    payload = {'product_id': product.id, 'quantity': 5}
+    assert client.post('/employee/stock-in', json=payload, headers=employee_headers).status_code == 201
+
+    stock = client.get('/employee/stock', headers=employee_headers).json
+    assert stock == [{
+        'id': inventory.id,
+        'product_id': product.id,
+        'product_name': 'Oud Royale',
+        'current_stock': 25,
+        'reorder_level': 5
+    }]
+
+
+def test_dashboard(client, employee_headers, product, inventory):
+    client.post('/employee/sales', json={'items': [{'product_id': product.id, 'quantity': 1}]},
+                headers=employee_headers)
+    dashboard = client.get('/employee/dashboard', headers=employee_headers).json
+    assert dashboard == {'total_sales': 25.0, 'low_stock_count': 0}
+
+
+def test_api_products(client, employee_headers, product):
+    products = client.get('/api/products', headers=employee_headers).json
+    assert [p['product_id'] for p in products] == ['P-1']
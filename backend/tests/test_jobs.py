@@ -0,0 +1,45 @@
+from jobs import JOB_HANDLERS, enqueue, job, run_job, claim_next, work
+from db import db
+from models import Job
+
+
+@job('test_flaky')
+def flaky(payload, ctx):
+    if payload.get('fail'):
+        raise RuntimeError('boom')
+    ctx.set_progress(1, 2)
+    return {'echo': payload.get('value')}
+
+
+def test_sales_report_job_runs_through_worker(client, owner_headers, shop):
+    response = client.post('/owner/reports/sales', json={}, headers=owner_headers)
+    assert response.status_code == 202
+    job_id = response.json['job_id']
+
+    work(once=True)
+
+    job_status = client.get(f'/owner/jobs/{job_id}', headers=owner_headers).json
+    assert job_status['status'] == 'succeeded'
+    assert job_status['result']['shops'][0]['shop_id'] == 'SH-1'
+
+
+def test_failed_job_is_retried_then_marked_failed(app):
+    assert 'test_flaky' in JOB_HANDLERS
+    queued = enqueue('test_flaky', {'fail': True}, max_attempts=2)
+
+    run_job(claim_next('test'))
+    assert db.session.get(Job, queued.id).status == 'queued'
+
+    Job.query.filter_by(id=queued.id).update({'run_after': queued.created_at})
+    run_job(claim_next('test'))
+    failed = db.session.get(Job, queued.id)
+    assert failed.status == 'failed'
+    assert 'boom' in failed.error
+
+
+def test_successful_job_stores_result(app):
+    queued = enqueue('test_flaky', {'value': 7})
+    finished = run_job(claim_next('test'))
+    assert finished.status == 'succeeded'
+    assert finished.progress == 1.0
+    assert finished.result == '{"echo": 7}'
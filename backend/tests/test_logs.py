@@ -0,0 +1,70 @@
+import json
+import logging
+import queue
+
+import pytest
+
+from logs import ContextQueueHandler, start_logging, stop_logging
+
+
+@pytest.fixture
+def log_file(app, monkeypatch, tmp_path):
+    path = tmp_path / 'app.log'
+    monkeypatch.setitem(app.config, 'LOG_FILE', str(path))
+
+    def records():
+        # Stopping drains the queue into the file
+        stop_logging()
+        return [json.loads(line) for line in path.read_text().splitlines()]
+
+    start_logging(app.config)
+    yield records
+    stop_logging()
+    start_logging(app.config | {'LOG_FILE': None})
+
+
+def test_requests_are_logged_as_json_with_their_context(app, client, log_file, employee, shop, inventory):
+    token = client.post('/auth/login', json={'username': 'sara@example.com', 'password': 'secret'}).json
+    employee_headers = {'Authorization': f"Bearer {token['access_token']}"}
+    response = client.get('/employee/stock', headers={**employee_headers, 'X-Request-ID': 'till-7.42'})
+    assert response.headers['X-Request-ID'] == 'till-7.42'
+    logging.getLogger('perfume.test').warning('Low stock for %s', 'Oud Royale', exc_info=ValueError('boom'))
+    generated = client.get('/employee/stock', headers={**employee_headers, 'X-Request-ID': 'bad id!'})
+
+    login, access, warning, second = log_file()
+    assert (login['route'], login['status'], login.get('user')) == ('/auth/login', 200, None)
+    assert access['logger'] == 'perfume.access' and access['level'] == 'INFO'
+    assert (access['request_id'], access['user'], access['shop'], access['route']) == (
+        'till-7.42', 'sara@example.com', shop.id, '/employee/stock')
+    assert (access['method'], access['path'], access['status']) == ('GET', '/employee/stock', 200)
+    assert access['queries'] >= 1 and access['latency_ms'] > 0
+    # Records outside a request carry no request context
+    assert warning['message'] == 'Low stock for Oud Royale' and 'ValueError: boom' in warning['exception']
+    assert 'request_id' not in warning
+    assert second['request_id'] == generated.headers['X-Request-ID'] != 'bad id!'
+
+
+def test_info_records_are_sampled_but_slow_requests_kept(app, client, monkeypatch, log_file, employee_headers):
+    monkeypatch.setitem(app.config, 'LOG_SAMPLE_RATES', {'perfume.access': 0})
+    start_logging(app.config)
+    client.get('/employee/stock', headers=employee_headers)
+    monkeypatch.setitem(app.config, 'LOG_SLOW_REQUEST_MS', 0)
+    client.get('/employee/stock', headers=employee_headers)
+
+    [slow] = log_file()
+    assert (slow['level'], slow['route']) == ('WARNING', '/employee/stock')
+
+
+def test_a_full_queue_drops_records_instead_of_blocking():
+    log_queue = queue.SimpleQueue()
+    handler = ContextQueueHandler(log_queue, max_size=1)
+    record = logging.makeLogRecord({'msg': 'sale %s', 'args': ('#T-1',)})
+    for _ in range(3):
+        handler.handle(record)
+    assert (log_queue.qsize(), handler.dropped) == (1, 2)
+
+    assert log_queue.get_nowait().msg == 'sale #T-1'
+    handler.handle(record)
+    assert handler.dropped == 0
+    # The next record that fits reports the loss first
+    assert log_queue.get_nowait().msg == 'Dropped 2 log records: queue full'
@@ -0,0 +1,96 @@
+import json
+import sqlite3
+
+import pytest
+
+from app import create_app
+from config import TestConfig
+from db import db, RoutingSession
+from jobs import enqueue, work
+from maintenance import analyze, backup_database, integrity_check, vacuum
+from models import Job, Shop
+
+
+@pytest.fixture
+def file_app(tmp_path, monkeypatch):
+    # Maintenance works on the database file, so use a real one instead of
+    # the rolled-back in-memory connection.
+    monkeypatch.setattr(db, 'session', db._make_scoped_session({'class_': RoutingSession}))
+
+    class FileConfig(TestConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'app.db'}"
+        SQLALCHEMY_ENGINE_OPTIONS = {}
+        MAINTENANCE_BACKUP_DIR = str(tmp_path / 'backups')
+        MAINTENANCE_BACKUP_KEEP = 2
+
+    app = create_app(FileConfig)
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([Shop(shop_id=f'SH-{index}', name='x' * 500) for index in range(200)])
+        db.session.commit()
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+
+
+def test_file_database_runs_in_wal_mode(file_app):
+    assert db.session.execute(db.text('PRAGMA journal_mode')).scalar() == 'wal'
+    assert db.session.execute(db.text('PRAGMA busy_timeout')).scalar() == 5000
+
+
+def test_backup_is_a_consistent_copy_and_old_ones_are_pruned(file_app, tmp_path):
+    results = [backup_database() for _ in range(3)]
+    assert all(result['seconds'] >= 0 and result['bytes'] > 0 for result in results)
+    assert len(results[-1]['pruned']) == 1
+
+    connection = sqlite3.connect(results[-1]['path'])
+    assert connection.execute('SELECT COUNT(*) FROM shop').fetchone()[0] == 200
+    connection.close()
+
+
+def test_vacuum_only_converts_when_asked(file_app):
+    skipped = vacuum()
+    assert (skipped['skipped'], skipped['converted']) == (True, False)
+
+    first = vacuum(convert=True)
+    assert first['converted'] is True
+
+    Shop.query.delete()
+    db.session.commit()
+    second = vacuum(pages=1)
+    assert second['converted'] is False
+    assert second['reclaimed_bytes'] > 0 and second['free_bytes'] > 0
+    third = vacuum(pages=0)
+    assert third['reclaimed_bytes'] > 0 and third['free_bytes'] == 0
+
+
+def test_analyze_and_integrity_check(file_app):
+    assert analyze()['tables'] >= 1
+    check = integrity_check()
+    assert check['ok'] is True and check['problems'] == []
+
+
+def test_recurring_maintenance_job_reschedules_itself(file_app):
+    queued = enqueue('db_maintenance', {'tasks': ['integrity', 'analyze'], 'every_hours': 24})
+    work(once=True)
+
+    finished = db.session.get(Job, queued.id)
+    assert finished.status == 'succeeded'
+    result = json.loads(finished.result)
+    assert [entry['task'] for entry in result['results']] == ['integrity', 'analyze']
+    follow_up = db.session.get(Job, result['next_job_id'])
+    assert follow_up.status == 'queued' and follow_up.run_after > finished.finished_at
+
+
+def test_schedule_maintenance_endpoint(client, owner_headers):
+    response = client.post('/owner/maintenance', json={'tasks': ['backup'], 'run_at': '2030-01-01T03:00:00'},
+                           headers=owner_headers)
+    assert response.status_code == 202
+    assert Job.query.get(response.json['job_id']).kind == 'db_maintenance'
+
+    default = client.post('/owner/maintenance', json={}, headers=owner_headers)
+    queued = json.loads(Job.query.get(default.json['job_id']).payload)['tasks']
+    assert queued == ['integrity', 'revocations', 'backup', 'analyze', 'vacuum']
+
+    bad = client.post('/owner/maintenance', json={'tasks': ['defrag']}, headers=owner_headers)
+    assert bad.status_code == 400
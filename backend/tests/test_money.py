@@ -0,0 +1,26 @@
+from db import db
+from models import Product, Sale
+from money import to_minor
+
+
+def test_amounts_are_stored_in_minor_units(product):
+    db.session.get(Product, product.id).selling_price = 19.99
+    db.session.flush()
+
+    raw = db.session.execute(db.text('SELECT cost_price, selling_price FROM product')).one()
+    assert tuple(raw) == (1000, 1999)
+    assert db.session.get(Product, product.id).selling_price == 19.99
+    assert to_minor(0.1 + 0.2) == 30
+
+
+def test_sales_sum_exactly(client, owner_headers, employee_headers, product, inventory):
+    client.put(f'/owner/products/{product.id}', json={'selling_price': 0.1}, headers=owner_headers)
+    for _ in range(10):
+        client.post('/employee/sales', json={'items': [{'product_id': product.id, 'quantity': 3}]},
+                    headers=employee_headers)
+
+    # As floats, ten sales of 3 x 0.1 add up to 2.9999999999999996
+    assert Sale.query.first().total == 0.3
+    assert client.get('/owner/dashboard', headers=owner_headers).json['total_sales'] == 3.0
+    report = client.get('/owner/reports/margin', headers=owner_headers).json
+    assert (report[0]['revenue'], report[0]['cost']) == (3.0, 300.0)
@@ -0,0 +1,183 @@
+from datetime import datetime
+
+from db import db
+from models import Inventory, Product, Sale, Shop, StockIn, User
+
+
+def test_create_and_list_shops(client, owner_headers):
+    response = client.post('/owner/shops', json={'shop_id': 'SH-9', 'name': 'Mall'}, headers=owner_headers)
+    assert response.status_code == 201
+
+    duplicate = client.post('/owner/shops', json={'shop_id': 'SH-9', 'name': 'Mall'}, headers=owner_headers)
+    assert duplicate.status_code == 400
+
+    shops = client.get('/owner/shops', headers=owner_headers).json
+    assert [shop['shop_id'] for shop in shops] == ['SH-9']
+
+
+def test_update_and_delete_shop(client, owner_headers, shop):
+    response = client.put(f'/owner/shops/{shop.id}', json={'name': 'Renamed'}, headers=owner_headers)
+    assert response.status_code == 200
+    assert client.get('/owner/shops', headers=owner_headers).json[0]['name'] == 'Renamed'
+
+    assert client.delete(f'/owner/shops/{shop.id}', headers=owner_headers).status_code == 200
+    assert client.delete(f'/owner/shops/{shop.id}', headers=owner_headers).status_code == 404
+
+
+def test_create_product_validates_prices(client, owner_headers):
+    payload = {'product_id': 'P-2', 'name': 'Amber', 'cost_price': '-1', 'selling_price': 5, 'reorder_level': 1}
+    assert client.post('/owner/products', json=payload, headers=owner_headers).status_code == 400
+
+    payload['cost_price'] = 2
+    assert client.post('/owner/products', json=payload, headers=owner_headers).status_code == 201
+    products = client.get('/owner/products', headers=owner_headers).json
+    assert products[0]['cost_price'] == 2.0
+
+
+def test_update_and_delete_product(client, owner_headers, product):
+    response = client.put(f'/owner/products/{product.id}', json={'selling_price': 'abc'}, headers=owner_headers)
+    assert response.status_code == 400
+
+    response = client.put(f'/owner/products/{product.id}', json={'selling_price': 30}, headers=owner_headers)
+    assert response.status_code == 200
+    assert client.get('/owner/products', headers=owner_headers).json[0]['selling_price'] == 30.0
+
+    assert client.delete(f'/owner/products/{product.id}', headers=owner_headers).status_code == 200
+
+
+def test_employee_crud(client, owner_headers, shop):
+    payload = {
+        'employee_id': 'E-7',
+        'name': 'Lina',
+        'shop_id': shop.id,
+        'role': 'employee',
+        'username': 'lina@example.com',
+        'password': 'pw'
+    }
+    assert client.post('/owner/employees', json=payload, headers=owner_headers).status_code == 201
+    assert client.post('/owner/employees', json=payload, headers=owner_headers).status_code == 400
+
+    lina = User.query.filter_by(username='lina@example.com').first()
+    response = client.put(f'/owner/employees/{lina.id}', json={'name': 'Lina K'}, headers=owner_headers)
+    assert response.status_code == 200
+    names = {user['name'] for user in client.get('/owner/employees', headers=owner_headers).json}
+    assert 'Lina K' in names
+
+    assert client.delete(f'/owner/employees/{lina.id}', headers=owner_headers).status_code == 200
+
+
+def test_create_employee_rejects_invalid_email(client, owner_headers):
+    payload = {'employee_id': 'E-8', 'name': 'X', 'role': 'employee', 'username': 'not-an-email', 'password': 'pw'}
+    assert client.post('/owner/employees', json=payload, headers=owner_headers).status_code == 400
+
+
+def test_bulk_employees_create_and_update_in_one_transaction(client, owner_headers, shop, employee):
+    payload = {'employees': [
+        {'employee_id': 'E-2', 'name': 'Ali', 'role': 'employee', 'shop_id': shop.id,
+         'username': 'ali@example.com', 'password': 'pw-ali'},
+        {'employee_id': 'E-3', 'name': 'Noor', 'role': 'employee', 'shop_id': shop.id,
+         'username': 'noor@example.com', 'password': 'pw-noor'},
+        {'id': employee.id, 'contact': '555-0101', 'password': 'new-secret'},
+    ]}
+    response = client.post('/owner/employees/bulk', json=payload, headers=owner_headers)
+    assert response.status_code == 200
+    assert (response.json['created'], response.json['updated']) == (2, 1)
+
+    assert User.query.filter_by(username='noor@example.com').one().check_password('pw-noor')
+    updated = db.session.get(User, employee.id)
+    assert updated.contact == '555-0101' and updated.check_password('new-secret')
+
+
+def test_bulk_employees_reject_the_whole_batch(client, owner_headers, shop, employee):
+    payload = {'employees': [
+        {'employee_id': 'E-2', 'name': 'Ali', 'role': 'employee', 'username': 'ali@example.com', 'password': 'x'},
+        {'employee_id': 'E-3', 'name': 'Dup', 'role': 'employee', 'username': 'sara@example.com', 'password': 'x'},
+        {'employee_id': 'E-2', 'name': 'Twice', 'role': 'employee', 'username': 'two@example.com', 'password': 'x'},
+        {'employee_id': 'E-4', 'name': 'Bad', 'role': 'employee', 'username': 'not-an-email', 'password': 'x'},
+        {'employee_id': 'E-5', 'name': 'Lost', 'role': 'employee', 'username': 'lost@example.com',
+         'password': 'x', 'shop_id': 999},
+        {'id': 999, 'name': 'Ghost'},
+    ]}
+    response = client.post('/owner/employees/bulk', json=payload, headers=owner_headers)
+    assert response.status_code == 400
+    assert [error['row'] for error in response.json['errors']] == [1, 2, 3, 4, 5]
+    assert User.query.filter_by(username='ali@example.com').first() is None
+
+
+def test_inventory_stock_in_and_filters(client, owner_headers, shop, product):
+    payload = {'shop_id': shop.id, 'product_id': product.id, 'quantity': 3}
+    assert client.post('/owner/inventory/stock-in', json=payload, headers=owner_headers).status_code == 201
+    assert client.post('/owner/inventory/stock-in', json=payload, headers=owner_headers).status_code == 201
+
+    inventory = client.get('/owner/inventory', headers=owner_headers).json
+    assert inventory[0]['current_stock'] == 6
+
+    low = client.get('/owner/inventory?view=low', headers=owner_headers).json
+    assert len(low) == 0
+
+    by_name = client.get('/owner/inventory?product_name=oud', headers=owner_headers).json
+    assert len(by_name) == 1
+
+
+def test_inventory_matrix(client, owner_headers, shop, product, inventory):
+    other_shop = Shop(shop_id='SH-2', name='Mall')
+    other_product = Product(product_id='P-2', name='Amber', cost_price=5, selling_price=9, reorder_level=5)
+    db.session.add_all([other_shop, other_product])
+    db.session.flush()
+    db.session.add(Inventory(shop_id=other_shop.id, product_id=other_product.id, current_stock=2))
+    db.session.commit()
+
+    matrix = client.get('/owner/inventory/matrix', headers=owner_headers).json
+    assert [s['shop_id'] for s in matrix['shops']] == ['SH-1', 'SH-2']
+    assert [p['name'] for p in matrix['products']] == ['Amber', 'Oud Royale']
+    assert matrix['shape'] == 'dense'
+    assert matrix['stock'] == [[None, 20], [2, None]]
+    assert matrix['low'] == [[1, 0]]
+
+    sparse = client.get('/owner/inventory/matrix?shape=sparse', headers=owner_headers).json
+    assert sparse['cells'] == [[0, 1, 20], [1, 0, 2]]
+
+    low = client.get('/owner/inventory/matrix?view=low', headers=owner_headers).json
+    assert ([s['shop_id'] for s in low['shops']], low['stock']) == (['SH-2'], [[2]])
+    filtered = client.get(f'/owner/inventory/matrix?shop_id={shop.id}&product_name=oud', headers=owner_headers).json
+    assert filtered['stock'] == [[20]]
+
+    # Stock changes show up despite the cached matrix
+    client.post('/owner/inventory/stock-in', json={'shop_id': other_shop.id, 'product_id': other_product.id,
+                                                   'quantity': 10}, headers=owner_headers)
+    assert client.get('/owner/inventory/matrix', headers=owner_headers).json['low'] == []
+
+    assert client.get('/owner/inventory/matrix?shop_id=x', headers=owner_headers).status_code == 400
+    assert client.get('/owner/inventory/matrix?shape=csv', headers=owner_headers).status_code == 400
+
+
+def test_dashboard_and_sales(client, owner_headers, employee, product, inventory):
+    db.session.add(Sale(
+        ticket_id='#T-000001', time=datetime(2025, 1, 5, 10), product_id=product.id,
+        quantity=2, total=50.0, employee_id=employee.id
+    ))
+    db.session.commit()
+
+    dashboard = client.get('/owner/dashboard', headers=owner_headers).json
+    assert dashboard == {'total_sales': 50.0, 'low_stock_count': 0}
+
+    sales = client.get('/owner/sales?date_from=2025-01-01', headers=owner_headers).json
+    assert len(sales) == 1
+    assert sales[0]['shop']['shop_id'] == 'SH-1'
+    assert client.get('/owner/sales?date_to=2024-12-31', headers=owner_headers).json == []
+
+
+def test_stock_in_records(client, owner_headers, shop, product):
+    payload = {
+        'stock_in_id': 'SI-1',
+        'date': '2025-01-05T09:00:00',
+        'shop_id': shop.id,
+        'product_id': product.id,
+        'quantity': 12,
+        'supplier': 'Acme'
+    }
+    db.session.add(StockIn(**{**payload, 'date': datetime(2025, 1, 5, 9)}))
+    db.session.commit()
+
+    records = client.get('/owner/stock-in', headers=owner_headers).json
+    assert records[0]['supplier'] == 'Acme'
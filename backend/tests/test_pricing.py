@@ -0,0 +1,45 @@
+from datetime import datetime
+
+from db import db
+from models import ProductPriceHistory, Sale
+
+
+def test_price_changes_are_recorded(client, owner_headers, product):
+    client.put(f'/owner/products/{product.id}', json={'name': 'Oud Noir'}, headers=owner_headers)
+    client.put(f'/owner/products/{product.id}', json={'cost_price': 12.0}, headers=owner_headers)
+
+    history = client.get(f'/owner/products/{product.id}/price-history', headers=owner_headers).json
+    assert [(entry['cost_price'], entry['selling_price']) for entry in history] == [(10.0, 25.0), (12.0, 25.0)]
+
+
+def test_sale_lines_keep_the_cost_at_sale_time(client, owner_headers, employee_headers, product, inventory):
+    payload = {'items': [{'product_id': product.id, 'quantity': 2}]}
+    client.post('/employee/sales', json=payload, headers=employee_headers)
+    client.put(f'/owner/products/{product.id}', json={'cost_price': 20.0, 'selling_price': 30.0},
+               headers=owner_headers)
+    client.post('/employee/sales', json=payload, headers=employee_headers)
+
+    assert sorted((sale.unit_cost, sale.unit_price) for sale in Sale.query) == [(10.0, 25.0), (20.0, 30.0)]
+
+    report = client.get('/owner/reports/margin', headers=owner_headers).json
+    assert report == [{
+        'product': product.id, 'name': 'Oud Royale', 'lines': 2, 'quantity': 4,
+        'revenue': 110.0, 'cost': 60.0, 'profit': 50.0, 'margin': 0.4545, 'lines_without_cost': 0
+    }]
+
+
+def test_margin_report_by_day_counts_uncosted_lines(client, owner_headers, employee, product):
+    db.session.add_all([
+        Sale(ticket_id='#T-1', time=datetime(2025, 1, 10), product_id=product.id, quantity=1, total=25.0,
+             employee_id=employee.id, unit_cost=10.0, unit_price=25.0),
+        Sale(ticket_id='#T-2', time=datetime(2025, 1, 10), product_id=product.id, quantity=1, total=25.0,
+             employee_id=employee.id)
+    ])
+    db.session.commit()
+
+    day = client.get('/owner/reports/margin?group_by=day', headers=owner_headers).json[0]
+    assert day['day'] == '2025-01-10'
+    assert (day['revenue'], day['profit'], day['margin'], day['lines_without_cost']) == (50.0, 15.0, 0.6, 1)
+
+    assert client.get('/owner/reports/margin?group_by=shop', headers=owner_headers).status_code == 400
+    assert ProductPriceHistory.query.count() == 1
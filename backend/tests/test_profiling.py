@@ -0,0 +1,85 @@
+import pstats
+
+import pytest
+
+from app import create_app
+from config import TestConfig
+from profiling import _cpu_lock
+
+
+@pytest.fixture
+def profiling_client(tmp_path):
+    class ProfilingConfig(TestConfig):
+        PROFILING_ENABLED = True
+        PROFILING_DIR = str(tmp_path / 'profiles')
+        PROFILING_KEEP = 2
+        PROFILING_STACK_INTERVAL_MS = 1
+
+    return create_app(ProfilingConfig).test_client()
+
+
+def test_owner_profiles_a_request(profiling_client, owner_headers, product, tmp_path):
+    response = profiling_client.get('/owner/products', headers={**owner_headers, 'X-Profile': 'all'})
+    assert response.status_code == 200
+    profile_id = response.headers['X-Profile-Id']
+
+    listed = profiling_client.get('/owner/profiles', headers=owner_headers).json
+    assert [(entry['id'], entry['endpoint'], entry['modes']) for entry in listed] == [
+        (profile_id, 'owner.get_products', ['cpu', 'memory', 'stacks'])]
+
+    profile = profiling_client.get(f'/owner/profiles/{profile_id}', headers=owner_headers).json
+    assert any('get_products' in entry['function'] for entry in profile['functions'])
+    assert profile['memory']['peak_bytes'] > 0
+
+    collapsed = profiling_client.get(f'/owner/profiles/{profile_id}?format=collapsed', headers=owner_headers)
+    assert collapsed.mimetype == 'text/plain'
+    assert all(line.rsplit(' ', 1)[1].isdigit() for line in collapsed.get_data(as_text=True).splitlines())
+
+    raw = profiling_client.get(f'/owner/profiles/{profile_id}?format=pstats', headers=owner_headers)
+    (tmp_path / 'download.prof').write_bytes(raw.data)
+    assert pstats.Stats(str(tmp_path / 'download.prof')).total_calls > 0
+
+    assert profiling_client.get('/owner/profiles/../../etc', headers=owner_headers).status_code == 404
+    assert profiling_client.get('/owner/profiles/20260101-000000-deadbeef',
+                                headers=owner_headers).status_code == 404
+
+
+def test_only_owners_can_profile_and_old_profiles_are_pruned(profiling_client, owner_headers, employee_headers):
+    response = profiling_client.get('/employee/stock', headers={**employee_headers, 'X-Profile': 'cpu'})
+    assert response.status_code == 200
+    assert 'X-Profile-Id' not in response.headers
+
+    for _ in range(3):
+        profiling_client.get('/owner/shops?_profile=cpu', headers=owner_headers)
+    assert len(profiling_client.get('/owner/profiles', headers=owner_headers).json) == 2
+
+
+def test_one_cpu_profile_at_a_time(profiling_client, owner_headers):
+    # Another thread of the worker is being profiled
+    with _cpu_lock:
+        busy = profiling_client.get('/owner/shops', headers={**owner_headers, 'X-Profile': 'cpu'})
+        assert busy.status_code == 200 and 'X-Profile-Id' not in busy.headers
+        partial = profiling_client.get('/owner/shops', headers={**owner_headers, 'X-Profile': 'cpu,stacks'})
+    profile = profiling_client.get(f"/owner/profiles/{partial.headers['X-Profile-Id']}", headers=owner_headers).json
+    assert profile['modes'] == ['stacks']
+
+    assert 'X-Profile-Id' in profiling_client.get('/owner/shops?_profile=cpu', headers=owner_headers).headers
+    assert not _cpu_lock.locked()
+
+
+def test_sampled_requests_are_stored_without_a_header(tmp_path, owner_headers):
+    class SamplingConfig(TestConfig):
+        PROFILING_ENABLED = True
+        PROFILING_DIR = str(tmp_path / 'profiles')
+        PROFILING_SAMPLE_RATE = 1.0
+
+    client = create_app(SamplingConfig).test_client()
+    response = client.get('/owner/shops', headers=owner_headers)
+    assert 'X-Profile-Id' not in response.headers
+    assert client.get('/owner/profiles', headers=owner_headers).json[0]['sampled'] is True
+
+
+def test_profiling_disabled_by_default(client, owner_headers):
+    response = client.get('/owner/shops', headers={**owner_headers, 'X-Profile': 'all'})
+    assert 'X-Profile-Id' not in response.headers
+    assert client.get('/owner/profiles', headers=owner_headers).status_code == 404
@@ -0,0 +1,84 @@
+import time
+
+import pytest
+
+from app import create_app
+from config import TestConfig
+from ratelimit import MemoryBackend, SqliteBackend
+
+
+@pytest.fixture
+def limited_app():
+    class LimitedConfig(TestConfig):
+        RATELIMIT_ENABLED = True
+        RATELIMIT_BACKEND = 'memory'
+        RATELIMITS = {
+            'auth.login': {'rate': '3/minute', 'burst': 3, 'key': ('ip', 'username')},
+            'owner': {'rate': '1/minute', 'burst': 2, 'key': 'identity'},
+        }
+
+    return create_app(LimitedConfig)
+
+
+def test_login_is_throttled_per_username(limited_app, owner):
+    client = limited_app.test_client()
+    for _ in range(3):
+        response = client.post('/auth/login', json={'username': 'owner@example.com', 'password': 'wrong'})
+        assert response.status_code == 401
+
+    blocked = client.post('/auth/login', json={'username': 'owner@example.com', 'password': 'secret'})
+    assert blocked.status_code == 429
+    assert int(blocked.headers['Retry-After']) > 0
+
+    other = client.post('/auth/login', json={'username': 'someone@example.com', 'password': 'x'})
+    assert other.status_code == 401
+
+
+def test_owner_routes_are_limited_per_identity(limited_app, owner_headers, employee_headers):
+    client = limited_app.test_client()
+    assert client.get('/owner/shops', headers=owner_headers).status_code == 200
+    assert client.get('/owner/products', headers=owner_headers).status_code == 200
+    assert client.get('/owner/shops', headers=owner_headers).status_code == 429
+    # A different identity has its own bucket
+    assert client.get('/owner/shops', headers=employee_headers).status_code == 403
+    # Routes without a rule are not limited
+    assert client.get('/api/products', headers=owner_headers).status_code == 200
+
+
+@pytest.mark.parametrize('make_backend', [
+    lambda tmp_path: (MemoryBackend(),) * 2,
+    lambda tmp_path: (SqliteBackend(str(tmp_path / 'rl.db')), SqliteBackend(str(tmp_path / 'rl.db'))),
+])
+def test_backends_refill_and_share(tmp_path, make_backend):
+    first, second = make_backend(tmp_path)
+    assert first.take('k', rate=0.001, burst=2)[0]
+    assert second.take('k', rate=0.001, burst=2)[0]
+    allowed, tokens = first.take('k', rate=0.001, burst=2)
+    assert not allowed
+    assert tokens < 1
+    time.sleep(0.01)
+    assert first.take('k', rate=1000, burst=2)[0]
+
+
+@pytest.mark.parametrize('make_backend', [
+    lambda tmp_path: MemoryBackend(idle_seconds=0.01),
+    lambda tmp_path: SqliteBackend(str(tmp_path / 'rl.db'), idle_seconds=0.01),
+])
+def test_idle_buckets_are_swept(tmp_path, make_backend):
+    backend = make_backend(tmp_path)
+    backend.take('username=someone-else', rate=1, burst=5)
+    time.sleep(0.02)
+    backend._next_sweep = 0
+    backend.take('username=owner@example.com', rate=1, burst=5)
+    if isinstance(backend, MemoryBackend):
+        keys = list(backend._buckets)
+    else:
+        keys = [key for key, in backend._connection().execute('SELECT key FROM bucket')]
+    assert keys == ['username=owner@example.com']
+
+
+def test_memory_backend_drops_least_recently_used_buckets():
+    backend = MemoryBackend(max_size=2)
+    for key in ('a', 'b', 'a', 'c'):
+        backend.take(key, rate=1, burst=5)
+    assert list(backend._buckets) == ['a', 'c']
@@ -0,0 +1,103 @@
+from datetime import datetime
+
+import pytest
+
+from app import create_app
+from archive import archive_month
+from config import TestConfig
+from db import db, RoutingSession
+from jobs import work
+from models import Inventory, Product, Sale, Shop, StockIn, User
+from reconcile import reconcile_inventory
+
+
+def _history(shop, product, employee, received, sold, when=datetime(2025, 1, 10)):
+    db.session.add(StockIn(stock_in_id=f'SI-{shop.id}-{product.id}', date=when, shop_id=shop.id,
+                           product_id=product.id, quantity=received))
+    for index in range(sold):
+        db.session.add(Sale(ticket_id=f'#T-{shop.id}-{index}', time=when, product_id=product.id, quantity=1,
+                            total=25.0, employee_id=employee.id))
+    db.session.commit()
+
+
+def test_reports_and_corrects_discrepancies(shop, product, employee, inventory):
+    _history(shop, product, employee, received=25, sold=3)
+
+    report = reconcile_inventory()
+    assert report['discrepancies'] == [{
+        'shop_id': shop.id, 'product_id': product.id, 'received': 25, 'sold': 3,
+        'expected': 22, 'actual': 20, 'difference': -2
+    }]
+    assert report['corrected'] == 0
+
+    reconcile_inventory(correct=True)
+    assert db.session.get(Inventory, inventory.id).current_stock == 22
+    assert reconcile_inventory()['discrepancies'] == []
+
+
+def test_stock_in_through_the_routes_survives_a_corrective_run(client, owner_headers, employee_headers, shop,
+                                                               product, employee, inventory):
+    _history(shop, product, employee, received=20, sold=0)
+    assert client.post('/owner/inventory/stock-in', json={'shop_id': shop.id, 'product_id': product.id,
+                                                           'quantity': 5}, headers=owner_headers).status_code == 201
+    assert client.post('/employee/stock-in', json={'product_id': product.id, 'quantity': 3, 'supplier': 'Acme'},
+                       headers=employee_headers).status_code == 201
+    assert StockIn.query.filter_by(shop_id=shop.id).count() == 3
+
+    report = reconcile_inventory(correct=True)
+    assert (report['discrepancies'], report['corrected']) == ([], 0)
+    assert db.session.get(Inventory, inventory.id).current_stock == 28
+
+
+def test_reconcile_job_from_owner_endpoint(client, owner_headers, shop, product, employee):
+    _history(shop, product, employee, received=5, sold=0)
+    response = client.post('/owner/inventory/reconcile', json={'correct': True}, headers=owner_headers)
+    assert response.status_code == 202
+
+    work(once=True)
+    result = client.get(f"/owner/jobs/{response.json['job_id']}", headers=owner_headers).json['result']
+    assert result['corrected'] == 1
+    assert Inventory.query.filter_by(shop_id=shop.id, product_id=product.id).one().current_stock == 5
+
+
+@pytest.fixture
+def file_app(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, 'session', db._make_scoped_session({'class_': RoutingSession}))
+
+    class FileConfig(TestConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'app.db'}"
+        SQLALCHEMY_ENGINE_OPTIONS = {}
+
+    app = create_app(FileConfig)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+
+
+def test_parallel_reconcile_includes_archived_months(file_app):
+    product = Product(product_id='P-1', name='Oud', cost_price=1, selling_price=2, reorder_level=0)
+    shops = [Shop(shop_id=f'SH-{index}', name='Shop') for index in range(3)]
+    db.session.add_all([product, *shops])
+    db.session.flush()
+    employees = [User(employee_id=f'E-{shop.id}', name='E', role='employee', shop_id=shop.id,
+                      username=f'e{shop.id}@example.com', password='x') for shop in shops]
+    db.session.add_all(employees)
+    db.session.commit()
+
+    for shop, employee in zip(shops, employees):
+        _history(shop, product, employee, received=10, sold=4)
+        db.session.add(Inventory(shop_id=shop.id, product_id=product.id, current_stock=6))
+    db.session.commit()
+    archive_month('2025-01')
+    # One shop's stock drifted
+    Inventory.query.filter_by(shop_id=shops[1].id).update({'current_stock': 9})
+    db.session.commit()
+
+    report = reconcile_inventory(workers=2)
+    assert report['workers'] == 2
+    assert report['pairs'] == 3
+    assert [(entry['shop_id'], entry['expected'], entry['actual']) for entry in report['discrepancies']] == [
+        (shops[1].id, 6, 9)
+    ]
@@ -0,0 +1,106 @@
+import os
+import sqlite3
+import time
+
+import pytest
+from flask_jwt_extended import create_access_token
+
+from app import create_app
+from config import TestConfig
+from db import db, RoutingSession
+from models import Shop, User
+from replica import _lag_cache, refresh_replica
+
+
+@pytest.fixture
+def replica_app(tmp_path, monkeypatch):
+    # Needs real routing sessions on file databases, not the rolled-back
+    # connection the autouse fixture installs.
+    monkeypatch.setattr(db, 'session', db._make_scoped_session({'class_': RoutingSession}))
+
+    class ReplicaConfig(TestConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'primary.db'}"
+        SQLALCHEMY_ENGINE_OPTIONS = {}
+        SQLALCHEMY_BINDS = {'replica': f"sqlite:///{tmp_path / 'replica.db'}"}
+
+    app = create_app(ReplicaConfig)
+    with app.app_context():
+        db.create_all()
+        owner = User(employee_id='OWNER', name='Owner', role='owner', username='owner@example.com')
+        owner.set_password('secret')
+        db.session.add_all([owner, Shop(shop_id='SH-1', name='First')])
+        db.session.commit()
+        refresh_replica()
+        app.config['OWNER_TOKEN'] = create_access_token(identity=owner.username, additional_claims={'role': 'owner'})
+    yield app
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose()
+
+
+def test_owner_reads_go_to_replica_until_they_write(replica_app, tmp_path):
+    client = replica_app.test_client()
+    headers = {'Authorization': f"Bearer {replica_app.config['OWNER_TOKEN']}"}
+
+    # Someone else writes to the primary after the snapshot was taken
+    connection = sqlite3.connect(tmp_path / 'primary.db')
+    connection.execute("INSERT INTO shop (shop_id, name) VALUES ('SH-2', 'Second')")
+    connection.commit()
+    connection.close()
+
+    assert [shop['shop_id'] for shop in client.get('/owner/shops', headers=headers).json] == ['SH-1']
+
+    # Read-your-writes: after the owner writes, their reads use the primary
+    client.post('/owner/shops', json={'shop_id': 'SH-3', 'name': 'Third'}, headers=headers)
+    shops = [shop['shop_id'] for shop in client.get('/owner/shops', headers=headers).json]
+    assert shops == ['SH-1', 'SH-2', 'SH-3']
+
+    with replica_app.app_context():
+        refresh_replica()
+    assert len(client.get('/owner/shops', headers=headers).json) == 3
+
+
+def test_lagging_replica_falls_back_to_primary(replica_app, tmp_path):
+    replica_app.config['REPLICA_MAX_LAG'] = -1
+    client = replica_app.test_client()
+    headers = {'Authorization': f"Bearer {replica_app.config['OWNER_TOKEN']}"}
+
+    with replica_app.app_context():
+        db.session.add(Shop(shop_id='SH-9', name='Fresh'))
+        db.session.commit()
+    assert len(client.get('/owner/shops', headers=headers).json) == 2
+
+
+def test_write_in_the_snapshots_mtime_tick_still_reads_the_primary(replica_app, tmp_path):
+    client = replica_app.test_client()
+    headers = {'Authorization': f"Bearer {replica_app.config['OWNER_TOKEN']}"}
+    client.post('/owner/shops', json={'shop_id': 'SH-3', 'name': 'Third'}, headers=headers)
+
+    # Coarse filesystem clocks give the write the snapshot's own mtime
+    snapshot = os.path.getmtime(tmp_path / 'replica.db')
+    for name in ('primary.db', 'primary.db-wal'):
+        if (tmp_path / name).exists():
+            os.utime(tmp_path / name, (snapshot, snapshot))
+    _lag_cache.clear()
+    assert len(client.get('/owner/shops', headers=headers).json) == 2
+
+
+def test_lag_counts_from_the_snapshot_not_the_last_write(replica_app, tmp_path):
+    replica_app.config['REPLICA_MAX_LAG'] = 30
+    client = replica_app.test_client()
+    headers = {'Authorization': f"Bearer {replica_app.config['OWNER_TOKEN']}"}
+    connection = sqlite3.connect(tmp_path / 'primary.db')
+    connection.execute("INSERT INTO shop (shop_id, name) VALUES ('SH-2', 'Second')")
+    connection.commit()
+    connection.close()
+
+    # A minute-old snapshot is a minute behind even though the primary's last
+    # write came just a second after it
+    now = time.time()
+    os.utime(tmp_path / 'replica.db', (now - 60, now - 60))
+    for name in ('primary.db', 'primary.db-wal'):
+        if (tmp_path / name).exists():
+            os.utime(tmp_path / name, (now - 59, now - 59))
+    _lag_cache.clear()
+    assert len(client.get('/owner/shops', headers=headers).json) == 2
+
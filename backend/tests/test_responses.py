@@ -0,0 +1,49 @@
+import gzip
+import json
+
+from db import db
+from models import Inventory, Product, Shop
+
+
+def _many_rows(shop, count=40):
+    for i in range(count):
+        product = Product(product_id=f'P-X{i}', name=f'Scent {i}', cost_price=1, selling_price=2, reorder_level=1)
+        db.session.add(product)
+        db.session.flush()
+        db.session.add(Inventory(shop_id=shop.id, product_id=product.id, current_stock=i))
+    db.session.commit()
+
+
+def test_sparse_fieldsets(client, owner_headers, inventory):
+    rows = client.get('/owner/inventory?fields=id,current_stock,product.name', headers=owner_headers).json
+    assert rows == [{'id': inventory.id, 'current_stock': 20, 'product': {'name': 'Oud Royale'}}]
+
+
+def test_normalized_shape_sends_shared_objects_once(client, owner_headers, shop, inventory):
+    second = Shop(shop_id='SH-2', name='Airport')
+    db.session.add(second)
+    db.session.flush()
+    db.session.add(Inventory(shop_id=second.id, product_id=inventory.product_id, current_stock=1))
+    db.session.commit()
+
+    body = client.get('/owner/inventory?shape=normalized', headers=owner_headers).json
+    assert len(body['rows']) == 2
+    assert set(body['shops']) == {str(shop.id), str(second.id)}
+    assert list(body['products']) == [str(inventory.product_id)]
+    assert body['rows'][0]['product'] == inventory.product_id
+
+
+def test_large_responses_are_gzipped_when_accepted(client, owner_headers, shop):
+    _many_rows(shop)
+    plain = client.get('/owner/inventory', headers=owner_headers)
+    assert 'Content-Encoding' not in plain.headers
+
+    compressed = client.get('/owner/inventory', headers={**owner_headers, 'Accept-Encoding': 'gzip'})
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert len(compressed.data) < len(plain.data)
+    assert json.loads(gzip.decompress(compressed.data)) == plain.json
+
+
+def test_small_responses_are_not_compressed(client, owner_headers, shop):
+    response = client.get('/owner/shops', headers={**owner_headers, 'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in response.headers
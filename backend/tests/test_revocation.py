@@ -0,0 +1,93 @@
+from datetime import datetime
+
+from flask_jwt_extended import decode_token
+from sqlalchemy import event
+
+from app import create_app
+from config import TestConfig
+from db import db
+from models import RevokedToken
+from revocation import BloomFilter, is_revoked, revocation_stats
+
+
+def _login(client, username='sara@example.com', password='secret'):
+    token = client.post('/auth/login', json={'username': username, 'password': password}).json['access_token']
+    return {'Authorization': f'Bearer {token}'}
+
+
+def test_logout_revokes_only_that_token(client, employee):
+    first, second = _login(client), _login(client)
+    assert client.post('/auth/logout', headers=first).status_code == 200
+
+    response = client.get('/employee/stock', headers=first)
+    assert (response.status_code, response.json['msg']) == (401, 'Token has been revoked')
+    assert client.get('/employee/stock', headers=second).status_code == 200
+
+
+def test_password_change_and_delete_end_sessions(client, owner_headers, employee):
+    old = _login(client)
+    client.put(f'/owner/employees/{employee.id}', json={'contact': '0700'}, headers=owner_headers)
+    assert client.get('/employee/stock', headers=old).status_code == 200
+
+    client.put(f'/owner/employees/{employee.id}', json={'password': 'changed'}, headers=owner_headers)
+    assert client.get('/employee/stock', headers=old).status_code == 401
+    new = _login(client, password='changed')
+    assert client.get('/employee/stock', headers=new).status_code == 200
+
+    client.delete(f'/owner/employees/{employee.id}', headers=owner_headers)
+    assert client.get('/employee/stock', headers=new).status_code == 401
+
+
+def test_unrevoked_tokens_are_checked_without_queries(app, client, employee):
+    headers = _login(client)
+    payload = decode_token(headers['Authorization'][7:])
+    is_revoked(payload)  # first check loads the revocations
+
+    statements = []
+    listener = lambda *args: statements.append(args[2])  # noqa: E731
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        for _ in range(100):
+            assert not is_revoked(payload)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+    assert statements == []
+    assert revocation_stats()['lookups'] == 0
+
+
+def test_other_workers_pick_up_revocations(client, owner_headers, employee):
+    class OtherWorker(TestConfig):
+        REVOCATION_SYNC_SECONDS = 0
+
+    other = create_app(OtherWorker).test_client()
+    headers = _login(client)
+    assert other.get('/employee/stock', headers=headers).status_code == 200
+
+    client.put(f'/owner/employees/{employee.id}', json={'role': 'owner'}, headers=owner_headers)
+    assert other.get('/employee/stock', headers=headers).status_code == 401
+
+
+def test_revocations_committed_out_of_id_order_are_picked_up(client, employee):
+    class OtherWorker(TestConfig):
+        REVOCATION_SYNC_SECONDS = 0
+
+    other = create_app(OtherWorker).test_client()
+    headers = _login(client)
+    jti = decode_token(headers['Authorization'][7:])['jti']
+    db.session.add(RevokedToken(id=100, key='jti:someone-else', revoked_at=datetime.utcnow()))
+    db.session.commit()
+    assert other.get('/employee/stock', headers=headers).status_code == 200
+
+    # A sequence value handed out before id 100 but committed after the sync
+    db.session.add(RevokedToken(id=50, key=f'jti:{jti}', revoked_at=datetime.utcnow()))
+    db.session.commit()
+    assert other.get('/employee/stock', headers=headers).status_code == 401
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    for index in range(1000):
+        bloom.add(f'jti:{index}')
+    assert all(f'jti:{index}' in bloom for index in range(1000))
+    false_positives = sum(f'sub:{index}' in bloom for index in range(10000))
+    assert false_positives < 300
@@ -0,0 +1,171 @@
+import sqlite3
+
+import pytest
+from flask_jwt_extended import create_access_token
+
+from app import create_app
+from archive import archive_month
+from config import TestConfig
+from db import db, RoutingSession
+from models import Inventory, Product, Shop, User
+from reconcile import reconcile_inventory
+from shards import SHARD_ID_BITS, ShardRequired, split_central
+
+
+def _headers(app, username, role):
+    with app.app_context():
+        return {'Authorization': f"Bearer {create_access_token(identity=username, additional_claims={'role': role})}"}
+
+
+@pytest.fixture
+def sharded_app(tmp_path, monkeypatch):
+    # Real routing sessions on file databases, not the rolled-back connection
+    # the autouse fixture installs; the hooks init_shards sets are undone after.
+    monkeypatch.setattr(db, 'session', db._make_scoped_session({'class_': RoutingSession}))
+    monkeypatch.setattr(RoutingSession, 'shard_router', None)
+    monkeypatch.setattr(RoutingSession, 'connection_callable', None)
+
+    class ShardedConfig(TestConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'primary.db'}"
+        SQLALCHEMY_ENGINE_OPTIONS = {}
+        SHARDS_DIR = str(tmp_path / 'shards')
+
+    app = create_app(ShardedConfig)
+    with app.app_context():
+        # Only the primary: an earlier app may have registered a replica bind
+        db.create_all(bind_key=None)
+        shops = [Shop(shop_id='SH-1', name='Main Street'), Shop(shop_id='SH-2', name='Mall')]
+        db.session.add_all(shops + [
+            Product(product_id='P-1', name='Oud Royale', cost_price=10, selling_price=25, reorder_level=5)
+        ])
+        db.session.flush()
+        users = [User(employee_id='OWNER', name='Owner', role='owner', username='owner@example.com')] + [
+            User(employee_id=f'E-{shop.id}', name=f'Seller {shop.id}', role='employee', shop_id=shop.id,
+                 username=f'seller{shop.id}@example.com') for shop in shops
+        ]
+        for user in users:
+            user.set_password('secret')
+        db.session.add_all(users)
+        db.session.commit()
+        app.config['SHOP_IDS'] = [shop.id for shop in shops]
+    yield app
+    with app.app_context():
+        app.extensions['shards'].dispose()
+        db.engine.dispose()
+
+
+def _rows(path, sql):
+    connection = sqlite3.connect(path)
+    try:
+        return connection.execute(sql).fetchall()
+    finally:
+        connection.close()
+
+
+def test_each_shop_writes_its_own_file(sharded_app, tmp_path):
+    client = sharded_app.test_client()
+    first, second = sharded_app.config['SHOP_IDS']
+    owner = _headers(sharded_app, 'owner@example.com', 'owner')
+    tickets = []
+    for shop_id, quantity in ((first, 2), (second, 1)):
+        seller = _headers(sharded_app, f'seller{shop_id}@example.com', 'employee')
+        assert client.post('/employee/stock-in', json={'product_id': 1, 'quantity': 10},
+                           headers=seller).status_code == 201
+        response = client.post('/employee/sales', json={'items': [{'product_id': 1, 'quantity': quantity}]},
+                               headers=seller)
+        assert response.status_code == 201
+        tickets.append(response.json['ticket']['id'])
+        assert [item['current_stock'] for item in client.get('/employee/stock', headers=seller).json] == [10]
+
+    # New rows are numbered from their shop's range, and only that shop's file has them
+    assert [ticket_id >> SHARD_ID_BITS for ticket_id in tickets] == [first, second]
+    shards = tmp_path / 'shards'
+    assert _rows(shards / f'shop_{first}.db', 'SELECT shop_id, current_stock FROM inventory') == [(first, 10)]
+    assert _rows(shards / f'shop_{second}.db', 'SELECT quantity FROM sale') == [(1,)]
+    assert _rows(tmp_path / 'primary.db', 'SELECT COUNT(*) FROM sale') == [(0,)]
+
+    # The owner's routes merge every shard
+    listed = client.get('/owner/tickets', headers=owner).json
+    assert [ticket['id'] for ticket in listed] == sorted(tickets, reverse=True)
+    assert client.get(f'/owner/tickets?shop_id={first}', headers=owner).json[0]['id'] == tickets[0]
+    detail = client.get(f'/owner/tickets/{tickets[1]}', headers=owner).json
+    assert [(line['product']['name'], line['quantity']) for line in detail['lines']] == [('Oud Royale', 1)]
+    inventory = client.get('/owner/inventory', headers=owner).json
+    assert [(item['shop']['shop_id'], item['current_stock']) for item in inventory] == [('SH-1', 10), ('SH-2', 10)]
+    assert len(client.get('/owner/sales', headers=owner).json) == 2
+    assert client.get('/owner/dashboard', headers=owner).json['total_sales'] == 75
+    metrics = client.get('/owner/tickets/metrics?by_shop=true', headers=owner).json
+    assert (metrics['ticket_count'], metrics['line_count'], metrics['total']) == (2, 2, 75)
+    assert [shop['ticket_count'] for shop in metrics['shops']] == [1, 1]
+    [margin] = client.get('/owner/reports/margin', headers=owner).json
+    assert (margin['quantity'], margin['revenue'], margin['profit']) == (3, 75, 45)
+
+
+def test_transfers_move_stock_between_shop_files(sharded_app, tmp_path):
+    client = sharded_app.test_client()
+    first, second = sharded_app.config['SHOP_IDS']
+    owner = _headers(sharded_app, 'owner@example.com', 'owner')
+    assert client.post('/owner/inventory/stock-in', json={'shop_id': first, 'product_id': 1, 'quantity': 8},
+                       headers=owner).status_code == 201
+
+    response = client.post('/owner/inventory/transfers', json={
+        'from_shop_id': first, 'to_shop_id': second, 'items': [{'product_id': 1, 'quantity': 5}]
+    }, headers=owner)
+    assert response.status_code == 201
+    short = client.post('/owner/inventory/transfers', json={
+        'from_shop_id': first, 'to_shop_id': second, 'items': [{'product_id': 1, 'quantity': 4}]
+    }, headers=owner)
+    assert (short.status_code, short.json['shortages'][0]['available']) == (409, 3)
+
+    shards = tmp_path / 'shards'
+    assert _rows(shards / f'shop_{first}.db', 'SELECT current_stock FROM inventory') == [(3,)]
+    assert _rows(shards / f'shop_{second}.db', 'SELECT current_stock FROM inventory') == [(5,)]
+    with sharded_app.app_context():
+        assert reconcile_inventory()['discrepancies'] == []
+
+
+def test_flushes_follow_each_rows_shop(sharded_app, tmp_path):
+    first, second = sharded_app.config['SHOP_IDS']
+    with sharded_app.app_context():
+        # No shard is current: each row still lands in its own shop's file
+        db.session.add_all([Inventory(shop_id=shop_id, product_id=1, current_stock=shop_id)
+                            for shop_id in (first, second)])
+        db.session.commit()
+
+        # Reads need to know which shard to ask
+        with pytest.raises(ShardRequired):
+            Inventory.query.all()
+        with pytest.raises(RuntimeError, match='not available in sharded mode'):
+            archive_month('2020-01')
+
+        # Corrections are queried shop by shop; the first is flushed while
+        # the second shop's shard is current
+        report = reconcile_inventory(correct=True)
+    assert (len(report['discrepancies']), report['corrected']) == (2, 2)
+    for shop_id in (first, second):
+        assert _rows(tmp_path / 'shards' / f'shop_{shop_id}.db', 'SELECT current_stock FROM inventory') == [(0,)]
+
+
+def test_split_copies_existing_rows_into_the_shards(sharded_app, tmp_path):
+    first, _ = sharded_app.config['SHOP_IDS']
+    # Written before sharded mode was switched on
+    central = sqlite3.connect(tmp_path / 'primary.db')
+    central.execute("INSERT INTO ticket (id, ticket_id, time, shop_id, employee_id, line_count, total) "
+                    "VALUES (7, '#T-OLD', '2025-01-01 10:00:00', NULL, 2, 1, 2500)")
+    central.execute("INSERT INTO sale (id, ticket_id, ticket_pk, time, product_id, quantity, total, employee_id) "
+                    "VALUES (9, '#T-OLD', 7, '2025-01-01 10:00:00', 1, 1, 2500, 2)")
+    central.execute("INSERT INTO inventory (id, shop_id, product_id, current_stock, version) VALUES (3, ?, 1, 4, 0)",
+                    (first,))
+    central.commit()
+    central.close()
+
+    with sharded_app.app_context():
+        assert split_central() == {'inventory': 1, 'stock_in': 0, 'ticket': 1, 'sale': 1}
+        # Running it again copies nothing twice
+        assert sum(split_central().values()) == 0
+
+    # Old ids name no shard; the ticket is found in its seller's
+    owner = _headers(sharded_app, 'owner@example.com', 'owner')
+    detail = sharded_app.test_client().get('/owner/tickets/7', headers=owner).json
+    assert (detail['ticket_id'], [line['id'] for line in detail['lines']]) == ('#T-OLD', [9])
+    assert _rows(tmp_path / 'shards' / f'shop_{first}.db', 'SELECT id, current_stock FROM inventory') == [(3, 4)]
@@ -0,0 +1,91 @@
+from db import db
+from jobs import work
+from models import Inventory, Product, Shop, Tombstone, User
+from softdelete import purge, soft_delete
+
+
+def test_deleted_product_is_hidden_but_history_keeps_it(client, owner_headers, employee_headers, product, inventory):
+    client.post('/employee/sales', json={'items': [{'product_id': product.id, 'quantity': 1}]},
+                headers=employee_headers)
+
+    response = client.delete(f'/owner/products/{product.id}', headers=owner_headers)
+    assert response.status_code == 200
+    assert response.json['job_id']
+
+    assert client.get('/owner/products', headers=owner_headers).json == []
+    assert client.get('/api/products', headers=employee_headers).json == []
+    assert client.put(f'/owner/products/{product.id}', json={'name': 'x'}, headers=owner_headers).status_code == 404
+    sale = client.post('/employee/sales', json={'items': [{'product_id': product.id, 'quantity': 1}]},
+                       headers=employee_headers)
+    assert sale.status_code == 404
+
+    # Sales already made still show the product, and its code stays taken
+    assert client.get('/owner/sales', headers=owner_headers).json[0]['product']['name'] == 'Oud Royale'
+    duplicate = {'product_id': 'P-1', 'name': 'New', 'cost_price': 1, 'selling_price': 2, 'reorder_level': 1}
+    assert client.post('/owner/products', json=duplicate, headers=owner_headers).status_code == 400
+
+    work(once=True)
+    assert Inventory.query.count() == 0
+    stock = client.get('/employee/stock/changes?since=0', headers=employee_headers).json
+    assert stock['deleted'] == [inventory.id]
+
+
+def test_stock_of_deleted_products_and_shops_is_hidden_before_the_purge(client, owner_headers, employee_headers,
+                                                                         shop, product, inventory):
+    other = Product(product_id='P-2', name='Amber', cost_price=1, selling_price=2, reorder_level=50)
+    other_shop = Shop(shop_id='SH-2', name='Mall')
+    db.session.add_all([other, other_shop])
+    db.session.flush()
+    db.session.add_all([Inventory(shop_id=shop.id, product_id=other.id, current_stock=3),
+                        Inventory(shop_id=other_shop.id, product_id=other.id, current_stock=4)])
+    db.session.commit()
+    assert client.get('/owner/dashboard', headers=owner_headers).json['low_stock_count'] == 2
+
+    client.delete(f'/owner/products/{other.id}', headers=owner_headers)
+    client.delete(f'/owner/shops/{other_shop.id}', headers=owner_headers)
+
+    # The purge job has not run: the rows are still there but no route lists them
+    assert Inventory.query.count() == 3
+    owner_rows = client.get('/owner/inventory', headers=owner_headers).json
+    assert [(row['shop_id'], row['product_id']) for row in owner_rows] == [(shop.id, product.id)]
+    assert client.get('/owner/inventory?view=low', headers=owner_headers).json == []
+    assert [row['product_id'] for row in client.get('/employee/stock', headers=employee_headers).json] == [product.id]
+    assert client.get('/owner/dashboard', headers=owner_headers).json['low_stock_count'] == 0
+    assert client.get('/employee/dashboard', headers=employee_headers).json['low_stock_count'] == 0
+
+
+def test_shop_purge_runs_in_chunks(app, owner, shop):
+    products = [Product(product_id=f'P-{index}', name='x', cost_price=1, selling_price=2, reorder_level=0)
+                for index in range(5)]
+    db.session.add_all(products)
+    db.session.flush()
+    db.session.add_all([Inventory(shop_id=shop.id, product_id=product.id, current_stock=1) for product in products])
+    soft_delete(db.session.get(Shop, shop.id), created_by_id=owner.id)
+
+    assert Shop.query.count() == 0
+    assert db.session.get(Shop, shop.id, execution_options={'include_deleted': True}).deleted_at is not None
+
+    progress = []
+    result = purge('shop', shop.id, chunk_size=2, progress=lambda done, total: progress.append((done, total)))
+    assert result['inventory_deleted'] == 5
+    assert progress == [(2, 5), (4, 5), (5, 5)]
+    assert Tombstone.query.filter_by(entity='inventory').count() == 5
+    # Each chunk is its own sync version
+    assert len({tombstone.version for tombstone in Tombstone.query}) == 3
+
+
+def test_deleted_employee_is_anonymized(client, owner_headers, employee, employee_headers, product):
+    client.post('/employee/sales', json={'items': [{'product_id': product.id, 'quantity': 2}]},
+                headers=employee_headers)
+
+    assert client.delete(f'/owner/employees/{employee.id}', headers=owner_headers).status_code == 200
+    assert [user['username'] for user in client.get('/owner/employees', headers=owner_headers).json] == [
+        'owner@example.com']
+    login = client.post('/auth/login', json={'username': 'sara@example.com', 'password': 'secret'})
+    assert login.status_code == 401
+
+    work(once=True)
+    user = db.session.get(User, employee.id, execution_options={'include_deleted': True})
+    assert (user.name, user.username, user.contact) == ('Deleted employee', f'deleted-{employee.id}', None)
+    report = client.get('/owner/reports/margin?group_by=employee', headers=owner_headers).json
+    assert [(row['name'], row['quantity']) for row in report] == [('Deleted employee', 2)]
@@ -0,0 +1,44 @@
+from db import db
+from models import Product
+
+
+def test_product_changes_feed(client, owner_headers, employee_headers, product):
+    full = client.get('/api/products/changes?since=0', headers=employee_headers).json
+    assert [p['product_id'] for p in full['changed']] == ['P-1']
+    version = full['version']
+
+    assert client.get(f'/api/products/changes?since={version}', headers=employee_headers).json['changed'] == []
+
+    client.put(f'/owner/products/{product.id}', json={'selling_price': 30}, headers=owner_headers)
+    client.post('/owner/products', json={'product_id': 'P-2', 'name': 'Musk', 'cost_price': 1,
+                                         'selling_price': 2, 'reorder_level': 1}, headers=owner_headers)
+    delta = client.get(f'/api/products/changes?since={version}', headers=employee_headers).json
+    assert [p['product_id'] for p in delta['changed']] == ['P-1', 'P-2']
+    assert delta['changed'][0]['selling_price'] == 30.0
+    assert delta['version'] > version
+
+    musk = Product.query.filter_by(product_id='P-2').one()
+    client.delete(f'/owner/products/{musk.id}', headers=owner_headers)
+    after_delete = client.get(f"/api/products/changes?since={delta['version']}", headers=employee_headers).json
+    assert after_delete['changed'] == []
+    assert after_delete['deleted'] == [musk.id]
+
+
+def test_unchanged_rows_keep_their_version(client, owner_headers, product):
+    before = product.version
+    client.put(f'/owner/products/{product.id}', json={}, headers=owner_headers)
+    assert db.session.get(Product, product.id).version == before
+
+
+def test_stock_changes_are_scoped_to_the_shop(client, owner_headers, employee_headers, shop, product, inventory):
+    version = client.get('/employee/stock/changes', headers=employee_headers).json['version']
+
+    client.post('/employee/stock-in', json={'product_id': product.id, 'quantity': 4}, headers=employee_headers)
+    delta = client.get(f'/employee/stock/changes?since={version}', headers=employee_headers).json
+    assert [(row['id'], row['current_stock']) for row in delta['changed']] == [(inventory.id, 24)]
+
+    client.post('/owner/shops', json={'shop_id': 'SH-2', 'name': 'Other'}, headers=owner_headers)
+    client.post('/owner/inventory/stock-in', json={'shop_id': shop.id + 1, 'product_id': product.id, 'quantity': 1},
+                headers=owner_headers)
+    other = client.get(f"/employee/stock/changes?since={delta['version']}", headers=employee_headers).json
+    assert other['changed'] == []
@@ -0,0 +1,59 @@
+import employee_routes
+from models import Sale, Ticket
+
+
+def _sell(client, headers, product, quantities, time='2025-03-01T10:00:00'):
+    payload = {'items': [{'product_id': product.id, 'quantity': q} for q in quantities], 'time': time}
+    response = client.post('/employee/sales', json=payload, headers=headers)
+    assert response.status_code == 201
+    return response.json['ticket']
+
+
+def test_create_sale_writes_ticket_header(client, employee_headers, product, inventory):
+    ticket = _sell(client, employee_headers, product, [1, 2])
+    assert ticket['line_count'] == 2
+    assert ticket['total'] == 75.0
+
+    header = Ticket.query.one()
+    assert header.ticket_id == ticket['ticket_id']
+    assert {sale.ticket_pk for sale in Sale.query.all()} == {header.id}
+
+
+def test_a_clashing_ticket_code_is_retried(client, monkeypatch, employee_headers, product, inventory):
+    first = _sell(client, employee_headers, product, [1])
+    codes = iter([first['ticket_id'], '#T-FRESH'])
+    monkeypatch.setattr(employee_routes, 'new_ticket_code', lambda: next(codes))
+
+    second = _sell(client, employee_headers, product, [2])
+    assert second['ticket_id'] == '#T-FRESH'
+    assert Sale.query.filter_by(ticket_pk=second['id']).one().quantity == 2
+    assert Sale.query.count() == 2
+
+
+def test_ticket_lookup(client, owner_headers, employee_headers, product, inventory):
+    ticket = _sell(client, employee_headers, product, [3])
+
+    receipt = client.get(f"/owner/tickets/{ticket['id']}", headers=owner_headers).json
+    assert receipt['total'] == 75.0
+    assert receipt['lines'][0]['product']['name'] == 'Oud Royale'
+
+    by_code = client.get('/owner/tickets', query_string={'ticket_id': ticket['ticket_id']}, headers=owner_headers).json
+    assert [t['id'] for t in by_code] == [ticket['id']]
+
+    own = client.get(f"/employee/tickets/{ticket['id']}", headers=employee_headers)
+    assert own.status_code == 200
+    assert client.get('/owner/tickets/999', headers=owner_headers).status_code == 404
+
+
+def test_basket_metrics(client, owner_headers, employee_headers, product, inventory):
+    _sell(client, employee_headers, product, [1, 1, 1], time='2025-03-01T10:00:00')
+    _sell(client, employee_headers, product, [1], time='2025-03-02T10:00:00')
+
+    metrics = client.get('/owner/tickets/metrics?by_shop=true', headers=owner_headers).json
+    assert metrics['ticket_count'] == 2
+    assert metrics['avg_lines_per_ticket'] == 2
+    assert metrics['avg_ticket_total'] == 50.0
+    assert metrics['shops'][0]['shop_id'] == 'SH-1'
+
+    later = client.get('/owner/tickets/metrics?date_from=2025-03-02', headers=owner_headers).json
+    assert later['ticket_count'] == 1
@@ -0,0 +1,117 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import event
+
+import transfers
+from db import db
+from models import Inventory, Product, Shop, StockIn, StockTransfer
+from reconcile import reconcile_inventory
+from transfers import InsufficientStock, transfer_stock
+
+
+def _second_shop_and_product():
+    other_shop = Shop(shop_id='SH-2', name='Mall')
+    other_product = Product(product_id='P-2', name='Amber', cost_price=5, selling_price=9, reorder_level=1)
+    db.session.add_all([other_shop, other_product])
+    db.session.commit()
+    return other_shop.id, other_product.id
+
+
+def _stock(shop_id, product_id):
+    item = Inventory.query.filter_by(shop_id=shop_id, product_id=product_id).first()
+    return item.current_stock if item else None
+
+
+def test_transfer_moves_every_line_at_once(client, owner_headers, employee_headers, shop, product, inventory):
+    other_shop, other_product = _second_shop_and_product()
+    db.session.add(Inventory(shop_id=shop.id, product_id=other_product, current_stock=4))
+    db.session.add(Inventory(shop_id=other_shop, product_id=product.id, current_stock=1))
+    db.session.commit()
+    since = client.get('/employee/stock/changes?since=0', headers=employee_headers).json['version']
+
+    response = client.post('/owner/inventory/transfers', json={
+        'from_shop_id': shop.id, 'to_shop_id': other_shop, 'notes': 'Weekend rebalance',
+        'items': [{'product_id': product.id, 'quantity': 5}, {'product_id': other_product, 'quantity': 4},
+                  {'product_id': product.id, 'quantity': 1}]
+    }, headers=owner_headers)
+    assert response.status_code == 201
+    assert response.json['transfer_id'].startswith('#TR-')
+    assert (response.json['line_count'], response.json['quantity']) == (2, 10)
+
+    assert (_stock(shop.id, product.id), _stock(other_shop, product.id)) == (14, 7)
+    assert (_stock(shop.id, other_product), _stock(other_shop, other_product)) == (0, 4)
+    # Both sides reach the tills through delta sync
+    changed = client.get(f'/employee/stock/changes?since={since}', headers=employee_headers).json['changed']
+    assert sorted(item['product_id'] for item in changed) == [product.id, other_product]
+
+    listed = client.get(f'/owner/inventory/transfers?shop_id={other_shop}', headers=owner_headers).json
+    assert [transfer['notes'] for transfer in listed] == ['Weekend rebalance']
+    detail = client.get(f"/owner/inventory/transfers/{listed[0]['id']}", headers=owner_headers).json
+    assert [(line['product_name'], line['quantity']) for line in detail['lines']] == [('Oud Royale', 6),
+                                                                                       ('Amber', 4)]
+
+
+def test_short_stock_moves_nothing(client, owner_headers, shop, product, inventory):
+    other_shop, other_product = _second_shop_and_product()
+    db.session.add(Inventory(shop_id=shop.id, product_id=other_product, current_stock=2))
+    db.session.commit()
+
+    response = client.post('/owner/inventory/transfers', json={
+        'from_shop_id': shop.id, 'to_shop_id': other_shop,
+        'items': [{'product_id': product.id, 'quantity': 5}, {'product_id': other_product, 'quantity': 3}]
+    }, headers=owner_headers)
+    assert response.status_code == 409
+    assert response.json['shortages'] == [{'product_id': other_product, 'requested': 3, 'available': 2}]
+    assert (_stock(shop.id, product.id), _stock(other_shop, product.id)) == (20, None)
+    assert StockTransfer.query.count() == 0
+
+    def post(payload):
+        return client.post('/owner/inventory/transfers', json=payload, headers=owner_headers).status_code
+
+    items = [{'product_id': product.id, 'quantity': 1}]
+    assert post({'from_shop_id': shop.id, 'to_shop_id': shop.id, 'items': items}) == 400
+    assert post({'from_shop_id': shop.id, 'to_shop_id': 999, 'items': items}) == 404
+    assert post({'from_shop_id': shop.id, 'to_shop_id': other_shop,
+                 'items': [{'product_id': 999, 'quantity': 1}]}) == 404
+    assert post({'from_shop_id': shop.id, 'to_shop_id': other_shop,
+                 'items': [{'product_id': product.id, 'quantity': 0}]}) == 400
+
+
+def test_reconciliation_counts_transfers(client, owner_headers, shop, product, inventory):
+    other_shop, _ = _second_shop_and_product()
+    db.session.add(StockIn(stock_in_id='SI-1', date=datetime(2025, 1, 1), shop_id=shop.id, product_id=product.id,
+                           quantity=20))
+    db.session.commit()
+    client.post('/owner/inventory/transfers', json={
+        'from_shop_id': shop.id, 'to_shop_id': other_shop, 'items': [{'product_id': product.id, 'quantity': 8}]
+    }, headers=owner_headers)
+
+    assert reconcile_inventory()['discrepancies'] == []
+
+
+def test_transfers_without_executemany_rowcounts(monkeypatch, shop, product, inventory):
+    # e.g. psycopg2, whose executemany reports no usable rowcount
+    other_shop, _ = _second_shop_and_product()
+    monkeypatch.setattr(db.engine.dialect, 'supports_sane_multi_rowcount', False)
+    with pytest.raises(InsufficientStock):
+        transfer_stock(shop.id, other_shop, {product.id: 25})
+    transfer_stock(shop.id, other_shop, {product.id: 5})
+    assert (_stock(shop.id, product.id), _stock(other_shop, product.id)) == (15, 5)
+
+
+def test_a_clashing_transfer_code_is_retried(monkeypatch, shop, product, inventory):
+    other_shop, _ = _second_shop_and_product()
+    first = transfer_stock(shop.id, other_shop, {product.id: 1})
+    codes = iter([first.transfer_id, '#TR-FRESH'])
+    monkeypatch.setattr(transfers, 'new_transfer_code', lambda: next(codes))
+    statements = []
+    listener = lambda *args: statements.append(args[2])  # noqa: E731
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        assert transfer_stock(shop.id, other_shop, {product.id: 1}).transfer_id == '#TR-FRESH'
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+    assert _stock(other_shop, product.id) == 2
+    # The clash is rolled back to a savepoint, not with the whole transfer
+    assert any(statement.startswith('ROLLBACK TO SAVEPOINT') for statement in statements)
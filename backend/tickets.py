@@ -0,0 +1,76 @@
+import secrets
+
+from db import db
+from archive import sales_entity
+from models import Shop, Ticket
+from money import from_minor, minor_sum
+from shards import each_shard, sum_groups
+
+# Random 48-bit codes; a till retries a clash with a new code this many times
+TICKET_CODE_ATTEMPTS = 3
+
+
+def new_ticket_code():
+    return f"#T-{secrets.token_hex(6).upper()}"
+
+
+def ticket_to_dict(ticket):
+    # Lines of an old ticket may have been moved to its month's archive table
+    SaleRow = sales_entity(ticket.time, ticket.time)
+    lines = db.session.query(SaleRow).filter(SaleRow.ticket_pk == ticket.id).options(
+        db.joinedload(SaleRow.product)
+    ).order_by(SaleRow.id).all()
+    return {
+        'id': ticket.id,
+        'ticket_id': ticket.ticket_id,
+        'time': ticket.time,
+        'shop_id': ticket.shop_id,
+        'employee_id': ticket.employee_id,
+        'line_count': ticket.line_count,
+        'total': ticket.total,
+        'lines': [{
+            'id': sale.id,
+            'product_id': sale.product_id,
+            'product': {
+                'name': sale.product.name
+            },
+            'quantity': sale.quantity,
+            'total': sale.total,
+            'notes': sale.notes
+        } for sale in lines]
+    }
+
+
+def _metrics(ticket_count, line_sum, total_sum):
+    ticket_count = ticket_count or 0
+    total = from_minor(total_sum or 0)
+    return {
+        'ticket_count': ticket_count,
+        'line_count': line_sum or 0,
+        'total': total,
+        'avg_lines_per_ticket': (line_sum or 0) / ticket_count if ticket_count else 0,
+        'avg_ticket_total': total / ticket_count if ticket_count else 0
+    }
+
+
+def basket_metrics(date_from=None, date_to=None, shop_id=None, by_shop=False):
+    """Ticket count and average basket size, computed from the ticket headers only."""
+    query = db.session.query(Ticket.shop_id, db.func.count(Ticket.id), db.func.sum(Ticket.line_count),
+                             minor_sum(Ticket.total))
+    if date_from:
+        query = query.filter(Ticket.time >= date_from)
+    if date_to:
+        query = query.filter(Ticket.time <= date_to)
+    if shop_id:
+        query = query.filter(Ticket.shop_id == shop_id)
+
+    # Per shop in every shard, added up here
+    rows = sum_groups(each_shard(query.group_by(Ticket.shop_id).all, [shop_id] if shop_id else None))
+    result = _metrics(*(sum(row[position] for row in rows) for position in (1, 2, 3)))
+    if by_shop:
+        shop_codes = dict(db.session.query(Shop.id, Shop.shop_id).execution_options(include_deleted=True).all())
+        result['shops'] = [{
+            'shop_id': shop_codes.get(row_shop_id),
+            **_metrics(count, lines, total)
+        } for row_shop_id, count, lines, total in rows]
+    return result
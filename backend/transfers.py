@@ -0,0 +1,195 @@
+import secrets
+from collections import Counter
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+
+from cache import cache
+from db import db
+from models import Inventory, Product, Shop, StockTransfer, StockTransferLine
+from shards import shard_connection, use_shard
+from sync import next_version
+
+# A transfer moves any number of products from one shop to another in one
+# transaction. Every source row is decremented with
+#   UPDATE ... SET current_stock = current_stock - :n WHERE ... AND current_stock >= :n
+# in a single executemany (one statement per line on drivers that can't
+# count an executemany's rows), so a concurrent transfer or stock correction
+# can never push stock below zero: if fewer rows matched than there are
+# lines, something ran short and the whole transfer rolls back.
+#
+# Transfer lines count towards each shop's expected stock in reconciliation.
+#
+# In sharded mode the two shops' rows are in their own files and the header
+# in the primary: each file's part is still all or nothing, but the three
+# commits are separate (see shards.py).
+
+
+# Random 48-bit codes; a clash with an earlier transfer is retried this often
+TRANSFER_CODE_ATTEMPTS = 3
+
+
+def new_transfer_code():
+    return f'#TR-{secrets.token_hex(6).upper()}'
+
+
+class InsufficientStock(ValueError):
+    def __init__(self, shortages):
+        super().__init__('Insufficient stock')
+        self.shortages = shortages
+
+
+def parse_items(items):
+    """{product_id: quantity} from [{'product_id', 'quantity'}, ...]; repeated products add up."""
+    if not isinstance(items, list) or not items:
+        raise ValueError('Missing items in request')
+    if len(items) > current_app.config['TRANSFER_MAX_LINES']:
+        raise ValueError(f"At most {current_app.config['TRANSFER_MAX_LINES']} items per transfer")
+    quantities = Counter()
+    for item in items:
+        try:
+            product_id, quantity = int(item.get('product_id')), int(item.get('quantity'))
+        except (AttributeError, TypeError, ValueError):
+            raise ValueError(f'Invalid item {item!r}')
+        if quantity <= 0:
+            raise ValueError(f'Quantity must be a positive integer for product {product_id}')
+        quantities[product_id] += quantity
+    return dict(quantities)
+
+
+def _first_rows(shop_id, product_ids):
+    # One row per shop/product even where older data holds duplicates
+    inventory = Inventory.__table__
+    return (db.select(db.func.min(inventory.c.id))
+            .where(inventory.c.shop_id == shop_id, inventory.c.product_id.in_(product_ids))
+            .group_by(inventory.c.product_id))
+
+
+def _shortages(shop_id, quantities):
+    inventory = Inventory.__table__
+    available = Counter(dict(db.session.execute(
+        db.select(inventory.c.product_id, inventory.c.current_stock)
+        .where(inventory.c.id.in_(_first_rows(shop_id, quantities)))
+    ).all()))
+    return [{'product_id': product_id, 'requested': quantity, 'available': available[product_id]}
+            for product_id, quantity in sorted(quantities.items()) if available[product_id] < quantity]
+
+
+def transfer_stock(from_shop_id, to_shop_id, quantities, notes=None, created_by_id=None):
+    """Move {product_id: quantity} from one shop to the other and record it. Commits.
+
+    Raises LookupError for an unknown shop or product, ValueError for a
+    transfer to the same shop and InsufficientStock (nothing moved) when the
+    source is short of any product.
+    """
+    if from_shop_id == to_shop_id:
+        raise ValueError('Source and destination shops must differ')
+    found = set(db.session.execute(db.select(Shop.id).where(Shop.id.in_([from_shop_id, to_shop_id]))).scalars())
+    for shop_id in (from_shop_id, to_shop_id):
+        if shop_id not in found:
+            raise LookupError(f'Shop with id {shop_id} not found')
+    known = set(db.session.execute(db.select(Product.id).where(Product.id.in_(quantities))).scalars())
+    missing = sorted(set(quantities) - known)
+    if missing:
+        raise LookupError(f"Product with id {', '.join(map(str, missing))} not found")
+
+    inventory = Inventory.__table__
+    lines = sorted(quantities.items())
+    connection = db.session.connection()
+    # All three are `connection` itself without sharding
+    source, destination = shard_connection(from_shop_id), shard_connection(to_shop_id)
+
+    def row_of(shop_id):
+        return inventory.c.id == (
+            db.select(db.func.min(inventory.c.id))
+            .where(inventory.c.shop_id == shop_id, inventory.c.product_id == db.bindparam('pid'))
+            .scalar_subquery()
+        )
+
+    try:
+        version, now = next_version(connection), datetime.utcnow()
+        take = (inventory.update()
+                .where(row_of(from_shop_id), inventory.c.current_stock >= db.bindparam('qty'))
+                .values(current_stock=inventory.c.current_stock - db.bindparam('qty'), version=version,
+                        updated_at=now))
+        params = [{'pid': product_id, 'qty': quantity} for product_id, quantity in lines]
+        if source.dialect.supports_sane_multi_rowcount:
+            taken = source.execute(take, params).rowcount
+        else:
+            taken = sum(source.execute(take, line).rowcount for line in params)
+        if taken != len(lines):
+            db.session.rollback()
+            with use_shard(from_shop_id):
+                raise InsufficientStock(_shortages(from_shop_id, quantities))
+
+        # Read inside the transaction, after the first write: no other writer
+        # can add the destination's rows in between
+        stocked = set(destination.execute(
+            db.select(inventory.c.product_id)
+            .where(inventory.c.shop_id == to_shop_id, inventory.c.product_id.in_(quantities))
+        ).scalars())
+        if stocked:
+            destination.execute(
+                inventory.update()
+                .where(row_of(to_shop_id))
+                .values(current_stock=inventory.c.current_stock + db.bindparam('qty'), version=version,
+                        updated_at=now),
+                [{'pid': product_id, 'qty': quantity} for product_id, quantity in lines if product_id in stocked]
+            )
+        new_rows = [{'shop_id': to_shop_id, 'product_id': product_id, 'current_stock': quantity,
+                     'version': version, 'updated_at': now}
+                    for product_id, quantity in lines if product_id not in stocked]
+        if new_rows:
+            destination.execute(inventory.insert(), new_rows)
+
+        for attempt in range(TRANSFER_CODE_ATTEMPTS):
+            try:
+                # Through the session: only connections it hands out inside
+                # begin_nested() are guarded by the SAVEPOINT
+                with db.session.begin_nested():
+                    transfer_pk = db.session.execute(StockTransfer.__table__.insert().values(
+                        transfer_id=new_transfer_code(),
+                        date=now,
+                        from_shop_id=from_shop_id,
+                        to_shop_id=to_shop_id,
+                        line_count=len(lines),
+                        quantity=sum(quantities.values()),
+                        notes=notes,
+                        created_by_id=created_by_id
+                    )).inserted_primary_key[0]
+                break
+            except IntegrityError:
+                if attempt == TRANSFER_CODE_ATTEMPTS - 1:
+                    raise
+        connection.execute(StockTransferLine.__table__.insert(), [
+            {'transfer_pk': transfer_pk, 'product_id': product_id, 'quantity': quantity}
+            for product_id, quantity in lines
+        ])
+        db.session.commit()
+    except InsufficientStock:
+        raise
+    except Exception:
+        db.session.rollback()
+        raise
+    # Core statements bypass the flush that usually invalidates cached reads
+    cache.invalidate('inventory', 'stock_transfer')
+    return db.session.get(StockTransfer, transfer_pk)
+
+
+def transfer_to_dict(transfer, with_lines=False):
+    data = {
+        'id': transfer.id,
+        'transfer_id': transfer.transfer_id,
+        'date': transfer.date.isoformat(),
+        'from_shop': {'id': transfer.from_shop.id, 'shop_id': transfer.from_shop.shop_id,
+                      'name': transfer.from_shop.name},
+        'to_shop': {'id': transfer.to_shop.id, 'shop_id': transfer.to_shop.shop_id, 'name': transfer.to_shop.name},
+        'line_count': transfer.line_count,
+        'quantity': transfer.quantity,
+        'notes': transfer.notes
+    }
+    if with_lines:
+        data['lines'] = [{'product_id': line.product_id, 'product_name': line.product.name,
+                          'quantity': line.quantity} for line in transfer.lines]
+    return data
@@ -0,0 +1,31 @@
+import argparse
+import os
+import sys
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+
+from app import create_app
+from jobs import work
+import reports  # noqa: F401  (registers job handlers)
+import archive  # noqa: F401
+import replica  # noqa: F401
+import maintenance  # noqa: F401
+import reconcile  # noqa: F401
+import softdelete  # noqa: F401
+import datamigrations  # noqa: F401
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Background job worker for the perfume shop backend.")
+    parser.add_argument("--poll-interval", type=float, default=1.0, help="Seconds to sleep when the queue is empty.")
+    parser.add_argument("--once", action="store_true", help="Drain the queue once and exit.")
+    args = parser.parse_args()
+
+    app = create_app(with_blueprints=False)
+    with app.app_context():
+        work(poll_interval=args.poll_interval, once=args.once)
+
+
+if __name__ == '__main__':
+    main()
@@ -17,4 +17,26 @@ api.interceptors.request.use(
   }
 );
 
+export type BatchRequest = {
+  path: string;
+  params?: Record<string, string | number>;
+};
+
+export type BatchResponse<T = any> = {
+  status: number;
+  body: T;
+};
+
+// Runs several GETs in one round trip through POST /api/batch. Responses come
+// back in request order; a failed sub-request rejects like a failed api.get.
+export async function batchGet(requests: BatchRequest[]): Promise<any[]> {
+  const response = await api.post<{ responses: BatchResponse[] }>("/api/batch", { requests });
+  return response.data.responses.map((item, index) => {
+    if (item.status >= 400) {
+      throw new Error(`${requests[index].path} failed with status ${item.status}`);
+    }
+    return item.body;
+  });
+}
+
 export default api;
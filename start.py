@@ -1,5 +1,8 @@
 import os
 import sys
+import time
+import signal
+import hashlib
 import subprocess
 import argparse
 
@@ -15,6 +18,70 @@ def run_command(cmd, *, cwd=None, env=None):
         sys.exit(1)
 
 
+def files_digest(paths):
+    """sha256 over the contents of every existing file in `paths`."""
+    digest = hashlib.sha256()
+    for path in paths:
+        if os.path.exists(path):
+            digest.update(os.path.basename(path).encode())
+            with open(path, "rb") as f:
+                digest.update(f.read())
+    return digest.hexdigest()
+
+
+def install_if_changed(cmd, *, lockfiles, stamp_path, cwd):
+    """Run an install command only when the lockfiles changed since the last successful run."""
+    digest = files_digest(lockfiles)
+    if os.path.exists(stamp_path):
+        with open(stamp_path) as f:
+            if f.read().strip() == digest:
+                print(f"Dependencies unchanged, skipping: {' '.join(cmd)}")
+                return
+    run_command(cmd, cwd=cwd)
+    os.makedirs(os.path.dirname(stamp_path), exist_ok=True)
+    with open(stamp_path, "w") as f:
+        f.write(digest)
+
+
+def read_pid(pidfile):
+    try:
+        with open(pidfile) as f:
+            return int(f.read().strip())
+    except (OSError, ValueError):
+        return None
+
+
+def reload_backend(pidfile, timeout=60):
+    """Zero-downtime code reload of a running gunicorn master.
+
+    USR2 starts a new master + workers next to the old ones (the old pidfile is
+    renamed to *.oldbin). Once the new master is up, TERM lets the old one
+    finish in-flight requests and exit.
+    """
+    old_pid = read_pid(pidfile)
+    if old_pid is None:
+        print(f"No running gunicorn found (pidfile {pidfile}).")
+        sys.exit(1)
+
+    print(f"Sending USR2 to gunicorn master {old_pid} ...")
+    os.kill(old_pid, signal.SIGUSR2)
+
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        new_pid = read_pid(pidfile)
+        if new_pid and new_pid != old_pid:
+            break
+        time.sleep(0.5)
+    else:
+        print("New gunicorn master did not come up; leaving the old one running.")
+        sys.exit(1)
+
+    # Give the new workers a moment to boot before retiring the old master
+    time.sleep(2)
+    print(f"New master {new_pid} is up, gracefully stopping old master {old_pid} ...")
+    os.kill(old_pid, signal.SIGTERM)
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Startup script for the perfume shop application."
@@ -30,6 +97,11 @@ def main():
         choices=["development", "production"],
         help="Environment to run the application in.",
     )
+    parser.add_argument(
+        "--reload",
+        action="store_true",
+        help="Gracefully reload the running production backend (no dropped requests) and exit.",
+    )
     args = parser.parse_args()
 
     # ------------------------------------------------------------------
@@ -48,6 +120,15 @@ def main():
     migrations_dir = os.path.join(backend_dir, "migrations")
     migrations_versions_dir = os.path.join(migrations_dir, "versions")
 
+    # Must match `pidfile` in backend/gunicorn.conf.py
+    gunicorn_pidfile = os.environ.get(
+        "GUNICORN_PIDFILE", os.path.join(backend_dir, "instance", "gunicorn.pid")
+    )
+
+    if args.reload:
+        reload_backend(gunicorn_pidfile)
+        return
+
     # ------------------------------------------------------------------
     # 1. Backend venv + dependencies
     # ------------------------------------------------------------------
@@ -56,8 +137,10 @@ def main():
         print("Creating virtual environment in backend/venv ...")
         run_command(["python3", "-m", "venv", venv_dir], cwd=project_root)
 
-    run_command(
+    install_if_changed(
         [venv_python, "-m", "pip", "install", "-r", "backend/requirements.txt"],
+        lockfiles=[os.path.join(backend_dir, "requirements.txt")],
+        stamp_path=os.path.join(venv_dir, ".requirements.sha256"),
         cwd=project_root,
     )
 
@@ -173,7 +256,15 @@ def main():
         print("Please create a .env.local or .env.production file in the project root.")
         sys.exit(1)
 
-    run_command(["npm", "install", "--legacy-peer-deps"], cwd=project_root)
+    install_if_changed(
+        ["npm", "install", "--legacy-peer-deps"],
+        lockfiles=[
+            os.path.join(project_root, "package.json"),
+            os.path.join(project_root, "package-lock.json"),
+        ],
+        stamp_path=os.path.join(project_root, "node_modules", ".install.sha256"),
+        cwd=project_root,
+    )
 
     # ------------------------------------------------------------------
     # 6. Start backend + frontend
@@ -183,14 +274,13 @@ def main():
         # Build frontend
         run_command(["npm", "run", "build"], cwd=project_root)
 
-        # Backend: gunicorn
+        # Backend: gunicorn with the shipped production profile
         backend_cmd = [
             venv_python,
             "-m",
             "gunicorn",
-            "--bind",
-            "0.0.0.0:5000",
-            "app:app",
+            "--config",
+            "gunicorn.conf.py",
         ]
         backend_cwd = backend_dir
 
@@ -204,7 +294,11 @@ def main():
         # Dev: Next.js dev server
         frontend_cmd = ["npm", "run", "dev"]
 
+    # Background job worker (reports, imports, backfills) runs next to the backend
+    worker_cmd = [venv_python, "worker.py"]
+
     backend_proc = subprocess.Popen(backend_cmd, cwd=backend_cwd, env=env)
+    worker_proc = subprocess.Popen(worker_cmd, cwd=backend_dir, env=env)
     frontend_proc = subprocess.Popen(frontend_cmd, cwd=project_root)
 
     try:
@@ -212,7 +306,16 @@ def main():
     except KeyboardInterrupt:
         print("\nStopping servers...")
     finally:
+        worker_proc.terminate()
         backend_proc.terminate()
+        # After a --reload the serving master is no longer our direct child
+        if args.env == "production":
+            master_pid = read_pid(gunicorn_pidfile)
+            if master_pid and master_pid != backend_proc.pid:
+                try:
+                    os.kill(master_pid, signal.SIGTERM)
+                except ProcessLookupError:
+                    pass
 
 
 if __name__ == "__main__":